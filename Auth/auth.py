@@ -1,13 +1,17 @@
+import asyncio
+import time
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-import requests
-from requests.auth import HTTPBasicAuth
 from dotenv import load_dotenv
-import os
+from erp.session import erp_session
+from erp.odata import build_path
+from .salesperson_directory import salesperson_directory, FOUND, NOT_FOUND
+from .verification_utils import verification_store, revoked_token_ids
 
 load_dotenv()
 
@@ -15,10 +19,6 @@ SECRET_KEY = "CHANGE_ME"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-ERP_BASE_URL = os.getenv("ERP_BASE_URL")
-USERNAME = os.getenv("ERP_USERNAME")
-PASSWORD = os.getenv("ERP_PASSWORD")
-
 # Updated user database with user types
 fake_users_db = {
     "alice@company.com": {"name": "Alice", "password": "secret1"},
@@ -64,6 +64,13 @@ def verify_salesperson_email(email: str) -> Optional[dict]:
     
     if email in test_emails:
         return test_emails[email]
+
+    # Answer from the in-memory directory when it knows the email either way
+    salesperson, state = salesperson_directory.lookup(email)
+    if state == FOUND:
+        return salesperson
+    if state == NOT_FOUND:
+        return None
         
     try:
         # URL encode the email as it may contain special characters
@@ -71,13 +78,15 @@ def verify_salesperson_email(email: str) -> Optional[dict]:
         encoded_email = urllib.parse.quote(email)
         
         # Build URL with filter for exact email match
-        url = f"{ERP_BASE_URL}/Salesperson_Purchaser_Card?$filter=E_Mail eq '{encoded_email}'"
+        path = build_path("Salesperson_Purchaser_Card", select="salesperson", filter=f"E_Mail eq '{encoded_email}'")
         
-        response = requests.get(url, auth=HTTPBasicAuth(USERNAME, PASSWORD))
+        response = erp_session.get(path)
         if response.status_code == 200:
             data = response.json()
             if data.get('value') and len(data['value']) > 0:
+                salesperson_directory.remember(email, data['value'][0])
                 return data['value'][0]  # Return the first matching salesperson
+            salesperson_directory.remember_missing(email)
         return None
     except Exception as e:
         print(f"Error verifying salesperson email: {str(e)}")
@@ -113,12 +122,34 @@ def authenticate_user(email: str, password: str) -> Optional[dict]:
     }
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    """
+    Create a signed token. Profile claims passed in `data` (name, code, type) are kept
+    so get_current_user can rebuild the user without calling ERP.
+    """
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire, "sub": data.get("sub") or data.get("email")})
+    to_encode.update({
+        "exp": expire,
+        "iat": datetime.utcnow(),
+        "sub": data.get("sub") or data.get("email"),
+        "jti": uuid.uuid4().hex,
+        "dir_ver": salesperson_directory.version,
+    })
+    to_encode.pop("email", None)
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+def revoke_token(payload: dict):
+    """
+    Record a decoded token as revoked until it expires, in the store shared by all
+    workers and in this worker's revoked_token_ids (expired entries are removed by
+    the verification sweeper)
+    """
+    if payload.get("jti"):
+        expires_at = datetime.utcfromtimestamp(float(payload.get("exp", time.time())))
+        verification_store.revoke_token(payload["jti"], expires_at)
+        revoked_token_ids[payload["jti"]] = expires_at
+
+async def decode_access_token(token: str = Depends(oauth2_scheme)) -> dict:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -126,13 +157,34 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
     )
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = authenticate_user(email, None)
-    if user is None:
+    if payload.get("sub") is None:
         raise credentials_exception
+    if payload.get("jti") in revoked_token_ids:
+        raise credentials_exception
+    return payload
+
+async def get_current_user(payload: dict = Depends(decode_access_token)) -> dict:
+    email: str = payload["sub"]
+
+    # Tokens carrying the profile claims are validated locally, with no I/O, as long as
+    # the directory has not been reloaded since they were issued
+    if "name" in payload and "code" in payload and payload.get("dir_ver") == salesperson_directory.version:
+        return {
+            "email": email,
+            "name": payload["name"],
+            "code": payload["code"],
+            "type": payload.get("type", "sales_engineer")
+        }
+
+    # Older tokens, and tokens issued before the last reload (or by another worker, whose
+    # version differs), are checked against the directory again so removed salespeople lose access
+    user = await asyncio.to_thread(authenticate_user, email, None)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
@@ -1,16 +1,48 @@
+import asyncio
+import os
+import time
 import aiosmtplib
 from email.message import EmailMessage
+from typing import Optional
 from pydantic import EmailStr
 from datetime import datetime  # Added to format timestamp
+from dotenv import load_dotenv
 
-SMTP_HOST = "smtp.gmail.com"
-SMTP_PORT = 587
-SMTP_USER = "achieng4024mary@gmail.com"
-SMTP_PASSWORD = "cyfr nbfz usao dduv"
+load_dotenv()
 
-async def send_verification_email(email: EmailStr, code: str):
+# Point SMTP_HOST/SMTP_PORT at a local stub (e.g. `python -m aiosmtpd -n -l localhost:8025`
+# with SMTP_START_TLS=False and empty credentials) to exercise the mail path without Gmail
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+# Leave SMTP_USER empty for an unauthenticated server; when it is set, SMTP_PASSWORD is required
+SMTP_USER = os.getenv("SMTP_USER", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+# Sender address; defaults to the authenticated account
+SMTP_FROM = os.getenv("SMTP_FROM") or SMTP_USER
+SMTP_START_TLS = os.getenv("SMTP_START_TLS", "True").lower() == "true"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+# Close the pooled SMTP session after this many idle seconds; servers drop it anyway
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "120"))
+EMAIL_QUEUE_MAX_SIZE = int(os.getenv("EMAIL_QUEUE_MAX_SIZE", "1000"))
+
+
+class EmailConfigurationError(Exception):
+    """SMTP settings are incomplete, so no verification email can be sent"""
+
+
+def check_smtp_settings():
+    """
+    Raise EmailConfigurationError when the SMTP settings cannot work. Checked per send
+    rather than at import, so a missing secret fails the mail path only, not the API.
+    """
+    if not SMTP_FROM:
+        raise EmailConfigurationError("SMTP_USER or SMTP_FROM must be set to send email")
+    if SMTP_USER and not SMTP_PASSWORD:
+        raise EmailConfigurationError("SMTP_PASSWORD not found in environment variables")
+
+def build_verification_email(email: EmailStr, code: str) -> EmailMessage:
     message = EmailMessage()
-    message["From"] = f"Davis & Shirtliff <{SMTP_USER}>"
+    message["From"] = f"Davis & Shirtliff <{SMTP_FROM}>"
     # message["From"] = SMTP_USER
     message["To"] = email
     # Use f-string to embed formatted timestamp
@@ -46,12 +78,162 @@ async def send_verification_email(email: EmailStr, code: str):
   </body>
 </html>
 """, subtype="html")
+    return message
 
+async def send_verification_email(email: EmailStr, code: str):
+    """Send a verification email on a fresh SMTP connection and wait for it"""
+    check_smtp_settings()
     await aiosmtplib.send(
-        message,
+        build_verification_email(email, code),
         hostname=SMTP_HOST,
         port=SMTP_PORT,
-        start_tls=True,
-        username=SMTP_USER,
-        password=SMTP_PASSWORD,
+        start_tls=SMTP_START_TLS,
+        username=SMTP_USER or None,
+        password=SMTP_PASSWORD or None,
+        timeout=SMTP_TIMEOUT,
     )
+
+
+class EmailDispatcher:
+    """
+    Background mail queue. A single worker drains the queue over one authenticated
+    SMTP session, reconnecting when the server drops it or it has been idle longer
+    than SMTP_IDLE_TIMEOUT.
+    """
+
+    def __init__(self, max_size: int = EMAIL_QUEUE_MAX_SIZE, idle_timeout: float = SMTP_IDLE_TIMEOUT):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._smtp: Optional[aiosmtplib.SMTP] = None
+        self.sent = 0
+        self.failed = 0
+        # Messages sent inline because the queue was full
+        self.sent_direct = 0
+        self.connects = 0
+        self._send_seconds = 0.0
+        self._wait_seconds = 0.0
+        self.last_send_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        await self._disconnect()
+
+    def enqueue(self, message: EmailMessage):
+        """Queue a message for background delivery and return immediately"""
+        self.start()
+        self._queue.put_nowait((message, time.perf_counter()))
+
+    def enqueue_verification_email(self, email: EmailStr, code: str):
+        self.enqueue(build_verification_email(email, code))
+
+    async def deliver_verification_email(self, email: EmailStr, code: str):
+        """
+        Queue a verification email; when the queue is full, send it on a fresh
+        connection and wait for it instead. Raises when the SMTP settings are
+        incomplete or that direct send fails.
+        """
+        try:
+            check_smtp_settings()
+        except EmailConfigurationError as e:
+            self.failed += 1
+            self.last_error = str(e)
+            print(f"Cannot send verification email to {email}: {str(e)}")
+            raise
+        try:
+            self.enqueue_verification_email(email, code)
+        except asyncio.QueueFull:
+            print(f"Email queue full ({self.max_size}); sending to {email} directly")
+            await send_verification_email(email, code)
+            self.sent_direct += 1
+
+    async def _connect(self):
+        check_smtp_settings()
+        self._smtp = aiosmtplib.SMTP(
+            hostname=SMTP_HOST,
+            port=SMTP_PORT,
+            start_tls=SMTP_START_TLS,
+            username=SMTP_USER or None,
+            password=SMTP_PASSWORD or None,
+            timeout=SMTP_TIMEOUT,
+        )
+        await self._smtp.connect()
+        self.connects += 1
+
+    async def _disconnect(self):
+        if self._smtp is not None:
+            try:
+                if self._smtp.is_connected:
+                    await self._smtp.quit()
+            except Exception:
+                self._smtp.close()
+            self._smtp = None
+
+    async def _send(self, message: EmailMessage):
+        if self._smtp is None or not self._smtp.is_connected:
+            await self._connect()
+        try:
+            await self._smtp.send_message(message)
+        except (aiosmtplib.SMTPServerDisconnected, ConnectionError):
+            # The pooled session went away between messages; reconnect once and retry
+            await self._disconnect()
+            await self._connect()
+            await self._smtp.send_message(message)
+
+    async def _run(self):
+        while True:
+            try:
+                message, enqueued_at = await asyncio.wait_for(self._queue.get(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                await self._disconnect()
+                continue
+
+            started = time.perf_counter()
+            try:
+                await self._send(message)
+                self.sent += 1
+            except Exception as e:
+                self.failed += 1
+                self.last_error = str(e)
+                print(f"Failed to send email to {message['To']}: {str(e)}")
+                await self._disconnect()
+            finally:
+                finished = time.perf_counter()
+                self.last_send_seconds = finished - started
+                self._send_seconds += finished - started
+                self._wait_seconds += started - enqueued_at
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        processed = self.sent + self.failed
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "running": self._worker is not None and not self._worker.done(),
+            "connected": self._smtp is not None and self._smtp.is_connected,
+            "sent": self.sent,
+            "failed": self.failed,
+            "sent_direct": self.sent_direct,
+            "connects": self.connects,
+            "avg_send_seconds": round(self._send_seconds / processed, 4) if processed else None,
+            "avg_queue_wait_seconds": round(self._wait_seconds / processed, 4) if processed else None,
+            "last_send_seconds": round(self.last_send_seconds, 4) if self.last_send_seconds is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+# Shared dispatcher used by the login routes
+email_dispatcher = EmailDispatcher()
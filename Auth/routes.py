@@ -1,7 +1,9 @@
+import asyncio
 from datetime import timedelta
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from .email_utils import send_verification_email
+from .email_utils import email_dispatcher
+from .verification_utils import verification_store
 from datetime import datetime, timedelta
 from fastapi import Body
 import random
@@ -10,7 +12,9 @@ from .auth import (
     authenticate_user,
     create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES,
-    get_current_user
+    get_current_user,
+    decode_access_token,
+    revoke_token
 )
 
 router = APIRouter(
@@ -19,9 +23,6 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-# TEMP STORE for codes
-verification_codes = {}
-
 class LoginPayload(BaseModel):
     email: str
     password: str
@@ -39,6 +40,13 @@ class Token(BaseModel):
     token_type: str
     user: dict
 
+async def _send_verification_code(email: str, code: str):
+    try:
+        await email_dispatcher.deliver_verification_email(email, code)
+    except Exception as e:
+        print(f"Could not send verification email to {email}: {str(e)}")
+        raise HTTPException(status_code=503, detail="Verification email could not be sent, please try again shortly")
+
 @router.post("/sales-engineer/login")
 async def sales_engineer_login(payload: SalesEngineerLoginPayload):
     """
@@ -47,48 +55,40 @@ async def sales_engineer_login(payload: SalesEngineerLoginPayload):
     If password is not provided, only email verification is required.
     """
     # First check if the user exists
-    user = authenticate_user(payload.email, payload.password)
+    user = await asyncio.to_thread(authenticate_user, payload.email, payload.password)
     if not user:
         raise HTTPException(status_code=400, detail="Email does not exist, contact your administrator")
 
     # Generate verification code
     code = str(random.randint(1000, 9999))
-    verification_codes[payload.email] = {
-    "code": code,
-    "expires_at": datetime.utcnow() + timedelta(minutes=2)
-    }
+    await asyncio.to_thread(verification_store.set, payload.email, code, datetime.utcnow() + timedelta(minutes=2))
 
-    # Send verification email
-    await send_verification_email(payload.email, code)
-    
+    # Send verification email in the background
+    await _send_verification_code(payload.email, code)
 
     return {"message": "Verification code sent to your email."}
 
 @router.post("/login")
 async def login(payload: LoginPayload):
-    user = authenticate_user(payload.email, payload.password)
+    user = await asyncio.to_thread(authenticate_user, payload.email, payload.password)
     if not user:
         raise HTTPException(status_code=400, detail="Email does not exist, contact your administrator")
 
     code = str(random.randint(1000, 9999))
-    #verification_codes[payload.email] = code
-    verification_codes[payload.email] = {
-    "code": code,
-    "expires_at": datetime.utcnow() + timedelta(minutes=2)
-    }
+    await asyncio.to_thread(verification_store.set, payload.email, code, datetime.utcnow() + timedelta(minutes=2))
 
-    await send_verification_email(payload.email, code)
+    await _send_verification_code(payload.email, code)
 
     return {"message": "Verification code sent to your email."}
 
 @router.post("/verify-code", response_model=Token)
 async def verify_code(payload: CodeVerification):
-    entry = verification_codes.get(payload.email)
+    entry = await asyncio.to_thread(verification_store.get, payload.email)
     if not entry:
         raise HTTPException(status_code=400, detail="No verification code found for this email")
 
     if datetime.utcnow() > entry["expires_at"]:
-        verification_codes.pop(payload.email, None)  # Optional cleanup
+        await asyncio.to_thread(verification_store.pop, payload.email)  # Optional cleanup
         raise HTTPException(status_code=400, detail="Verification code expired")
 
     if payload.code != entry["code"]:
@@ -106,15 +106,15 @@ async def verify_code(payload: CodeVerification):
     if payload.code != expected_code:
         raise HTTPException(status_code=400, detail="Code does not match")
     '''    
-    user = authenticate_user(payload.email, None)
+    user = await asyncio.to_thread(authenticate_user, payload.email, None)
     if not user:
         raise HTTPException(status_code=400, detail="User not found")
 
     access_token = create_access_token(
-        data={"sub": user["email"]},
+        data={"sub": user["email"], "name": user["name"], "code": user["code"], "type": user["type"]},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
     )
-    verification_codes.pop(payload.email, None)  # Clear used code
+    await asyncio.to_thread(verification_store.pop, payload.email)  # Clear used code
 
     return {
         "access_token": access_token,
@@ -125,18 +125,15 @@ async def verify_code(payload: CodeVerification):
 @router.post("/resend-code")
 async def resend_code(email: str = Body(..., embed=True)):
     # Always allow resending code, even if one doesn't exist yet
-    user = authenticate_user(email, None)
+    user = await asyncio.to_thread(authenticate_user, email, None)
     if not user:
         raise HTTPException(status_code=400, detail="Email does not exist, contact your administrator")
 
     # Generate a new code
     code = str(random.randint(1000, 9999))
-    verification_codes[email] = {
-        "code": code,
-        "expires_at": datetime.utcnow() + timedelta(minutes=2)
-    }
+    await asyncio.to_thread(verification_store.set, email, code, datetime.utcnow() + timedelta(minutes=2))
 
-    await send_verification_email(email, code)
+    await _send_verification_code(email, code)
     return {"message": "A new verification code has been sent to your email."}
 
 
@@ -159,3 +156,14 @@ async def resend_code(email: str = Body(..., embed=True)):
 @router.get("/dashboard")
 async def read_dashboard(current_user: dict = Depends(get_current_user)):
     return {"message": f"Hello {current_user['name']}, welcome to your dashboard!"}
+
+@router.get("/email/metrics")
+async def email_metrics():
+    """Verification email queue depth, send latency and delivery counts"""
+    return email_dispatcher.stats()
+
+@router.post("/logout")
+async def logout(payload: dict = Depends(decode_access_token)):
+    """Revoke the bearer token used for this request"""
+    await asyncio.to_thread(revoke_token, payload)
+    return {"message": "Logged out."}
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+from erp.erp_client import fetch_entity
+
+load_dotenv()
+
+SALESPERSON_DIRECTORY_REFRESH_INTERVAL = float(os.getenv("SALESPERSON_DIRECTORY_REFRESH_INTERVAL", "900"))
+SALESPERSON_NEGATIVE_TTL = float(os.getenv("SALESPERSON_NEGATIVE_TTL", "600"))
+SALESPERSON_PAGE_SIZE = int(os.getenv("SALESPERSON_PAGE_SIZE", "500"))
+
+FOUND = "found"
+NOT_FOUND = "not_found"
+UNKNOWN = "unknown"
+
+
+class SalespersonDirectory:
+    """
+    In-memory copy of Salesperson_Purchaser_Card keyed by lowercased email.
+
+    The whole entity is bulk-loaded on startup and refreshed periodically. Emails that
+    ERP confirmed as unknown are negatively cached for SALESPERSON_NEGATIVE_TTL seconds,
+    so repeated lookups for them do not reach ERP either. `version` increases on
+    every reload.
+    """
+
+    def __init__(self, negative_ttl: float = SALESPERSON_NEGATIVE_TTL):
+        self.negative_ttl = negative_ttl
+        self._by_email: Dict[str, dict] = {}
+        self._missing: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+
+    def load(self, page_size: int = SALESPERSON_PAGE_SIZE) -> int:
+        """Reload the directory from ERP. Returns the number of salespeople loaded."""
+        by_email = {}
+        skip = 0
+        while True:
+            page = fetch_entity("Salesperson_Purchaser_Card", top=page_size, skip=skip, select="salesperson").get("value", [])
+            for salesperson in page:
+                email = (salesperson.get("E_Mail") or "").strip().lower()
+                if email:
+                    by_email[email] = salesperson
+            if len(page) < page_size:
+                break
+            skip += page_size
+
+        with self._lock:
+            self._by_email = by_email
+            self._missing = {}
+            self.version += 1
+            self.loaded_at = time.time()
+        return len(by_email)
+
+    def lookup(self, email: str) -> Tuple[Optional[dict], str]:
+        """Return (salesperson, FOUND), (None, NOT_FOUND) or (None, UNKNOWN) without any I/O"""
+        key = email.strip().lower()
+        salesperson = self._by_email.get(key)
+        if salesperson is not None:
+            return salesperson, FOUND
+
+        expires_at = self._missing.get(key)
+        if expires_at is not None:
+            if expires_at > time.monotonic():
+                return None, NOT_FOUND
+            with self._lock:
+                self._missing.pop(key, None)
+        return None, UNKNOWN
+
+    def remember(self, email: str, salesperson: dict):
+        with self._lock:
+            key = email.strip().lower()
+            self._by_email[key] = salesperson
+            self._missing.pop(key, None)
+
+    def remember_missing(self, email: str):
+        with self._lock:
+            self._missing[email.strip().lower()] = time.monotonic() + self.negative_ttl
+
+
+# Shared directory used by Auth.auth
+salesperson_directory = SalespersonDirectory()
+
+
+async def run_directory_refresh_loop(interval: float = SALESPERSON_DIRECTORY_REFRESH_INTERVAL):
+    """Background job: load the directory now and reload it every `interval` seconds"""
+    while True:
+        try:
+            count = await asyncio.to_thread(salesperson_directory.load)
+            print(f"Salesperson directory loaded: {count} entries (version {salesperson_directory.version})")
+        except Exception as e:
+            print(f"Salesperson directory refresh failed: {str(e)}")
+        await asyncio.sleep(interval)
@@ -1,20 +1,230 @@
+import asyncio
+import contextlib
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "sqlite" shares codes and token revocations between uvicorn workers and keeps them
+# across restarts; "memory" keeps them in this process only
+VERIFICATION_STORE_BACKEND = os.getenv("VERIFICATION_STORE_BACKEND", "sqlite").lower()
+VERIFICATION_STORE_PATH = os.getenv(
+    "VERIFICATION_STORE_PATH",
+    str(Path(__file__).resolve().parent.parent / "verification_codes.db"),
+)
+VERIFICATION_SWEEP_INTERVAL = float(os.getenv("VERIFICATION_SWEEP_INTERVAL", "60"))
+
+
+class VerificationCodeStore(ABC):
+    """
+    Interface for login state shared by the API workers: verification codes
+    (email -> {code, expires_at}) and revoked token ids (jti -> expires_at)
+    """
+
+    @abstractmethod
+    def set(self, email: str, code: str, expires_at: datetime):
+        ...
+
+    @abstractmethod
+    def get(self, email: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def pop(self, email: str):
+        ...
+
+    @abstractmethod
+    def revoke_token(self, jti: str, expires_at: datetime):
+        ...
+
+    @abstractmethod
+    def is_token_revoked(self, jti: str) -> bool:
+        ...
+
+    @abstractmethod
+    def revoked_tokens(self) -> Dict[str, datetime]:
+        """Return the revoked token ids that have not expired yet"""
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Delete expired codes and revocations. Returns the number removed."""
+
+
+class InMemoryVerificationCodeStore(VerificationCodeStore):
+    """Process-local store; only valid when the API runs as a single worker"""
+
+    def __init__(self):
+        self._codes: Dict[str, Dict] = {}
+        self._revoked: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+
+    def set(self, email: str, code: str, expires_at: datetime):
+        with self._lock:
+            self._codes[email] = {"code": code, "expires_at": expires_at}
+
+    def get(self, email: str) -> Optional[Dict]:
+        return self._codes.get(email)
+
+    def pop(self, email: str):
+        with self._lock:
+            self._codes.pop(email, None)
+
+    def revoke_token(self, jti: str, expires_at: datetime):
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def is_token_revoked(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    def revoked_tokens(self) -> Dict[str, datetime]:
+        now = datetime.utcnow()
+        with self._lock:
+            return {jti: expires_at for jti, expires_at in self._revoked.items() if expires_at >= now}
+
+    def sweep(self) -> int:
+        now = datetime.utcnow()
+        with self._lock:
+            expired = [email for email, entry in self._codes.items() if entry["expires_at"] < now]
+            for email in expired:
+                del self._codes[email]
+            expired_tokens = [jti for jti, expires_at in self._revoked.items() if expires_at < now]
+            for jti in expired_tokens:
+                del self._revoked[jti]
+        return len(expired) + len(expired_tokens)
+
+
+class SQLiteVerificationCodeStore(VerificationCodeStore):
+    """File-backed store shared by every worker process on the host"""
+
+    def __init__(self, path: str = VERIFICATION_STORE_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS verification_codes ("
+                "email TEXT PRIMARY KEY, code TEXT NOT NULL, expires_at TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_verification_codes_expires_at ON verification_codes (expires_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS revoked_tokens (jti TEXT PRIMARY KEY, expires_at TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_revoked_tokens_expires_at ON revoked_tokens (expires_at)")
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # A short-lived connection per call keeps the store safe across threads and processes.
+        # `with conn` only commits or rolls back, so the connection is closed here as well.
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def set(self, email: str, code: str, expires_at: datetime):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO verification_codes (email, code, expires_at) VALUES (?, ?, ?)",
+                (email, code, expires_at.isoformat()),
+            )
+
+    def get(self, email: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT code, expires_at FROM verification_codes WHERE email = ?", (email,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"code": row[0], "expires_at": datetime.fromisoformat(row[1])}
+
+    def pop(self, email: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM verification_codes WHERE email = ?", (email,))
+
+    def revoke_token(self, jti: str, expires_at: datetime):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)",
+                (jti, expires_at.isoformat()),
+            )
+
+    def is_token_revoked(self, jti: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute("SELECT 1 FROM revoked_tokens WHERE jti = ?", (jti,)).fetchone()
+        return row is not None
+
+    def revoked_tokens(self) -> Dict[str, datetime]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT jti, expires_at FROM revoked_tokens WHERE expires_at >= ?", (datetime.utcnow().isoformat(),)
+            ).fetchall()
+        return {jti: datetime.fromisoformat(expires_at) for jti, expires_at in rows}
+
+    def sweep(self) -> int:
+        now = datetime.utcnow().isoformat()
+        with self._connect() as conn:
+            codes = conn.execute("DELETE FROM verification_codes WHERE expires_at < ?", (now,)).rowcount
+            tokens = conn.execute("DELETE FROM revoked_tokens WHERE expires_at < ?", (now,)).rowcount
+        return codes + tokens
+
+
+def create_verification_store(backend: str = VERIFICATION_STORE_BACKEND) -> VerificationCodeStore:
+    if backend == "sqlite":
+        return SQLiteVerificationCodeStore()
+    if backend == "memory":
+        return InMemoryVerificationCodeStore()
+    raise ValueError(f"Unknown verification store backend: {backend}")
+
+
+# Shared store used by the login routes
+verification_store = create_verification_store()
+
+# Revoked token ids (jti -> expires_at) checked on every authenticated request without I/O.
+# Loaded from the store at startup and merged again after every sweep, so a logout handled
+# by another worker applies here within VERIFICATION_SWEEP_INTERVAL seconds.
+revoked_token_ids: Dict[str, datetime] = {}
+
+
+def remember_revoked_tokens(revoked: Dict[str, datetime]):
+    """Merge revocations read from the store and drop the ones that have expired"""
+    now = datetime.utcnow()
+    for jti, expires_at in list(revoked_token_ids.items()):
+        if expires_at < now:
+            revoked_token_ids.pop(jti, None)
+    revoked_token_ids.update({jti: expires_at for jti, expires_at in revoked.items() if expires_at >= now})
+
+
+async def load_revoked_tokens():
+    remember_revoked_tokens(await asyncio.to_thread(verification_store.revoked_tokens))
 
-# Temporary in-memory store: email -> {code, expiry}
-verification_store = {}
 
 def generate_verification_code(length=4):
     from random import randint
     return str(randint(10**(length-1), 10**length - 1))
 
 def store_code(email: str, code: str, expiry_minutes=2):
-    verification_store[email] = {
-        "code": code,
-        "expires_at": datetime.utcnow() + timedelta(minutes=expiry_minutes)
-    }
+    verification_store.set(email, code, datetime.utcnow() + timedelta(minutes=expiry_minutes))
 
 def is_code_valid(email: str, code: str) -> bool:
     entry = verification_store.get(email)
     if not entry:
         return False
     return entry["code"] == code and datetime.utcnow() < entry["expires_at"]
+
+
+async def run_verification_sweeper(interval: float = VERIFICATION_SWEEP_INTERVAL):
+    """
+    Background job: every `interval` seconds remove expired verification codes and
+    revocations, and refresh revoked_token_ids from the store
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(verification_store.sweep)
+            await load_revoked_tokens()
+        except Exception as e:
+            print(f"Verification code sweep failed: {str(e)}")
@@ -0,0 +1,8 @@
+"""
+Benchmarks run by hand against local stubs or a running API, e.g.
+
+    python -m bench.erp_quotation
+    python -m bench.erp_payload_bytes
+    python -m bench.recommend_load --url http://localhost:8000
+    python -m bench.structured_output_rates
+"""
@@ -0,0 +1,30 @@
+import os
+import statistics
+import tempfile
+from typing import Dict, List
+
+
+def use_temp_stores():
+    """Point the SQLite stores at a temporary directory; call before importing app modules"""
+    data_dir = tempfile.mkdtemp(prefix="backend-bench-")
+    os.environ.setdefault("ERP_DATABASE_URL", f"sqlite:///{data_dir}/erp.db")
+    os.environ.setdefault("VERIFICATION_STORE_PATH", os.path.join(data_dir, "verification_codes.db"))
+    os.environ.setdefault("LLM_CACHE_PATH", os.path.join(data_dir, "llm_cache.db"))
+    os.environ.setdefault("EMBEDDING_CACHE_PATH", os.path.join(data_dir, "embedding_cache.db"))
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    ordered = sorted(seconds)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 1),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1] * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+
+def print_table(rows: List[Dict[str, object]]):
+    columns = list(rows[0])
+    widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in columns}
+    print("  ".join(column.ljust(widths[column]) for column in columns))
+    for row in rows:
+        print("  ".join(str(row[column]).ljust(widths[column]) for column in columns))
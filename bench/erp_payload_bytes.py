@@ -0,0 +1,74 @@
+"""
+Bytes per ERP call with and without $select projections, against the stub OData server.
+
+    python -m bench.erp_payload_bytes [--calls 200]
+
+Each call path is fetched with every column (as before projections) and with the
+named projection it now uses, reporting response bytes and JSON parse time per call.
+Stub rows carry ~40 columns like Business Central's ItemsAPI and Customer_Card.
+"""
+import argparse
+import json
+import time
+from bench.common import print_table, use_temp_stores
+
+use_temp_stores()
+
+from erp.odata import build_path
+from erp.session import ErpSession
+from tests.odata_stub import ODataStubServer
+
+CALL_PATHS = [
+    # (call path, entity, $filter template, named projection, $top)
+    ("product by number", "ItemsAPI", "No eq 'UFS{index:04d}'", "quotation", None),
+    ("customer by phone", "Customer_Card", "Phone_No eq '0711{index:06d}'", "customer_summary", None),
+    ("ItemsAPI page", "ItemsAPI", None, "quotation", 100),
+]
+
+
+def measure(session: ErpSession, entity: str, filter_template, projection, top, calls: int) -> dict:
+    total_bytes = 0
+    parse_seconds = 0.0
+    for index in range(calls):
+        filter_ = filter_template.format(index=index) if filter_template else None
+        response = session.get(build_path(entity, top=top, select=projection, filter=filter_))
+        response.raise_for_status()
+        total_bytes += len(response.content)
+        started = time.perf_counter()
+        json.loads(response.content)
+        parse_seconds += time.perf_counter() - started
+    return {"bytes": total_bytes / calls, "parse_us": parse_seconds / calls * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    stub = ODataStubServer()
+    stub.start()
+    session = ErpSession(base_url=stub.url)
+    rows = []
+    try:
+        for name, entity, filter_template, projection, top in CALL_PATHS:
+            full = measure(session, entity, filter_template, None, top, args.calls)
+            projected = measure(session, entity, filter_template, projection, top, args.calls)
+            rows.append({
+                "call": name,
+                "projection": projection,
+                "bytes_before": round(full["bytes"]),
+                "bytes_after": round(projected["bytes"]),
+                "reduction": f"{1 - projected['bytes'] / full['bytes']:.0%}",
+                "parse_us_before": round(full["parse_us"], 1),
+                "parse_us_after": round(projected["parse_us"], 1),
+            })
+    finally:
+        session.close()
+        stub.stop()
+
+    print(f"Bytes per ERP call, mean of {args.calls} calls per row")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
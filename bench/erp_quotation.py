@@ -0,0 +1,117 @@
+"""
+Throughput of /erp/quotation at 200 concurrent calls against a local stub OData server.
+
+    python -m bench.erp_quotation [--requests 200] [--latency 0.1]
+
+"before" serves the route as a sync `def` on FastAPI's threadpool with the blocking
+requests client (erp.erp_client); "after" is the async route on erp.async_client.
+Both apps also expose a sync /probe route; its latency while the quotations are in
+flight shows whether ERP calls starve unrelated endpoints of threadpool slots.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+from bench.common import latency_summary, print_table, use_temp_stores
+
+use_temp_stores()
+
+import httpx
+from fastapi import FastAPI
+from erp import async_client, erp_client
+from erp.async_client import AsyncErpClient
+from erp.cache import product_cache
+from erp.database import init_db
+from erp.routes import QuotationRequest, router
+from erp.session import ErpSession
+from tests.odata_stub import ODataStubServer
+
+
+def probe():
+    return {"ok": True}
+
+
+def build_before_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/erp/quotation")
+    def create_product_quotation(request: QuotationRequest):
+        return erp_client.get_product_quotation(request.product_number, request.phone_number, request.name)
+
+    app.get("/probe")(probe)
+    return app
+
+
+def build_after_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(router)
+    app.get("/probe")(probe)
+    return app
+
+
+async def run(app: FastAPI, mode: str, requests: int, latency: float) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        async def quote(index):
+            started = time.perf_counter()
+            response = await client.post("/erp/quotation", json={
+                "product_number": f"{mode.upper()}{index:05d}",
+                "phone_number": f"0711{index:06d}",
+            })
+            response.raise_for_status()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(quote(index)) for index in range(requests)]
+        await asyncio.sleep(latency)
+        probe_started = time.perf_counter()
+        (await client.get("/probe")).raise_for_status()
+        probe_ms = round((time.perf_counter() - probe_started) * 1000, 1)
+        latencies = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+    return {
+        "mode": mode,
+        "requests": requests,
+        "seconds": round(elapsed, 2),
+        "req_per_s": round(requests / elapsed, 1),
+        **latency_summary(latencies),
+        "probe_ms": probe_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.1, help="stub ERP response time in seconds")
+    # FastAPI's threadpool has 40 threads, so "before" has at most 40 ERP calls in flight
+    parser.add_argument("--erp-concurrency", type=int, default=40, help="ERP_MAX_CONCURRENCY for the async client")
+    args = parser.parse_args()
+
+    init_db()
+    stub = ODataStubServer(delay=args.latency)
+    stub.start()
+    erp_client.erp_session = ErpSession(base_url=stub.url)
+    async_client.async_erp_client = AsyncErpClient(
+        base_url=stub.url, pool_size=args.erp_concurrency, max_concurrency=args.erp_concurrency
+    )
+
+    rows = []
+    try:
+        for mode, app in (("before", build_before_app()), ("after", build_after_app())):
+            product_cache.invalidate()
+            stub.reset_counters()
+            # The ERP clients print every lookup; keep the report readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                row = asyncio.run(run(app, mode, args.requests, args.latency))
+            row["erp_peak_in_flight"] = stub.peak_in_flight
+            rows.append(row)
+    finally:
+        stub.stop()
+
+    print(f"/erp/quotation, {args.requests} concurrent calls, stub ERP latency {args.latency * 1000:.0f} ms")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
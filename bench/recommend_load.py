@@ -0,0 +1,91 @@
+"""
+Load test for the LLM-backed recommendation routes of a running API.
+
+    uvicorn main:app --port 8000 &
+    python -m bench.recommend_load --url http://localhost:8000 [--levels 1,4,8,16,32] [--path /api/recommend]
+
+At each concurrency level it sends that many requests at once, built from the
+reference questionnaires in tests/fixtures/reference_recommendations.json, and reports
+throughput, latency and the most OpenAI/Pinecone calls seen in flight in
+/upstream/stats. Each request gets a distinct location so the LLM and embedding
+caches miss and the upstream calls are really made (use --repeat-prompts to
+measure the cached path instead). With a non-blocking pipeline throughput grows
+with the level until OPENAI_MAX_CONCURRENCY is reached.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List
+import httpx
+from bench.common import latency_summary, print_table
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures", "reference_recommendations.json")
+
+
+def questionnaires() -> List[Dict[str, Any]]:
+    with open(FIXTURES) as f:
+        return [case["questionnaire"] for case in json.load(f)]
+
+
+async def run_level(client: httpx.AsyncClient, path: str, level: int, run: int, repeat_prompts: bool) -> Dict[str, Any]:
+    base = questionnaires()
+
+    async def recommend(index: int) -> float:
+        payload = dict(base[index % len(base)])
+        if not repeat_prompts:
+            payload["location"] = f"{payload['location']} (load test {run}-{index})"
+        started = time.perf_counter()
+        response = await client.post(path, params={"mode": "llm"}, json=payload)
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    peaks = {"openai": 0, "pinecone": 0}
+
+    async def sample_upstream():
+        # peak_in_flight in /upstream/stats is process-wide, so sample in_flight per level
+        while True:
+            upstream = (await client.get("/upstream/stats")).json()
+            for name in peaks:
+                peaks[name] = max(peaks[name], upstream[name]["in_flight"])
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.create_task(sample_upstream())
+    started = time.perf_counter()
+    try:
+        latencies = await asyncio.gather(*(recommend(index) for index in range(level)))
+    finally:
+        sampler.cancel()
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": level,
+        "seconds": round(elapsed, 2),
+        "req_per_s": round(level / elapsed, 2),
+        **latency_summary(latencies),
+        "openai_in_flight": peaks["openai"],
+        "pinecone_in_flight": peaks["pinecone"],
+    }
+
+
+async def main(url: str, path: str, levels: List[int], repeat_prompts: bool):
+    run = int(time.time())
+    rows = []
+    async with httpx.AsyncClient(base_url=url, timeout=600) as client:
+        for level in levels:
+            rows.append(await run_level(client, path, level, run, repeat_prompts))
+    baseline = rows[0]["req_per_s"] / rows[0]["concurrency"]
+    for row in rows:
+        row["speedup"] = f"{row['req_per_s'] / baseline:.1f}x"
+    print(f"POST {path}?mode=llm against {url}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/api/recommend")
+    parser.add_argument("--levels", default="1,4,8,16,32", help="comma-separated concurrency levels")
+    parser.add_argument("--repeat-prompts", action="store_true", help="send the fixture questionnaires unchanged")
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.path, [int(level) for level in args.levels.split(",")], args.repeat_prompts))
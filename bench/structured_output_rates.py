@@ -0,0 +1,151 @@
+"""
+Parse-failure and retry rates of the free-form recommendation call versus the
+strict structured-output call that replaced it.
+
+    python -m bench.structured_output_rates [--repeats 5]
+
+Needs OPENAI_API_KEY. For every reference questionnaire in
+tests/fixtures/reference_recommendations.json it makes the same recommendation request
+both ways, without Pinecone context and bypassing the LLM cache:
+
+- before: the old free-form prompt (the JSON template the model had to imitate),
+  parsed with the old fenced-block / `\\{[\\s\\S]*\\}` regexes. A parse failure is
+  what used to trigger the second "extraction" model call.
+- after: structured_recommendation_model (json_schema, strict), where a missing
+  `parsed` result is a parse failure that falls back to the rules recommender.
+
+Both modes also count responses naming a system that is not in the ERP catalog.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+from typing import Any, Dict, List
+from bench.common import print_table, use_temp_stores
+
+use_temp_stores()
+
+from triaging.data_table import solar_water_heaters
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures", "reference_recommendations.json")
+
+# Output format section of the free-form recommendation prompt before structured output
+LEGACY_FORMAT_INSTRUCTIONS = """
+    Format your response as a JSON object with these specific fields (do NOT include any comments in the JSON):
+    ```json
+    {
+      "primary_recommendation": {
+        "name": "EXACT SYSTEM NAME",
+        "model": "MODEL NUMBER",
+        "description": "Brief description of benefits and features",
+        "specifications": {
+          "tank_size": "XXX Liters",
+          "collector_type": "Type of collector",
+          "heat_output": "XX kWh/day (max)",
+          "suitable_for": "Up to X people"
+        }
+      },
+      "alternative_options": [
+        {
+          "name": "EXACT SYSTEM NAME",
+          "model": "MODEL NUMBER",
+          "description": "Brief description",
+          "specifications": {
+            "tank_size": "XXX Liters",
+            "collector_type": "Type of collector"
+          },
+          "price_category": "High/Medium/Low"
+        }
+      ],
+      "water_quality_requirements": [{"parameter": "Parameter name", "value": "Recommended value"}],
+      "additional_components": [{"name": "Component name", "description": "Brief description of purpose"}],
+      "technical_specifications": [{"parameter": "Parameter name", "value": "Value"}],
+      "installation_notes": ["Installation tip 1", "Installation tip 2", "Installation tip 3"],
+      "warranty": {"tank": "X years", "collector": "X years", "parts": "X years"}
+    }
+    ```
+    """
+
+
+def legacy_parse(response_text: str) -> Dict[str, Any]:
+    """The regex extraction the free-form path used before structured output"""
+    json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', response_text)
+    if json_match:
+        return json.loads(json_match.group(1))
+    json_match = re.search(r'(\{[\s\S]*\})', response_text)
+    if json_match:
+        return json.loads(json_match.group(1))
+    return json.loads(response_text)
+
+
+def system_names(parsed: Dict[str, Any]) -> List[str]:
+    systems = [parsed.get("primary_recommendation") or {}] + list(parsed.get("alternative_options") or [])
+    return [system.get("name", "") for system in systems]
+
+
+def classify_legacy_response(response_text: str) -> str:
+    """"ok", "parse_failure" (the old code re-prompted the model) or "invalid_names" """
+    try:
+        parsed = legacy_parse(response_text)
+        names = system_names(parsed)
+    except (json.JSONDecodeError, AttributeError):
+        return "parse_failure"
+    if any(name not in solar_water_heaters for name in names):
+        return "invalid_names"
+    return "ok"
+
+
+async def run(repeats: int) -> List[Dict[str, Any]]:
+    from triaging.schemas import QuestionnaireResponse
+    from triaging.services import build_recommendation_messages, model, structured_recommendation_model
+
+    with open(FIXTURES) as f:
+        cases = json.load(f)
+
+    counts = {mode: {"ok": 0, "parse_failure": 0, "invalid_names": 0} for mode in ("before", "after")}
+    for _ in range(repeats):
+        for case in cases:
+            messages = build_recommendation_messages(case["analysis"], [], QuestionnaireResponse(**case["questionnaire"]))
+            legacy_messages = [messages[0], {"role": "user", "content": messages[1]["content"] + LEGACY_FORMAT_INSTRUCTIONS}]
+
+            result = await model.ainvoke(legacy_messages)
+            counts["before"][classify_legacy_response(result.content)] += 1
+
+            result = await structured_recommendation_model.ainvoke(messages)
+            if result["parsed"] is None:
+                counts["after"]["parse_failure"] += 1
+            elif any(name not in solar_water_heaters for name in system_names(result["parsed"].model_dump())):
+                counts["after"]["invalid_names"] += 1
+            else:
+                counts["after"]["ok"] += 1
+
+    rows = []
+    for mode, outcome in counts.items():
+        calls = sum(outcome.values())
+        # Only the free-form path re-prompted; the structured path falls back to rules instead
+        retries = outcome["parse_failure"] if mode == "before" else 0
+        rows.append({
+            "mode": mode,
+            "calls": calls,
+            "parse_failures": outcome["parse_failure"],
+            "invalid_names": outcome["invalid_names"],
+            "retry_calls": retries,
+            "retry_rate": f"{retries / calls:.1%}",
+            "parse_failure_rate": f"{outcome['parse_failure'] / calls:.1%}",
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5, help="requests per reference questionnaire and mode")
+    args = parser.parse_args()
+    # Every call must reach the model, or repeated prompts would only measure the cache
+    os.environ["LLM_CACHE_ENABLED"] = "False"
+    rows = asyncio.run(run(args.repeats))
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+import asyncio
+import contextlib
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "True").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", str(Path(__file__).resolve().parent / "embedding_cache.db"))
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "2000"))
+EMBEDDING_CACHE_DISK_ENTRIES = int(os.getenv("EMBEDDING_CACHE_DISK_ENTRIES", "100000"))
+
+
+def content_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Two-level vector cache: an in-memory LRU in front of a SQLite table of float32 blobs.
+    Entries are keyed by (model, content hash), so a different embedding model never
+    reads vectors produced by another one.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, memory_entries: int = EMBEDDING_CACHE_MEMORY_ENTRIES, disk_entries: int = EMBEDDING_CACHE_DISK_ENTRIES):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self._memory: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_cache ("
+                "model TEXT NOT NULL, key TEXT NOT NULL, vector BLOB NOT NULL, last_access REAL NOT NULL, "
+                "PRIMARY KEY (model, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_embedding_cache_last_access ON embedding_cache (last_access)")
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # `with conn` only commits or rolls back; close the connection as well
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _remember(self, cache_key: Tuple[str, str], vector: List[float]):
+        with self._lock:
+            self._memory[cache_key] = vector
+            self._memory.move_to_end(cache_key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def purge_other_models(self, models: List[str]) -> int:
+        """
+        Maintenance: drop vectors written by any model not in `models`, e.g. after switching
+        embedding model. Never called implicitly, since processes sharing the file may use
+        other models; otherwise old vectors only leave through LRU eviction.
+        Returns the number of disk rows removed.
+        """
+        placeholders = ",".join("?" * len(models))
+        with self._connect() as conn:
+            removed = conn.execute(f"DELETE FROM embedding_cache WHERE model NOT IN ({placeholders})", list(models)).rowcount
+        with self._lock:
+            for cache_key in [k for k in self._memory if k[0] not in models]:
+                del self._memory[cache_key]
+        return removed
+
+    def get_memory(self, model: str, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._memory.get((model, key))
+            if vector is not None:
+                self._memory.move_to_end((model, key))
+                self.memory_hits += 1
+        return vector
+
+    def get_many(self, model: str, keys: List[str]) -> Dict[str, List[float]]:
+        """Return cached vectors for `keys`, from memory first and then from disk"""
+        found = {}
+        missing = []
+        for key in keys:
+            vector = self.get_memory(model, key)
+            if vector is not None:
+                found[key] = vector
+            else:
+                missing.append(key)
+
+        if missing:
+            unique = list(dict.fromkeys(missing))
+            with self._connect() as conn:
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE model = ? AND key IN ({','.join('?' * len(unique))})",
+                    [model, *unique],
+                ).fetchall()
+                if rows:
+                    conn.executemany(
+                        "UPDATE embedding_cache SET last_access = ? WHERE model = ? AND key = ?",
+                        [(time.time(), model, key) for key, _ in rows],
+                    )
+            for key, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                self._remember((model, key), vector)
+                found[key] = vector
+            self.disk_hits += sum(1 for key in missing if key in found)
+            self.misses += sum(1 for key in missing if key not in found)
+        return found
+
+    def set_many(self, model: str, vectors: Dict[str, List[float]]):
+        now = time.time()
+        for key, vector in vectors.items():
+            self._remember((model, key), vector)
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (model, key, vector, last_access) VALUES (?, ?, ?, ?)",
+                [(model, key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in vectors.items()],
+            )
+            count = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+            if count > self.disk_entries:
+                conn.execute(
+                    "DELETE FROM embedding_cache WHERE rowid IN (SELECT rowid FROM embedding_cache ORDER BY last_access LIMIT ?)",
+                    (count - self.disk_entries,),
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        with self._connect() as conn:
+            disk_entries = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        return {
+            "memory_entries": len(self._memory),
+            "disk_entries": disk_entries,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else None,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wrap a LangChain Embeddings model so repeated texts are embedded only once.
+    `limiter` (an upstream.UpstreamLimiter) is held only around calls to the model on
+    a cache miss, so hits never queue behind slow upstream requests.
+    """
+
+    def __init__(self, embeddings: Embeddings, store: "EmbeddingStore", limiter: Any = None):
+        self.embeddings = embeddings
+        self.store = store
+        self.limiter = limiter
+        # OpenAIEmbeddings exposes `model`; other providers may use `model_name`
+        self.model = str(getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None) or type(embeddings).__name__)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [content_key(text) for text in texts]
+        found = self.store.get_many(self.model, keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.store.set_many(self.model, computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = content_key(text)
+        vector = self.store.get_many(self.model, [key]).get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.store.set_many(self.model, {key: vector})
+        return vector
+
+    def _upstream(self):
+        return self.limiter if self.limiter is not None else contextlib.nullcontext()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [content_key(text) for text in texts]
+        found = await asyncio.to_thread(self.store.get_many, self.model, keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            async with self._upstream():
+                vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            await asyncio.to_thread(self.store.set_many, self.model, computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = content_key(text)
+        # Memory hits are answered without leaving the event loop
+        vector = self.store.get_memory(self.model, key)
+        if vector is not None:
+            return vector
+        vector = (await asyncio.to_thread(self.store.get_many, self.model, [key])).get(key)
+        if vector is None:
+            async with self._upstream():
+                vector = await self.embeddings.aembed_query(text)
+            await asyncio.to_thread(self.store.set_many, self.model, {key: vector})
+        return vector
+
+
+class LimitedEmbeddings(Embeddings):
+    """Embeddings model whose async calls hold `limiter`; used when caching is disabled"""
+
+    def __init__(self, embeddings: Embeddings, limiter: Any):
+        self.embeddings = embeddings
+        self.limiter = limiter
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        async with self.limiter:
+            return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        async with self.limiter:
+            return await self.embeddings.aembed_query(text)
+
+
+embedding_store = EmbeddingStore() if EMBEDDING_CACHE_ENABLED else None
+# Models wrapped by cached_embeddings in this process
+embedding_models_in_use = set()
+
+
+def cached_embeddings(embeddings: Embeddings, limiter: Any = None) -> Embeddings:
+    """
+    Return `embeddings` wrapped in the shared cache, or unchanged when caching is
+    disabled. With `limiter`, only upstream calls (cache misses) take a limiter slot.
+    """
+    if embedding_store is None:
+        return embeddings if limiter is None else LimitedEmbeddings(embeddings, limiter)
+    cached = CachedEmbeddings(embeddings, embedding_store, limiter)
+    embedding_models_in_use.add(cached.model)
+    return cached
+
+
+def purge_unused_embedding_models() -> Dict[str, Any]:
+    """Drop cached vectors of every model this process does not embed with"""
+    if embedding_store is None or not embedding_models_in_use:
+        return {"removed": 0, "kept_models": sorted(embedding_models_in_use)}
+    removed = embedding_store.purge_other_models(sorted(embedding_models_in_use))
+    return {"removed": removed, "kept_models": sorted(embedding_models_in_use)}
+
+
+def embedding_cache_stats() -> Dict[str, Any]:
+    if embedding_store is None:
+        return {"enabled": False}
+    return dict(embedding_store.stats(), enabled=True)
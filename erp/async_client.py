@@ -0,0 +1,508 @@
+import asyncio
+import json
+import os
+import urllib.parse
+from typing import Any, AsyncIterator, Dict, List, Optional
+import httpx
+from dotenv import load_dotenv
+
+from .session import (
+    ERP_BASE_URL,
+    USERNAME,
+    PASSWORD,
+    ERP_POOL_SIZE,
+    ERP_CONNECT_TIMEOUT,
+    ERP_READ_TIMEOUT,
+    ERP_MAX_RETRIES,
+    ERP_BACKOFF_FACTOR,
+    RETRY_STATUS_CODES,
+)
+from .erp_client import build_product_quotation
+from .cache import product_cache, product_cache_key, STALE, MISS
+from .odata import Projection, build_path
+from .singleflight import erp_single_flight
+from .catalog_mirror import get_mirrored_product
+
+load_dotenv()
+
+# Maximum number of ERP requests in flight at once. Requests beyond this wait
+# for a slot instead of piling onto a stalled ERP server.
+ERP_MAX_CONCURRENCY = int(os.getenv("ERP_MAX_CONCURRENCY", str(ERP_POOL_SIZE)))
+
+# Upper bound on the length of a batched $filter expression so request URLs stay
+# under the Business Central / IIS URL limit.
+ERP_MAX_FILTER_LENGTH = int(os.getenv("ERP_MAX_FILTER_LENGTH", "1500"))
+
+
+class AsyncErpClient:
+    """
+    asyncio counterpart of erp.session.ErpSession built on httpx.AsyncClient.
+
+    Shares the same pool, timeout and retry settings, and bounds concurrent
+    ERP calls with a semaphore so a slow ERP cannot starve the event loop's
+    other work.
+    """
+
+    def __init__(
+        self,
+        base_url: str = ERP_BASE_URL,
+        username: str = USERNAME,
+        password: str = PASSWORD,
+        pool_size: int = ERP_POOL_SIZE,
+        max_concurrency: int = ERP_MAX_CONCURRENCY,
+        max_retries: int = ERP_MAX_RETRIES,
+        backoff_factor: float = ERP_BACKOFF_FACTOR,
+    ):
+        self.base_url = base_url
+        self.auth = httpx.BasicAuth(username or "", password or "")
+        self.timeout = httpx.Timeout(ERP_READ_TIMEOUT, connect=ERP_CONNECT_TIMEOUT)
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_concurrency = max_concurrency
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                auth=self.auth,
+                timeout=self.timeout,
+                headers={"Accept": "application/json"},
+                # Retry connection failures; status retries are handled in request()
+                transport=httpx.AsyncHTTPTransport(retries=self.max_retries, limits=self.limits),
+            )
+        return self._client
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def url(self, path: str) -> str:
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.base_url}/{path}"
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        # Only idempotent requests are retried on 429/5xx responses
+        attempts = self.max_retries + 1 if method == "GET" else 1
+        async with self.semaphore:
+            for attempt in range(attempts):
+                response = await self.client.request(method, self.url(path), **kwargs)
+                if response.status_code not in RETRY_STATUS_CODES or attempt == attempts - 1:
+                    return response
+                retry_after = response.headers.get("Retry-After")
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else self.backoff_factor * (2 ** attempt)
+                await asyncio.sleep(delay)
+        return response
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    async def delete(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", path, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Shared async client used by the /erp routes
+async_erp_client = AsyncErpClient()
+
+# Strong references to fire-and-forget refresh tasks
+_background_tasks = set()
+
+
+async def post_to_erp(entity_name: str, data: Dict[str, Any]):
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": "application/json"
+    }
+
+    response = await async_erp_client.post(entity_name, content=json.dumps(data), headers=headers)
+
+    if response.status_code in [200, 201, 202]:
+        return response.json() if response.text else {"message": "Success"}
+    else:
+        raise Exception(f"Failed to post data: {response.status_code} - {response.text}")
+
+async def create_sales_quote_line(data: Dict[str, Any]):
+    """
+    Create a new sales quote line item
+
+    Returns:
+        The response from the ERP system
+    """
+    return await post_to_erp("Sales_QuoteSalesLines", data)
+
+def _batch_endpoint():
+    """
+    Split ERP_BASE_URL into the OData service root's $batch URL and the prefix
+    (e.g. "Company('CRONUS')") that batched request URLs are relative to.
+    """
+    base_url = async_erp_client.base_url or ""
+    marker = base_url.find("/Company(")
+    if marker == -1:
+        return f"{base_url}/$batch", ""
+    return f"{base_url[:marker]}/$batch", base_url[marker + 1:] + "/"
+
+async def send_batch_to_erp(entity_name: str, items: List[Dict[str, Any]], atomic: bool = True) -> List[Dict[str, Any]]:
+    """
+    POST several records to one entity in a single OData JSON $batch request.
+    With atomic=True all records share one atomicity group (changeset), so ERP
+    commits either all of them or none.
+
+    Returns the raw per-request responses ({"id", "status", "body"}) in request order.
+    """
+    batch_url, prefix = _batch_endpoint()
+    batch_requests = []
+    for index, item in enumerate(items, start=1):
+        batch_request = {
+            "id": str(index),
+            "method": "POST",
+            "url": f"{prefix}{entity_name}",
+            "headers": {"Content-Type": "application/json"},
+            "body": item,
+        }
+        if atomic:
+            batch_request["atomicityGroup"] = "changeset"
+        batch_requests.append(batch_request)
+
+    response = await async_erp_client.post(
+        batch_url,
+        content=json.dumps({"requests": batch_requests}),
+        headers={"Content-Type": "application/json", "Accept": "application/json"},
+    )
+    if response.status_code != 200:
+        raise Exception(f"Failed to post batch: {response.status_code} - {response.text}")
+
+    return sorted(response.json().get("responses", []), key=lambda r: int(r.get("id", 0)))
+
+async def post_batch_to_erp(entity_name: str, items: List[Dict[str, Any]], atomic: bool = True) -> List[Dict[str, Any]]:
+    """
+    Like send_batch_to_erp, but raises if any record failed.
+
+    Returns the created records in request order.
+    """
+    responses = await send_batch_to_erp(entity_name, items, atomic=atomic)
+    failed = [r for r in responses if r.get("status") not in [200, 201, 202, 204]]
+    if failed or len(responses) != len(items):
+        details = "; ".join(f"{r.get('id')}: {r.get('status')} - {r.get('body')}" for r in failed)
+        raise Exception(f"Failed to post batch: {details or 'incomplete batch response'}")
+
+    return [r.get("body") or {"message": "Success"} for r in responses]
+
+async def delete_sales_quote(document_no: str, document_type: str = "Quote"):
+    """Delete a sales quote header (and its lines) from ERP"""
+    encoded_no = urllib.parse.quote(document_no.replace("'", "''"))
+    path = f"Sales_Quote(Document_Type='{document_type}',No='{encoded_no}')"
+
+    response = await async_erp_client.delete(path, headers={"If-Match": "*"})
+    if response.status_code not in [200, 204]:
+        raise Exception(f"Failed to delete sales quote: {response.status_code} - {response.text}")
+
+async def create_sales_quote_with_lines(header: Dict[str, Any], lines: List[Dict[str, Any]]):
+    """
+    Create a sales quote header and all of its lines.
+
+    The header is created first because its number comes from the ERP number series
+    and every line must reference it. The lines then go out in one atomic $batch
+    changeset. If that fails the header is deleted again, so the quote is created
+    completely or not at all.
+    """
+    created_header = await post_to_erp("Sales_Quote", header)
+    document_no = created_header.get("No")
+    if not document_no:
+        raise Exception("ERP did not return a document number for the sales quote")
+
+    if not lines:
+        return {"document_no": document_no, "header": created_header, "lines": []}
+
+    document_type = created_header.get("Document_Type", "Quote")
+    line_items = [dict(line, Document_Type=document_type, Document_No=document_no) for line in lines]
+    try:
+        created_lines = await post_batch_to_erp("Sales_QuoteSalesLines", line_items, atomic=True)
+    except Exception as batch_error:
+        try:
+            await delete_sales_quote(document_no, document_type)
+        except Exception as cleanup_error:
+            raise Exception(f"{batch_error}; additionally failed to roll back sales quote {document_no}: {cleanup_error}")
+        raise
+
+    return {"document_no": document_no, "header": created_header, "lines": created_lines}
+
+async def fetch_referrence_number(reference: str):
+    encoded_number = urllib.parse.quote(reference)
+    path = f"Sales_Quote?$filter=Reference eq '{encoded_number}'"
+
+    response = await async_erp_client.get(path)
+    if response.status_code == 200:
+        data = response.json()
+        if not data.get('value') or len(data['value']) == 0:
+            return {"message": "No Reference found with the given number", "data": None}
+        return data
+    else:
+        raise Exception(f"Failed: {response.status_code} - {response.text}")
+
+async def fetch_entity(entity_name: str, entity_id: str = None, top: int = 100, skip: int = 0, select: Projection = None, filter: str = None, orderby: str = None):
+    path = build_path(entity_name, entity_id, top=top, skip=skip, select=select, filter=filter, orderby=orderby)
+
+    response = await async_erp_client.get(path)
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(f"Failed: {response.status_code} - {response.text}")
+
+async def _fetch_page(path: str) -> Dict[str, Any]:
+    response = await async_erp_client.get(path)
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(f"Failed: {response.status_code} - {response.text}")
+
+async def _fetch_shared(path: str) -> Dict[str, Any]:
+    """
+    GET a lookup path, sharing one upstream request between identical concurrent
+    lookups. The path carries the entity, $filter and $select, so it is the key.
+    """
+    return await erp_single_flight.do(path, lambda: _fetch_page(path))
+
+async def iter_entity(entity_name: str, page_size: int = 500, prefetch: bool = True, select: Projection = None, filter: str = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield every row of an entity, one page at a time.
+
+    Follows @odata.nextLink when ERP returns one and otherwise advances $skip until a
+    short page comes back. At most the current page and (with prefetch) the next one
+    are held in memory, regardless of the entity's size.
+    """
+    skip = 0
+    next_path = build_path(entity_name, top=page_size, skip=skip, select=select, filter=filter)
+    pending = asyncio.create_task(_fetch_page(next_path))
+    try:
+        while pending is not None:
+            page = await pending
+            pending = None
+            rows = page.get('value', [])
+
+            next_link = page.get('@odata.nextLink')
+            if next_link:
+                next_path = next_link
+            elif len(rows) == page_size:
+                skip += page_size
+                next_path = build_path(entity_name, top=page_size, skip=skip, select=select, filter=filter)
+            else:
+                next_path = None
+
+            # Start fetching the next page while the caller consumes this one
+            if next_path and prefetch:
+                pending = asyncio.create_task(_fetch_page(next_path))
+
+            for row in rows:
+                yield row
+
+            if next_path and not prefetch:
+                pending = asyncio.create_task(_fetch_page(next_path))
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+async def fetch_customer_by_phone_number(Phone_No: str, projection: Projection = None):
+    encoded_number = urllib.parse.quote(Phone_No)
+    path = build_path("Customer_Card", select=projection, filter=f"Phone_No eq '{encoded_number}'")
+
+    data = await _fetch_shared(path)
+    if not data.get('value') or len(data['value']) == 0:
+        return {"message": "No customer found with the given number", "data": None}
+    return data
+
+async def fetch_product_by_number(product_number: str, projection: Projection = "quotation"):
+    """
+    Look up a product, serving repeat lookups from the in-process product cache.
+    Stale entries are returned immediately and refreshed in the background.
+    """
+    cache_key = product_cache_key(product_number, projection)
+    cached, state = product_cache.get(cache_key)
+    if state == STALE:
+        _schedule_refresh(product_number, projection)
+    if state != MISS:
+        return cached
+
+    # Read from the local catalog mirror before going to ERP; it holds the quotation projection
+    mirrored = None
+    if cache_key == product_number:
+        mirrored = await asyncio.to_thread(get_mirrored_product, product_number)
+    if mirrored:
+        data = {"value": [mirrored]}
+    else:
+        data = await _fetch_product_from_erp(product_number, projection)
+    if data.get('value'):
+        product_cache.set(cache_key, data)
+    return data
+
+def _schedule_refresh(product_number: str, projection: Projection = "quotation"):
+    if product_cache.begin_refresh(product_cache_key(product_number, projection)):
+        task = asyncio.create_task(_refresh_product(product_number, projection))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+async def _refresh_product(product_number: str, projection: Projection = "quotation"):
+    cache_key = product_cache_key(product_number, projection)
+    try:
+        data = await _fetch_product_from_erp(product_number, projection)
+        if data.get('value'):
+            product_cache.set(cache_key, data)
+        else:
+            product_cache.invalidate(cache_key)
+    except Exception as e:
+        print(f"Error refreshing cached product {product_number}: {str(e)}")
+    finally:
+        product_cache.end_refresh(cache_key)
+
+async def _fetch_product_from_erp(product_number: str, projection: Projection = "quotation"):
+    encoded_number = urllib.parse.quote(product_number)
+    path = build_path("ItemsAPI", select=projection, filter=f"No eq '{encoded_number}'")
+
+    data = await _fetch_shared(path)
+    if not data.get('value') or len(data['value']) == 0:
+        return {"message": "No product found with the given number", "data": None}
+    return data
+
+async def fetch_customer_by_field(field: str, value: str, projection: Projection = None):
+    encoded_value = urllib.parse.quote(value)
+
+    allowed_fields = ["Phone_No", "Name", "No"]
+    if field not in allowed_fields:
+        raise ValueError("Invalid search field")
+
+    path = build_path("Customer_Card", select=projection, filter=f"{field} eq '{encoded_value}'")
+
+    data = await _fetch_shared(path)
+    if not data.get('value'):
+        return {"message": "No customer found", "data": None}
+    return data
+
+async def resolve_customer(phone_number: str = None, name: str = None):
+    """Look up the customer by phone number, falling back to name"""
+    customer_data = None
+    if phone_number:
+        customer_response = await fetch_customer_by_field("Phone_No", phone_number, projection="customer_summary")
+        if customer_response.get('value'):
+            customer_data = customer_response['value'][0]
+
+    if not customer_data and name:
+        customer_response = await fetch_customer_by_field("Name", name, projection="customer_summary")
+        if customer_response.get('value'):
+            customer_data = customer_response['value'][0]
+
+    return customer_data
+
+async def get_product_quotation(product_number: str, phone_number: str = None, name: str = None):
+    # Validate that either phone_number or name is provided
+    if not phone_number and not name:
+        return {
+            "status": "error",
+            "message": "Either phone number or name must be provided",
+            "data": None
+        }
+
+    # The product does not depend on the customer, so resolve both concurrently.
+    # Within resolve_customer the name lookup is still only issued on a phone miss.
+    customer_data, product_response = await asyncio.gather(
+        resolve_customer(phone_number, name),
+        fetch_product_by_number(product_number),
+    )
+
+    return build_product_quotation(product_number, product_response, customer_data)
+
+def _chunk_product_filters(product_numbers: List[str], max_length: int = ERP_MAX_FILTER_LENGTH) -> List[str]:
+    """Split product numbers into `No eq 'A' or No eq 'B'` filters that fit in one request URL"""
+    filters = []
+    clauses: List[str] = []
+    length = 0
+    for number in product_numbers:
+        clause = f"No eq '{urllib.parse.quote(number)}'"
+        added = len(clause) + (4 if clauses else 0)
+        if clauses and length + added > max_length:
+            filters.append(" or ".join(clauses))
+            clauses, length = [], 0
+            added = len(clause)
+        clauses.append(clause)
+        length += added
+    if clauses:
+        filters.append(" or ".join(clauses))
+    return filters
+
+def _product_key(number: Optional[str]) -> str:
+    return (number or "").strip().upper()
+
+async def fetch_products_by_numbers(product_numbers: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Look up several products at once. Cached and mirrored products are served locally;
+    the rest are fetched with as few ItemsAPI requests as the URL length allows.
+    """
+    # ERP item numbers are upper-case codes; match requested and returned numbers on that form
+    products: Dict[str, Optional[Dict[str, Any]]] = {}
+    missing = []
+    for number in dict.fromkeys(_product_key(number) for number in product_numbers):
+        cached, state = product_cache.get(number)
+        if state == STALE:
+            _schedule_refresh(number)
+        if state != MISS:
+            products[number] = cached['value'][0]
+            continue
+        mirrored = await asyncio.to_thread(get_mirrored_product, number)
+        if mirrored:
+            product_cache.set(number, {"value": [mirrored]})
+            products[number] = mirrored
+        else:
+            missing.append(number)
+
+    for product_filter in _chunk_product_filters(missing):
+        response = await async_erp_client.get(build_path("ItemsAPI", select="quotation", filter=product_filter))
+        if response.status_code != 200:
+            raise Exception(f"Failed: {response.status_code} - {response.text}")
+        for item in response.json().get('value', []):
+            number = _product_key(item.get('No'))
+            product_cache.set(number, {"value": [item]})
+            products[number] = item
+
+    return {number: products.get(_product_key(number)) for number in product_numbers}
+
+async def get_batch_product_quotation(product_numbers: List[str], phone_number: str = None, name: str = None):
+    """
+    Build one quotation per product number, resolving the customer once and
+    fetching all products in a single (chunked) ItemsAPI request.
+    """
+    if not phone_number and not name:
+        return {
+            "status": "error",
+            "message": "Either phone number or name must be provided",
+            "data": None
+        }
+
+    customer_data, products = await asyncio.gather(
+        resolve_customer(phone_number, name),
+        fetch_products_by_numbers(product_numbers),
+    )
+
+    quotations = []
+    for number in product_numbers:
+        product_response = {"value": [products[number]]} if products.get(number) else {}
+        quotations.append(build_product_quotation(number, product_response, customer_data))
+
+    return {
+        "status": "success",
+        "message": f"Generated {sum(q['status'] == 'success' for q in quotations)} of {len(quotations)} quotations",
+        "data": {
+            "customer": customer_data,
+            "quotations": quotations
+        }
+    }
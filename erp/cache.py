@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from dotenv import load_dotenv
+
+from .odata import PROJECTIONS, Projection, resolve_projection
+
+load_dotenv()
+
+# Product prices change at most daily, so entries stay fresh for an hour and may be
+# served stale (while being refreshed in the background) for up to a day.
+ERP_PRODUCT_CACHE_TTL = float(os.getenv("ERP_PRODUCT_CACHE_TTL", "3600"))
+ERP_PRODUCT_CACHE_STALE_TTL = float(os.getenv("ERP_PRODUCT_CACHE_STALE_TTL", "86400"))
+ERP_PRODUCT_CACHE_MAX_ENTRIES = int(os.getenv("ERP_PRODUCT_CACHE_MAX_ENTRIES", "512"))
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache with per-entry TTL and a stale-while-revalidate window.
+
+    get() reports whether an entry is fresh, stale or missing. Stale entries can still
+    be served; callers claim the background refresh with begin_refresh() so only one
+    refresh per key runs at a time.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0, max_entries: int = 512):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Tuple[Optional[Any], str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, MISS
+
+            value, stored_at = entry
+            age = now - stored_at
+            if age > self.ttl + self.stale_ttl:
+                del self._entries[key]
+                self.misses += 1
+                return None, MISS
+
+            self._entries.move_to_end(key)
+            if age > self.ttl:
+                self.stale_hits += 1
+                return value, STALE
+            self.hits += 1
+            return value, FRESH
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            self._refreshing.discard(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def begin_refresh(self, key: Hashable) -> bool:
+        """Return True if the caller should refresh the key, False if a refresh is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: Hashable):
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> int:
+        """Remove one entry, or every entry when key is None. Returns the number removed."""
+        with self._lock:
+            if key is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                return removed
+            return 1 if self._entries.pop(key, None) is not None else 0
+
+    def invalidate_matching(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every entry whose key satisfies the predicate. Returns the number removed."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+            }
+
+
+# Shared cache for ItemsAPI lookups keyed by product number
+product_cache = TTLCache(
+    ttl=ERP_PRODUCT_CACHE_TTL,
+    stale_ttl=ERP_PRODUCT_CACHE_STALE_TTL,
+    max_entries=ERP_PRODUCT_CACHE_MAX_ENTRIES,
+)
+
+
+def product_cache_key(product_number: str, projection: Projection = "quotation") -> Hashable:
+    """
+    Cache key for a product lookup. The default quotation projection (also what the
+    catalog mirror stores) is keyed by product number alone; other projections get
+    their own entries.
+    """
+    fields = resolve_projection(projection)
+    if fields == PROJECTIONS["quotation"]:
+        return product_number
+    return (product_number, tuple(fields) if fields else None)
+
+
+def invalidate_product(product_number: str) -> int:
+    """Drop every cached projection of a product"""
+    return product_cache.invalidate_matching(
+        lambda key: key == product_number or (isinstance(key, tuple) and key[0] == product_number)
+    )
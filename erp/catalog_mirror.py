@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+from erp.database import SessionLocal
+from erp.model import CatalogItem, CatalogSyncState
+from .erp_client import fetch_entity
+from .odata import PROJECTIONS
+
+load_dotenv()
+
+# How often the background job re-syncs ItemsAPI (seconds), and how many rows per page
+ERP_CATALOG_SYNC_ENABLED = os.getenv("ERP_CATALOG_SYNC_ENABLED", "True").lower() == "true"
+ERP_CATALOG_SYNC_INTERVAL = float(os.getenv("ERP_CATALOG_SYNC_INTERVAL", "3600"))
+ERP_CATALOG_PAGE_SIZE = int(os.getenv("ERP_CATALOG_PAGE_SIZE", "500"))
+# When no sync has succeeded within this many seconds the mirror is ignored and products
+# are read from ERP instead, so a failing sync cannot serve old prices forever
+ERP_CATALOG_MAX_AGE_SECONDS = float(os.getenv("ERP_CATALOG_MAX_AGE_SECONDS", "86400"))
+# Syncs in between only fetch items whose Last_Date_Modified is on or after the previous
+# sync; a full sync every this many seconds also picks up items deleted in ERP
+ERP_CATALOG_FULL_SYNC_INTERVAL = float(os.getenv("ERP_CATALOG_FULL_SYNC_INTERVAL", "86400"))
+
+# The mirror stores exactly the quotation projection
+MIRRORED_FIELDS = PROJECTIONS["quotation"]
+
+# Tank size as it appears in product descriptions, e.g. "UFS300D", "HPW 150LITRES", "CWS1500"
+CAPACITY_PATTERN = re.compile(r"\b[A-Z]{2,4}\s?(\d{2,4})")
+
+last_sync: Dict[str, Any] = {}
+
+
+def parse_capacity(description: Optional[str]) -> Optional[float]:
+    """Extract the tank capacity in litres from an item description"""
+    if not description:
+        return None
+    match = CAPACITY_PATTERN.search(description.upper())
+    return float(match.group(1)) if match else None
+
+
+def _row_hash(item: Dict[str, Any]) -> str:
+    payload = json.dumps({field: item.get(field) for field in MIRRORED_FIELDS}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _fetch_all_items(page_size: int = ERP_CATALOG_PAGE_SIZE, modified_since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Page through ItemsAPI with $top/$skip until a short page is returned.
+    Pages are ordered by No so rows cannot shift between pages while paging.
+    With `modified_since` only items modified on or after that day are fetched.
+    """
+    # Last_Date_Modified is a date in ERP's time zone; start a day early to cover the offset
+    filter_ = f"Last_Date_Modified ge {(modified_since - timedelta(days=1)).date().isoformat()}" if modified_since else None
+    items = []
+    skip = 0
+    while True:
+        page = fetch_entity("ItemsAPI", top=page_size, skip=skip, select="quotation", filter=filter_, orderby="No").get("value", [])
+        items.extend(page)
+        if len(page) < page_size:
+            return items
+        skip += page_size
+
+
+def get_sync_state() -> Optional[CatalogSyncState]:
+    db = SessionLocal()
+    try:
+        return db.get(CatalogSyncState, 1)
+    finally:
+        db.close()
+
+
+def sync_catalog(full: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Mirror ItemsAPI into the local catalog table.
+    A full sync pages through every item and removes items no longer in ERP; an incremental
+    sync only fetches items modified since the last sync. By default a sync is full when
+    the last full sync is older than ERP_CATALOG_FULL_SYNC_INTERVAL. Only rows whose
+    mirrored fields changed are rewritten; the sync time is recorded once, in CatalogSyncState.
+    """
+    started_at = datetime.utcnow()
+    state = get_sync_state()
+    if full is None:
+        full = state is None or state.Full_Synced_At < started_at - timedelta(seconds=ERP_CATALOG_FULL_SYNC_INTERVAL)
+    items = _fetch_all_items(modified_since=None if full or state is None else state.Synced_At)
+
+    inserted = updated = unchanged = deleted = 0
+    db = SessionLocal()
+    try:
+        existing = {no: row_hash for no, row_hash in db.query(CatalogItem.No, CatalogItem.Row_Hash)}
+        seen = set()
+
+        for item in items:
+            no = item.get("No")
+            if not no or no in seen:
+                continue
+            seen.add(no)
+
+            row_hash = _row_hash(item)
+            if existing.get(no) == row_hash:
+                unchanged += 1
+                continue
+
+            values = {field: item.get(field) for field in MIRRORED_FIELDS}
+            values["Capacity_Liters"] = parse_capacity(item.get("Description"))
+            values["Row_Hash"] = row_hash
+            values["Synced_At"] = started_at
+
+            if no in existing:
+                db.query(CatalogItem).filter(CatalogItem.No == no).update(values)
+                updated += 1
+            else:
+                db.add(CatalogItem(**values))
+                inserted += 1
+
+        if full:
+            removed = [no for no in existing if no not in seen]
+            if removed:
+                deleted = db.query(CatalogItem).filter(CatalogItem.No.in_(removed)).delete(synchronize_session=False)
+
+        # The whole mirror is now current as of started_at
+        state = db.get(CatalogSyncState, 1) or CatalogSyncState(Id=1, Full_Synced_At=started_at)
+        state.Synced_At = started_at
+        if full:
+            state.Full_Synced_At = started_at
+        db.merge(state)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    result = {
+        "full": full,
+        "fetched": len(items),
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": unchanged,
+        "deleted": deleted,
+        "started_at": started_at.isoformat(),
+        "finished_at": datetime.utcnow().isoformat(),
+    }
+    last_sync.clear()
+    last_sync.update(result)
+    return result
+
+
+def get_mirrored_product(product_number: str, max_age: float = ERP_CATALOG_MAX_AGE_SECONDS) -> Optional[Dict[str, Any]]:
+    """
+    Return the mirrored ItemsAPI record for a product number, or None when it is
+    missing or the last successful sync was more than `max_age` seconds ago
+    """
+    db = SessionLocal()
+    try:
+        state = db.get(CatalogSyncState, 1)
+        if state is None or state.Synced_At < datetime.utcnow() - timedelta(seconds=max_age):
+            return None
+        item = db.query(CatalogItem).filter(CatalogItem.No == product_number).first()
+        return item.to_erp_dict() if item else None
+    finally:
+        db.close()
+
+
+def search_catalog(
+    model: Optional[str] = None,
+    min_capacity: Optional[float] = None,
+    max_capacity: Optional[float] = None,
+    limit: int = 100,
+) -> List[Dict[str, Any]]:
+    """Filter the mirrored catalog by model family and capacity range"""
+    db = SessionLocal()
+    try:
+        query = db.query(CatalogItem)
+        if model:
+            query = query.filter(CatalogItem.Product_Model.ilike(f"%{model}%"))
+        if min_capacity is not None:
+            query = query.filter(CatalogItem.Capacity_Liters >= min_capacity)
+        if max_capacity is not None:
+            query = query.filter(CatalogItem.Capacity_Liters <= max_capacity)
+        items = query.order_by(CatalogItem.Capacity_Liters, CatalogItem.No).limit(limit).all()
+        return [dict(item.to_erp_dict(), Capacity_Liters=item.Capacity_Liters) for item in items]
+    finally:
+        db.close()
+
+
+async def run_catalog_sync_loop(interval: float = ERP_CATALOG_SYNC_INTERVAL):
+    """Background job: re-sync the catalog mirror every `interval` seconds"""
+    while True:
+        try:
+            result = await asyncio.to_thread(sync_catalog)
+            print(f"Catalog mirror synced: {result}")
+        except Exception as e:
+            print(f"Catalog mirror sync failed: {str(e)}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,42 @@
+import os
+from pathlib import Path
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Base directory
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Local ERP database (catalog mirror)
+ERP_DATABASE_URL = os.getenv("ERP_DATABASE_URL", f"sqlite:///{BASE_DIR}/erp.db")
+
+# Create SQLAlchemy engine
+engine = create_engine(ERP_DATABASE_URL, connect_args={"check_same_thread": False})
+
+# Create session factory
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Base class for ERP mirror models
+Base = declarative_base()
+
+# Initialize database
+def init_db():
+    # Import models so they are registered on Base before creating tables
+    from erp import model  # noqa: F401
+    Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+
+def _add_missing_columns():
+    """create_all leaves existing tables alone; add nullable columns introduced since"""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"))
@@ -1,20 +1,12 @@
 import datetime
 import json
-from typing import Any, Dict
-import requests
-from requests.auth import HTTPBasicAuth
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
-
-ERP_BASE_URL = os.getenv("ERP_BASE_URL")
-USERNAME = os.getenv("ERP_USERNAME")
-PASSWORD = os.getenv("ERP_PASSWORD")
+import threading
+from typing import Any, Dict, Optional
+from .session import erp_session
+from .cache import product_cache, product_cache_key, STALE, MISS
+from .odata import Projection, build_path
 
 def post_to_erp(entity_name: str, data: Dict[str, Any]):
-    url = f"{ERP_BASE_URL}/{entity_name}"
-    
     headers = {
         "Content-Type": "application/json",
         "Accept": "application/json"
@@ -23,12 +15,7 @@ def post_to_erp(entity_name: str, data: Dict[str, Any]):
     # Convert data to JSON string
     json_data = json.dumps(data)
     
-    response = requests.post(
-        url,
-        auth=HTTPBasicAuth(USERNAME, PASSWORD),
-        headers=headers,
-        data=json_data
-    )
+    response = erp_session.post(entity_name, data=json_data, headers=headers)
     
     if response.status_code in [200, 201, 202]:
         return response.json() if response.text else {"message": "Success"}
@@ -42,9 +29,9 @@ def fetch_referrence_number(reference: str):
     encoded_number = urllib.parse.quote(reference)
     
     # Build URL with filter for exact Reference number
-    url = f"{ERP_BASE_URL}/Sales_Quote?$filter=Reference eq '{encoded_number}'"
+    path = f"Sales_Quote?$filter=Reference eq '{encoded_number}'"
     
-    response = requests.get(url, auth=HTTPBasicAuth(USERNAME, PASSWORD))
+    response = erp_session.get(path)
     if response.status_code == 200:
         data = response.json()
         print(f"Fetched Reference data: {data}")
@@ -64,27 +51,26 @@ def create_sales_quote_line(data: Dict[str, Any]):
     """
     return post_to_erp("Sales_QuoteSalesLines", data)
 
-def fetch_entity(entity_name: str, entity_id: str = None, top: int = 100, skip: int = 0):
-    url = f"{ERP_BASE_URL}/{entity_name}?$top={top}&$skip={skip}"  # Use pagination with top and skip
-    if entity_id:
-        url += f"({entity_id})"
+def fetch_entity(entity_name: str, entity_id: str = None, top: int = 100, skip: int = 0, select: Projection = None, filter: str = None, orderby: str = None):
+    # Use pagination with top and skip; select/filter are passed through as OData query options
+    path = build_path(entity_name, entity_id, top=top, skip=skip, select=select, filter=filter, orderby=orderby)
 
-    response = requests.get(url, auth=HTTPBasicAuth(USERNAME, PASSWORD))
+    response = erp_session.get(path)
     if response.status_code == 200:
         return response.json()
     else:
         raise Exception(f"Failed: {response.status_code} - {response.text}")
     
-def fetch_customer_by_phone_number(Phone_No: str):
+def fetch_customer_by_phone_number(Phone_No: str, projection: Projection = None):
 
     # URL encode the phone number as it may contain special characters.
     import urllib.parse
     encoded_number = urllib.parse.quote(Phone_No)
     
     # Build URL with filter for exact product number
-    url = f"{ERP_BASE_URL}/Customer_Card?$filter=Phone_No eq '{encoded_number}'"
+    path = build_path("Customer_Card", select=projection, filter=f"Phone_No eq '{encoded_number}'")
     
-    response = requests.get(url, auth=HTTPBasicAuth(USERNAME, PASSWORD))
+    response = erp_session.get(path)
     if response.status_code == 200:
         data = response.json()
         # If there's no customer found, return empty dict or appropriate message
@@ -94,16 +80,54 @@ def fetch_customer_by_phone_number(Phone_No: str):
     else:
         raise Exception(f"Failed: {response.status_code} - {response.text}")
 
-def fetch_product_by_number(product_number: str):
+def fetch_product_by_number(product_number: str, projection: Projection = "quotation"):
+    """
+    Look up a product, serving repeat lookups from the in-process product cache.
+    Stale entries are returned immediately and refreshed on a background thread.
+    """
+    cache_key = product_cache_key(product_number, projection)
+    cached, state = product_cache.get(cache_key)
+    if state == STALE and product_cache.begin_refresh(cache_key):
+        threading.Thread(target=_refresh_product, args=(product_number, projection), daemon=True).start()
+    if state != MISS:
+        return cached
+
+    # Read from the local catalog mirror before going to ERP; it holds the quotation projection
+    mirrored = None
+    if cache_key == product_number:
+        from .catalog_mirror import get_mirrored_product
+        mirrored = get_mirrored_product(product_number)
+    if mirrored:
+        data = {"value": [mirrored]}
+    else:
+        data = _fetch_product_from_erp(product_number, projection)
+    if data.get('value'):
+        product_cache.set(cache_key, data)
+    return data
+
+def _refresh_product(product_number: str, projection: Projection = "quotation"):
+    cache_key = product_cache_key(product_number, projection)
+    try:
+        data = _fetch_product_from_erp(product_number, projection)
+        if data.get('value'):
+            product_cache.set(cache_key, data)
+        else:
+            product_cache.invalidate(cache_key)
+    except Exception as e:
+        print(f"Error refreshing cached product {product_number}: {str(e)}")
+    finally:
+        product_cache.end_refresh(cache_key)
+
+def _fetch_product_from_erp(product_number: str, projection: Projection = "quotation"):
 
     # URL encode the product number as it may contain special characters
     import urllib.parse
     encoded_number = urllib.parse.quote(product_number)
     
     # Build URL with filter for exact product number
-    url = f"{ERP_BASE_URL}/ItemsAPI?$filter=No eq '{encoded_number}'"
+    path = build_path("ItemsAPI", select=projection, filter=f"No eq '{encoded_number}'")
     
-    response = requests.get(url, auth=HTTPBasicAuth(USERNAME, PASSWORD))
+    response = erp_session.get(path)
     if response.status_code == 200:
         data = response.json()
         print(f"Fetched product data: {data}")
@@ -150,18 +174,25 @@ def get_product_quotation(product_number: str, phone_number: str = None, name: s
     # Fetch customer information
     customer_data = None
     if phone_number:
-        customer_response = fetch_customer_by_field("Phone_No", phone_number)
+        customer_response = fetch_customer_by_field("Phone_No", phone_number, projection="customer_summary")
         if customer_response.get('value'):
             customer_data = customer_response['value'][0]
     
     if not customer_data and name:
-        customer_response = fetch_customer_by_field("Name", name)
+        customer_response = fetch_customer_by_field("Name", name, projection="customer_summary")
         if customer_response.get('value'):
             customer_data = customer_response['value'][0]
     
     # Fetch product from ERP
     product_response = fetch_product_by_number(product_number)
     
+    return build_product_quotation(product_number, product_response, customer_data)
+
+def build_product_quotation(product_number: str, product_response: Dict[str, Any], customer_data: Optional[Dict[str, Any]]):
+    """
+    Build the quotation payload from an ItemsAPI response and the resolved customer.
+    Shared by the sync and async quotation paths.
+    """
     # Check if product was found
     if not product_response.get('value') or len(product_response['value']) == 0:
         return {
@@ -326,7 +357,7 @@ def generate_structured_quotation(customer_data, product_data, price_data):
     
     return structured_quotation
 
-def fetch_customer_by_field(field: str, value: str):
+def fetch_customer_by_field(field: str, value: str, projection: Projection = None):
     import urllib.parse
     encoded_value = urllib.parse.quote(value)
 
@@ -334,9 +365,9 @@ def fetch_customer_by_field(field: str, value: str):
     if field not in allowed_fields:
         raise ValueError("Invalid search field")
 
-    url = f"{ERP_BASE_URL}/Customer_Card?$filter={field} eq '{encoded_value}'"
+    path = build_path("Customer_Card", select=projection, filter=f"{field} eq '{encoded_value}'")
 
-    response = requests.get(url, auth=HTTPBasicAuth(USERNAME, PASSWORD))
+    response = erp_session.get(path)
     if response.status_code == 200:
         data = response.json()
         if not data.get('value'):
@@ -0,0 +1,77 @@
+from sqlalchemy import Column, String, Float, DateTime, Integer, Text
+import json
+from datetime import datetime
+
+from erp.database import Base
+
+class CatalogItem(Base):
+    """Local mirror of an ERP ItemsAPI record"""
+    __tablename__ = "catalog_items"
+
+    No = Column(String, primary_key=True)
+    Description = Column(String, nullable=True)
+    Unit_Price = Column(Float, nullable=True)
+    VAT_Prod_Posting_Group = Column(String, nullable=True)
+    Product_Model = Column(String, nullable=True, index=True)
+
+    # Derived from the description for local filtering by size
+    Capacity_Liters = Column(Float, nullable=True, index=True)
+
+    # Hash of the mirrored ERP fields, used to skip unchanged rows on refresh
+    Row_Hash = Column(String, nullable=False)
+    # When this row was last written from ERP; freshness of the whole mirror is in CatalogSyncState
+    Synced_At = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_erp_dict(self):
+        return {
+            "No": self.No,
+            "Description": self.Description,
+            "Unit_Price": self.Unit_Price,
+            "VAT_Prod_Posting_Group": self.VAT_Prod_Posting_Group,
+            "Product_Model": self.Product_Model,
+        }
+
+class CatalogSyncState(Base):
+    """Single row recording the last successful catalog syncs"""
+    __tablename__ = "catalog_sync_state"
+
+    Id = Column(Integer, primary_key=True, default=1)
+    # Start of the last successful sync, full or incremental
+    Synced_At = Column(DateTime, nullable=False)
+    # Start of the last successful full sync, which also removes items deleted in ERP
+    Full_Synced_At = Column(DateTime, nullable=False)
+
+class OutboxItem(Base):
+    """A pending ERP write, drained in the background by erp.outbox"""
+    __tablename__ = "erp_outbox"
+
+    id = Column(String, primary_key=True)
+    entity_name = Column(String, nullable=False, index=True)
+    payload = Column(Text, nullable=False)
+
+    # pending -> in_progress -> succeeded / failed (pending again while retries remain)
+    status = Column(String, nullable=False, default="pending", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    last_error = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)
+    # Lease start while in_progress; another worker may reclaim the item once it expires
+    claimed_at = Column(DateTime, nullable=True, index=True)
+
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "entity_name": self.entity_name,
+            "payload": json.loads(self.payload),
+            "status": self.status,
+            "attempts": self.attempts,
+            "next_attempt_at": self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            "last_error": self.last_error,
+            "result": json.loads(self.result) if self.result else None,
+            "claimed_at": self.claimed_at.isoformat() if self.claimed_at else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
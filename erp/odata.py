@@ -0,0 +1,53 @@
+from typing import Dict, List, Optional, Sequence, Union
+
+# Named $select projections for the fields each internal call path actually uses
+PROJECTIONS: Dict[str, List[str]] = {
+    "quotation": ["No", "Description", "Unit_Price", "VAT_Prod_Posting_Group", "Product_Model"],
+    "customer_summary": ["No", "Name", "Phone_No", "E_Mail"],
+    "salesperson": ["Code", "Name", "E_Mail"],
+}
+
+Projection = Union[str, Sequence[str], None]
+
+
+def resolve_projection(projection: Projection) -> Optional[List[str]]:
+    """
+    Turn a projection into a list of field names.
+    Accepts a named projection, a comma-separated field list, a list of fields or None (all fields).
+    """
+    if not projection:
+        return None
+    if isinstance(projection, str):
+        if projection in PROJECTIONS:
+            return PROJECTIONS[projection]
+        return [field.strip() for field in projection.split(",") if field.strip()]
+    return list(projection)
+
+
+def build_path(
+    entity_name: str,
+    entity_id: Optional[str] = None,
+    top: Optional[int] = None,
+    skip: Optional[int] = None,
+    select: Projection = None,
+    filter: Optional[str] = None,
+    orderby: Optional[str] = None,
+) -> str:
+    """Build an OData entity path with the given query options"""
+    path = f"{entity_name}({entity_id})" if entity_id else entity_name
+
+    options = []
+    fields = resolve_projection(select)
+    if fields:
+        options.append(f"$select={','.join(fields)}")
+    if filter:
+        options.append(f"$filter={filter}")
+    if not entity_id:
+        if orderby:
+            options.append(f"$orderby={orderby}")
+        if top is not None:
+            options.append(f"$top={top}")
+        if skip is not None:
+            options.append(f"$skip={skip}")
+
+    return f"{path}?{'&'.join(options)}" if options else path
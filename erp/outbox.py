@@ -0,0 +1,311 @@
+import asyncio
+import json
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import httpx
+from dotenv import load_dotenv
+from sqlalchemy import and_, or_
+
+from erp.database import SessionLocal
+from erp.model import OutboxItem
+from .async_client import async_erp_client, send_batch_to_erp
+from .odata import build_path
+
+load_dotenv()
+
+ERP_OUTBOX_ENABLED = os.getenv("ERP_OUTBOX_ENABLED", "True").lower() == "true"
+ERP_OUTBOX_POLL_INTERVAL = float(os.getenv("ERP_OUTBOX_POLL_INTERVAL", "2"))
+ERP_OUTBOX_BATCH_SIZE = int(os.getenv("ERP_OUTBOX_BATCH_SIZE", "20"))
+ERP_OUTBOX_MAX_ATTEMPTS = int(os.getenv("ERP_OUTBOX_MAX_ATTEMPTS", "8"))
+ERP_OUTBOX_BACKOFF_SECONDS = float(os.getenv("ERP_OUTBOX_BACKOFF_SECONDS", "5"))
+ERP_OUTBOX_MAX_BACKOFF_SECONDS = float(os.getenv("ERP_OUTBOX_MAX_BACKOFF_SECONDS", "900"))
+# How long a claimed item stays with its worker before another may take it over. Must be
+# well above the ERP request timeout, or a slow but live delivery gets sent twice.
+ERP_OUTBOX_LEASE_SECONDS = float(os.getenv("ERP_OUTBOX_LEASE_SECONDS", "300"))
+
+# Entities that may be written through the outbox
+OUTBOX_ENTITIES = ["Sales_Quote", "Sales_QuoteSalesLines"]
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# 4xx responses are final except for timeouts and throttling
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+
+# Field carrying the outbox idempotency key in the ERP record. Before an item is sent
+# again, ERP is searched for a record with its key, so a POST that timed out after ERP
+# created the quote is recorded as delivered instead of creating a second quote.
+IDEMPOTENCY_FIELDS = {"Sales_Quote": "External_Document_No"}
+# Sales_QuoteSalesLines has no such field (ERP assigns Line_No on insert), so a line whose
+# delivery may have reached ERP is marked failed instead of being sent again, and has to
+# be checked against the quote by hand. These status codes leave that question open.
+AMBIGUOUS_STATUS_CODES = (408, 504)
+
+
+def enqueue(entity_name: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Persist an ERP write and return its tracking record"""
+    if entity_name not in OUTBOX_ENTITIES:
+        raise ValueError(f"Entity {entity_name} cannot be written through the outbox")
+
+    item_id = uuid.uuid4()
+    key_field = IDEMPOTENCY_FIELDS.get(entity_name)
+    if key_field and not data.get(key_field):
+        # External_Document_No holds 35 characters, so use the 32-character hex form
+        data = {**data, key_field: item_id.hex}
+
+    db = SessionLocal()
+    try:
+        item = OutboxItem(
+            id=str(item_id),
+            entity_name=entity_name,
+            payload=json.dumps(data),
+            status=PENDING,
+            attempts=0,
+            next_attempt_at=datetime.utcnow(),
+        )
+        db.add(item)
+        db.commit()
+        db.refresh(item)
+        return item.to_dict()
+    finally:
+        db.close()
+
+
+def get_item(item_id: str) -> Optional[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        item = db.query(OutboxItem).filter(OutboxItem.id == item_id).first()
+        return item.to_dict() if item else None
+    finally:
+        db.close()
+
+
+def _claimable(now: datetime):
+    """Due pending items, and in_progress items whose lease has expired"""
+    lease_expired = now - timedelta(seconds=ERP_OUTBOX_LEASE_SECONDS)
+    return or_(
+        and_(OutboxItem.status == PENDING, OutboxItem.next_attempt_at <= now),
+        and_(
+            OutboxItem.status == IN_PROGRESS,
+            or_(OutboxItem.claimed_at.is_(None), OutboxItem.claimed_at < lease_expired),
+        ),
+    )
+
+
+def _claim_batch(limit: int) -> List[Dict[str, Any]]:
+    """
+    Lease up to `limit` claimable items to this worker and return them. Items taken
+    over from an expired lease are flagged `reclaimed`: their earlier delivery may
+    have reached ERP.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        candidates = (
+            db.query(OutboxItem.id, OutboxItem.status)
+            .filter(_claimable(now))
+            .order_by(OutboxItem.created_at)
+            .limit(limit)
+            .all()
+        )
+        claimed = {}
+        for item_id, previous_status in candidates:
+            # Conditional update so two workers never claim the same item
+            updated = db.query(OutboxItem).filter(OutboxItem.id == item_id, _claimable(now)).update(
+                {"status": IN_PROGRESS, "claimed_at": now}, synchronize_session=False
+            )
+            if updated:
+                claimed[item_id] = previous_status == IN_PROGRESS
+        db.commit()
+        items = db.query(OutboxItem).filter(OutboxItem.id.in_(claimed)).order_by(OutboxItem.created_at).all()
+        return [{**item.to_dict(), "reclaimed": claimed[item.id]} for item in items]
+    finally:
+        db.close()
+
+
+def _leased_item(db, item: Dict[str, Any]) -> Optional[OutboxItem]:
+    """The item's row if this worker still holds its lease"""
+    row = db.query(OutboxItem).filter(
+        OutboxItem.id == item["id"],
+        OutboxItem.status == IN_PROGRESS,
+        OutboxItem.claimed_at == datetime.fromisoformat(item["claimed_at"]),
+    ).first()
+    if row is None:
+        print(f"Outbox item {item['id']} lease was lost; leaving it to its new owner")
+    return row
+
+
+def _record_success(item: Dict[str, Any], result: Any):
+    db = SessionLocal()
+    try:
+        row = _leased_item(db, item)
+        if row is None:
+            return
+        row.status = SUCCEEDED
+        row.attempts += 1
+        row.result = json.dumps(result)
+        row.last_error = None
+        row.claimed_at = None
+        db.commit()
+    finally:
+        db.close()
+
+
+def _record_failure(item: Dict[str, Any], error: str, retryable: bool = True, ambiguous: bool = False):
+    """
+    Record a failed delivery. `ambiguous` means ERP may have applied the write anyway;
+    items without an idempotency key are then not retried.
+    """
+    if ambiguous and item["entity_name"] not in IDEMPOTENCY_FIELDS:
+        retryable = False
+        error = f"{error} (may have reached ERP; not resent, check the quote before resubmitting)"
+    db = SessionLocal()
+    try:
+        row = _leased_item(db, item)
+        if row is None:
+            return
+        row.attempts += 1
+        row.last_error = error
+        row.claimed_at = None
+        if retryable and row.attempts < ERP_OUTBOX_MAX_ATTEMPTS:
+            delay = min(ERP_OUTBOX_BACKOFF_SECONDS * (2 ** (row.attempts - 1)), ERP_OUTBOX_MAX_BACKOFF_SECONDS)
+            row.status = PENDING
+            row.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+        else:
+            row.status = FAILED
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _find_delivered(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The ERP record an earlier attempt of `item` created, if any"""
+    key_field = IDEMPOTENCY_FIELDS.get(item["entity_name"])
+    key = item["payload"].get(key_field) if key_field else None
+    if not key:
+        return None
+    path = build_path(item["entity_name"], top=1, filter=f"{key_field} eq '{key}'")
+    response = await async_erp_client.get(path)
+    if response.status_code != 200:
+        raise Exception(f"Idempotency lookup failed: {response.status_code} - {response.text}")
+    rows = response.json().get("value", [])
+    return rows[0] if rows else None
+
+
+async def _skip_delivered(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop retried items that already reached ERP, recording them as succeeded"""
+    remaining = []
+    for item in items:
+        if not (item["attempts"] or item["reclaimed"]):
+            remaining.append(item)
+            continue
+        if item["entity_name"] not in IDEMPOTENCY_FIELDS:
+            # Only ambiguous failures stop these items, and a lease expiring mid-send is one
+            if item["reclaimed"]:
+                await asyncio.to_thread(_record_failure, item, "Delivery lease expired", True, True)
+            else:
+                remaining.append(item)
+            continue
+        try:
+            existing = await _find_delivered(item)
+        except Exception as e:
+            # Never resend without knowing whether the earlier attempt landed
+            await asyncio.to_thread(_record_failure, item, str(e))
+            continue
+        if existing is not None:
+            print(f"Outbox item {item['id']} was already delivered; not sending it again")
+            await asyncio.to_thread(_record_success, item, existing)
+        else:
+            remaining.append(item)
+    return remaining
+
+
+def _may_have_reached_erp(error: Exception) -> bool:
+    """False only when the request certainly never left this process"""
+    return not isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+
+def _is_retryable(status_code: Optional[int]) -> bool:
+    if status_code is None:
+        return True
+    return not (400 <= status_code < 500) or status_code in RETRYABLE_CLIENT_ERRORS
+
+
+async def _deliver(entity_name: str, items: List[Dict[str, Any]]):
+    """Send one entity's items to ERP, as a non-atomic $batch when there is more than one"""
+    if len(items) == 1:
+        item = items[0]
+        try:
+            response = await async_erp_client.post(
+                entity_name,
+                content=json.dumps(item["payload"]),
+                headers={"Content-Type": "application/json", "Accept": "application/json"},
+            )
+        except Exception as e:
+            await asyncio.to_thread(_record_failure, item, str(e), True, _may_have_reached_erp(e))
+            return
+        if response.status_code in [200, 201, 202]:
+            result = response.json() if response.text else {"message": "Success"}
+            await asyncio.to_thread(_record_success, item, result)
+        else:
+            error = f"{response.status_code} - {response.text}"
+            await asyncio.to_thread(
+                _record_failure, item, error, _is_retryable(response.status_code),
+                response.status_code in AMBIGUOUS_STATUS_CODES,
+            )
+        return
+
+    try:
+        responses = await send_batch_to_erp(entity_name, [item["payload"] for item in items], atomic=False)
+    except Exception as e:
+        for item in items:
+            await asyncio.to_thread(_record_failure, item, str(e), True, _may_have_reached_erp(e))
+        return
+
+    by_id = {r.get("id"): r for r in responses}
+    for index, item in enumerate(items, start=1):
+        response = by_id.get(str(index))
+        status_code = response.get("status") if response else None
+        if status_code in [200, 201, 202, 204]:
+            await asyncio.to_thread(_record_success, item, response.get("body") or {"message": "Success"})
+        else:
+            error = f"{status_code} - {response.get('body')}" if response else "No response in batch"
+            await asyncio.to_thread(
+                _record_failure, item, error, _is_retryable(status_code),
+                response is None or status_code in AMBIGUOUS_STATUS_CODES,
+            )
+
+
+async def drain_once(batch_size: int = ERP_OUTBOX_BATCH_SIZE) -> int:
+    """Deliver one batch of due items. Returns the number of items attempted."""
+    items = await asyncio.to_thread(_claim_batch, batch_size)
+    grouped = defaultdict(list)
+    for item in await _skip_delivered(items):
+        grouped[item["entity_name"]].append(item)
+
+    # Quote headers go out before their lines
+    for entity_name in sorted(grouped, key=lambda name: OUTBOX_ENTITIES.index(name) if name in OUTBOX_ENTITIES else len(OUTBOX_ENTITIES)):
+        await _deliver(entity_name, grouped[entity_name])
+    return len(items)
+
+
+async def run_outbox_worker(interval: float = ERP_OUTBOX_POLL_INTERVAL):
+    """
+    Background worker: drain the outbox until cancelled. Several workers (one per
+    uvicorn process) may run at once; items left by a crashed worker are picked up
+    again when their lease expires.
+    """
+    while True:
+        try:
+            attempted = await drain_once()
+        except Exception as e:
+            print(f"Outbox drain failed: {str(e)}")
+            attempted = 0
+        # Keep draining while there is a backlog, otherwise wait for new work
+        if attempted < ERP_OUTBOX_BATCH_SIZE:
+            await asyncio.sleep(interval)
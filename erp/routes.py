@@ -1,9 +1,17 @@
-from typing import Optional
+import asyncio
+import json
+from typing import List, Optional
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 # from .erp_client import fetch_entity, fetch_product_by_number, fetch_customer_by_phone_number, get_product_quotation
-from fastapi import APIRouter, HTTPException, Query
-from .erp_client import fetch_entity, fetch_product_by_number, fetch_customer_by_phone_number, fetch_customer_by_field, get_product_quotation, post_to_erp, create_sales_quote_line, fetch_referrence_number
+from fastapi import APIRouter, HTTPException, Query, Depends, status
+from fastapi.responses import StreamingResponse
+from Auth.auth import get_current_user
+from .cache import product_cache, invalidate_product
+from .singleflight import erp_single_flight
+from . import outbox
+from .catalog_mirror import search_catalog, sync_catalog
+from .async_client import fetch_entity, iter_entity, fetch_product_by_number, fetch_customer_by_phone_number, fetch_customer_by_field, get_product_quotation, get_batch_product_quotation, post_to_erp, create_sales_quote_line, create_sales_quote_with_lines, fetch_referrence_number
 
 router = APIRouter(prefix="/erp", tags=["ERP"])
 
@@ -12,6 +20,11 @@ class QuotationRequest(BaseModel):
     phone_number: Optional[str] = None
     name: Optional[str] = None
 
+class BatchQuotationRequest(BaseModel):
+    product_numbers: List[str] = Field(..., min_length=1)
+    phone_number: Optional[str] = None
+    name: Optional[str] = None
+
 class SalesQuoteRequest(BaseModel):
     """Request model for creating a Sales Quote in the ERP system"""
     Sell_to_Customer_No: str
@@ -27,8 +40,19 @@ class SalesQuoteLineRequest(BaseModel):
     Quantity: int
     No: str
     
+class SalesQuoteLineItem(BaseModel):
+    """A line item submitted together with its sales quote header"""
+    Type: str
+    Quantity: int
+    No: str
+
+class SalesQuoteWithLinesRequest(BaseModel):
+    """Request model for creating a Sales Quote and its lines in one call"""
+    header: SalesQuoteRequest
+    lines: List[SalesQuoteLineItem] = []
+    
 @router.post("/sales-quote")
-def create_sales_quote(request: SalesQuoteRequest):
+async def create_sales_quote(request: SalesQuoteRequest):
    
     try:
         # Based on the Postman screenshot, format data exactly as shown
@@ -40,7 +64,7 @@ def create_sales_quote(request: SalesQuoteRequest):
         }
         
         # Post the data to the ERP system
-        result = post_to_erp("Sales_Quote", formatted_data)
+        result = await post_to_erp("Sales_Quote", formatted_data)
         
         return {
             "status": "success",
@@ -51,7 +75,7 @@ def create_sales_quote(request: SalesQuoteRequest):
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.post("/sales-quote-line")
-def add_sales_quote_line(request: SalesQuoteLineRequest):
+async def add_sales_quote_line(request: SalesQuoteLineRequest):
     """
     Add a line item to an existing sales quote in the ERP system
     """
@@ -67,7 +91,7 @@ def add_sales_quote_line(request: SalesQuoteLineRequest):
         
         
         # Create the sales quote line
-        result = create_sales_quote_line(formatted_data)
+        result = await create_sales_quote_line(formatted_data)
         
         return {
             "status": "success",
@@ -77,55 +101,234 @@ def add_sales_quote_line(request: SalesQuoteLineRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+@router.post("/sales-quote/with-lines")
+async def create_sales_quote_and_lines(request: SalesQuoteWithLinesRequest):
+    """
+    Create a sales quote header and all of its lines, with the lines submitted
+    as a single atomic OData $batch changeset
+    """
+    try:
+        header = {
+            "Sell_to_Customer_No": request.header.Sell_to_Customer_No,
+            "Salesperson_Code": request.header.Salesperson_code,
+            "Responsibility_Center": request.header.Responsibility_Center,
+            "Assigned_User_ID": request.header.Assigned_User_ID
+        }
+        lines = [
+            {"Type": line.Type, "Quantity": line.Quantity, "No": line.No}
+            for line in request.lines
+        ]
+
+        result = await create_sales_quote_with_lines(header, lines)
+
+        return {
+            "status": "success",
+            "message": "Sales quote and lines created successfully",
+            "data": result
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/outbox/sales-quote", status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_sales_quote(request: SalesQuoteRequest):
+    """
+    Accept a sales quote for delivery to ERP in the background.
+    Poll /erp/outbox/{item_id} with the returned id for its status.
+    """
+    try:
+        formatted_data = {
+            "Sell_to_Customer_No": request.Sell_to_Customer_No,
+            "Salesperson_Code": request.Salesperson_code,
+            "Responsibility_Center": request.Responsibility_Center,
+            "Assigned_User_ID": request.Assigned_User_ID
+        }
+        item = await asyncio.to_thread(outbox.enqueue, "Sales_Quote", formatted_data)
+        return {
+            "status": "accepted",
+            "message": "Sales quote queued for ERP",
+            "data": item
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/outbox/sales-quote-line", status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_sales_quote_line(request: SalesQuoteLineRequest):
+    """
+    Accept a sales quote line for delivery to ERP in the background
+    """
+    try:
+        formatted_data = {
+            "Document_Type": request.Document_Type,
+            "Document_No": request.Document_No,
+            "Type": request.Type,
+            "Quantity": request.Quantity,
+            "No": request.No
+        }
+        item = await asyncio.to_thread(outbox.enqueue, "Sales_QuoteSalesLines", formatted_data)
+        return {
+            "status": "accepted",
+            "message": "Sales quote line queued for ERP",
+            "data": item
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/outbox/{item_id}")
+async def get_outbox_item(item_id: str):
+    """
+    Report the delivery state of a queued ERP write
+    """
+    item = await asyncio.to_thread(outbox.get_item, item_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"Outbox item {item_id} not found")
+    return item
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Product cache and ERP request-coalescing counters
+    """
+    return {
+        "product_cache": product_cache.stats(),
+        "single_flight": erp_single_flight.stats()
+    }
+
+@router.delete("/cache/products/{product_number}")
+async def invalidate_cached_product(product_number: str, current_user: dict = Depends(get_current_user)):
+    """
+    Drop a single product from the ItemsAPI cache so the next lookup goes to ERP
+    """
+    removed = invalidate_product(product_number)
+    return {
+        "status": "success",
+        "message": f"Removed {removed} cached product(s)",
+        "data": product_cache.stats()
+    }
+
+@router.delete("/cache/products")
+async def invalidate_product_cache(current_user: dict = Depends(get_current_user)):
+    """
+    Clear the whole ItemsAPI product cache
+    """
+    removed = product_cache.invalidate()
+    return {
+        "status": "success",
+        "message": f"Removed {removed} cached product(s)",
+        "data": product_cache.stats()
+    }
+
+@router.get("/catalog/items")
+async def search_catalog_items(
+    model: Optional[str] = Query(None, description="Product model family, e.g. UFS or HPW"),
+    min_capacity: Optional[float] = Query(None, description="Minimum tank capacity in litres"),
+    max_capacity: Optional[float] = Query(None, description="Maximum tank capacity in litres"),
+    limit: int = Query(100, le=1000),
+):
+    """
+    Filter the local ItemsAPI mirror by model family and capacity
+    """
+    try:
+        items = await asyncio.to_thread(search_catalog, model, min_capacity, max_capacity, limit)
+        return {"value": items}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/catalog/sync")
+async def trigger_catalog_sync(current_user: dict = Depends(get_current_user)):
+    """
+    Run a catalog mirror refresh now instead of waiting for the background job
+    """
+    try:
+        result = await asyncio.to_thread(sync_catalog)
+        return {
+            "status": "success",
+            "message": "Catalog mirror synced",
+            "data": result
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/{entity_name}")
-def get_entity_list(entity_name: str):
+async def get_entity_list(
+    entity_name: str,
+    top: int = Query(100, ge=1, description="Rows per request when not streaming"),
+    skip: int = Query(0, ge=0, description="Rows to skip when not streaming"),
+    stream: bool = Query(False, description="Stream every row of the entity as NDJSON"),
+    page_size: int = Query(500, ge=1, le=5000, description="Rows fetched from ERP per page when streaming"),
+    prefetch: bool = Query(True, description="Fetch the next page while the current one is being written"),
+    select: Optional[str] = Query(None, alias="$select", description="Comma-separated fields or a named projection"),
+    filter_: Optional[str] = Query(None, alias="$filter", description="OData filter expression"),
+):
+    if stream:
+        return StreamingResponse(
+            _ndjson_rows(entity_name, page_size, prefetch, select, filter_),
+            media_type="application/x-ndjson"
+        )
     try:
-        return fetch_entity(entity_name)
+        return await fetch_entity(entity_name, top=top, skip=skip, select=select, filter=filter_)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _ndjson_rows(entity_name: str, page_size: int, prefetch: bool, select: Optional[str], filter_: Optional[str]):
+    try:
+        async for row in iter_entity(entity_name, page_size=page_size, prefetch=prefetch, select=select, filter=filter_):
+            yield json.dumps(row) + "\n"
+    except Exception as e:
+        # Headers are already sent, so report the failure as a final NDJSON line
+        yield json.dumps({"error": str(e)}) + "\n"
+
 @router.get("/{entity_name}/{entity_id}")
-def get_entity_item(entity_name: str, entity_id: str):
+async def get_entity_item(entity_name: str, entity_id: str, select: Optional[str] = Query(None, alias="$select")):
     try:
-        return fetch_entity(entity_name, entity_id)
+        return await fetch_entity(entity_name, entity_id, select=select)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
     
 @router.get("/Customer_Card/Phone_No/{Phone_No}")
-def get_customer_by_phone_number(Phone_No: str):
+async def get_customer_by_phone_number(Phone_No: str, fields: Optional[str] = Query(None, description="Named projection or comma-separated fields")):
     try:
-        return fetch_customer_by_phone_number(Phone_No)
+        return await fetch_customer_by_phone_number(Phone_No, projection=fields)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.get("/products/number/{product_number}")
-def get_product_by_number(product_number: str):
+async def get_product_by_number(product_number: str, fields: Optional[str] = Query(None, description="Named projection (e.g. quotation) or comma-separated fields")):
     try:
-        return fetch_product_by_number(product_number)
+        return await fetch_product_by_number(product_number, projection=fields)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.get("/get/sales-quote/{reference:path}")
-def get_proposal_by_reference(reference: str):
+async def get_proposal_by_reference(reference: str):
     try:
         print(f"Fetching sales quote with reference: {reference}")
-        return fetch_referrence_number(reference)
+        return await fetch_referrence_number(reference)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/quotation")
-def create_product_quotation(request: QuotationRequest):
+async def create_product_quotation(request: QuotationRequest):
+    try:
+        return await get_product_quotation(request.product_number, request.phone_number, request.name)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+@router.post("/quotation/batch")
+async def create_batch_product_quotation(request: BatchQuotationRequest):
+    """
+    Quote several alternative products for the same customer in one call
+    """
     try:
-        return get_product_quotation(request.product_number, request.phone_number, request.name)
+        return await get_batch_product_quotation(request.product_numbers, request.phone_number, request.name)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.get("/Customer_Card/{field}/{value}")
-def get_customer_by_various_fields(field: str, value: str):
+async def get_customer_by_various_fields(field: str, value: str, fields: Optional[str] = Query(None, description="Named projection (e.g. customer_summary) or comma-separated fields")):
     try:
-        return fetch_customer_by_field(field, value)
+        return await fetch_customer_by_field(field, value, projection=fields)
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
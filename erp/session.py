@@ -0,0 +1,79 @@
+import os
+from typing import Any, Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ERP_BASE_URL = os.getenv("ERP_BASE_URL")
+USERNAME = os.getenv("ERP_USERNAME")
+PASSWORD = os.getenv("ERP_PASSWORD")
+
+# Connection pool and timeout configuration
+ERP_POOL_SIZE = int(os.getenv("ERP_POOL_SIZE", "20"))
+ERP_CONNECT_TIMEOUT = float(os.getenv("ERP_CONNECT_TIMEOUT", "5"))
+ERP_READ_TIMEOUT = float(os.getenv("ERP_READ_TIMEOUT", "30"))
+ERP_MAX_RETRIES = int(os.getenv("ERP_MAX_RETRIES", "3"))
+ERP_BACKOFF_FACTOR = float(os.getenv("ERP_BACKOFF_FACTOR", "0.5"))
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class ErpSession:
+    """
+    Keep-alive HTTP session shared by every call to the Business Central OData API.
+
+    Connections are pooled per host, every request gets a connect/read timeout and
+    idempotent requests are retried with exponential backoff on 429/5xx responses.
+    POSTs are only retried when the connection could not be established, so a
+    sales quote is never created twice.
+    """
+
+    def __init__(
+        self,
+        base_url: str = ERP_BASE_URL,
+        username: str = USERNAME,
+        password: str = PASSWORD,
+        pool_size: int = ERP_POOL_SIZE,
+        connect_timeout: float = ERP_CONNECT_TIMEOUT,
+        read_timeout: float = ERP_READ_TIMEOUT,
+        max_retries: int = ERP_MAX_RETRIES,
+        backoff_factor: float = ERP_BACKOFF_FACTOR,
+    ):
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(["GET", "HEAD", "OPTIONS"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.auth = HTTPBasicAuth(username, password)
+        self.session.headers.update({"Accept": "application/json"})
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}/{path}"
+
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> requests.Response:
+        return self.session.get(self.url(path), params=params, timeout=self.timeout)
+
+    def post(self, path: str, data: Optional[str] = None, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        return self.session.post(self.url(path), data=data, headers=headers, timeout=self.timeout)
+
+    def close(self):
+        self.session.close()
+
+
+# Shared session used by all ERP call sites
+erp_session = ErpSession()
@@ -0,0 +1,180 @@
+import contextlib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Union
+from dotenv import load_dotenv
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+
+load_dotenv()
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "True").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", str(Path(__file__).resolve().parent / "llm_cache.db"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+# 0 keeps entries until they are evicted by size
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "0"))
+# Comma separated route names that must always call the model, e.g. "triaging.services"
+LLM_CACHE_DISABLED_ROUTES = {
+    name.strip() for name in os.getenv("LLM_CACHE_DISABLED_ROUTES", "").split(",") if name.strip()
+}
+
+# Whitespace, including JSON-escaped newlines and tabs inside serialized messages
+WHITESPACE_PATTERN = re.compile(r"(?:\s|\\n|\\r|\\t)+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so prompts that differ only in indentation share an entry"""
+    return WHITESPACE_PATTERN.sub(" ", prompt).strip()
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    # llm_string carries the model name, temperature and other call parameters
+    return hashlib.sha256(f"{llm_string}\x00{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+
+class LLMCacheStore:
+    """SQLite table of serialized generations with least-recently-used eviction"""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl: float = LLM_CACHE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.evictions = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, llm_string TEXT NOT NULL, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_access ON llm_cache (last_access)")
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # `with conn` only commits or rolls back; close the connection as well
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl and row[1] + self.ttl < now:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key: str, llm_string: str, value: str):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, llm_string, value, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, llm_string, value, now, now),
+            )
+            count = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            if count > self.max_entries:
+                evicted = conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,),
+                ).rowcount
+                self.evictions += evicted
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM llm_cache")
+
+    def size(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class LLMCache(BaseCache):
+    """
+    Exact-match LangChain cache for one route. All routes share the same store, so an
+    identical prompt sent to the same model configuration is answered from disk
+    wherever it was first asked; hit and miss counters are kept per route.
+    """
+
+    def __init__(self, store: LLMCacheStore, route: str):
+        self.store = store
+        self.route = route
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        try:
+            value = self.store.get(cache_key(prompt, llm_string))
+            if value is None:
+                self.misses += 1
+                return None
+            generations = [loads(generation) for generation in json.loads(value)]
+        except Exception as e:
+            # A broken entry must never fail the request; treat it as a miss
+            self.errors += 1
+            self.misses += 1
+            print(f"LLM cache lookup failed for {self.route}: {str(e)}")
+            return None
+        self.hits += 1
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        try:
+            value = json.dumps([dumps(generation) for generation in return_val])
+            self.store.set(cache_key(prompt, llm_string), llm_string, value)
+        except Exception as e:
+            self.errors += 1
+            print(f"LLM cache update failed for {self.route}: {str(e)}")
+
+    def clear(self, **kwargs: Any) -> None:
+        self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+llm_cache_store = LLMCacheStore() if LLM_CACHE_ENABLED else None
+route_caches: Dict[str, LLMCache] = {}
+
+
+def route_cache(route: str) -> Union[LLMCache, bool]:
+    """
+    Cache to pass as `ChatOpenAI(cache=...)` for a route. Returns False (never cache)
+    when caching is disabled globally or for this route.
+    """
+    if llm_cache_store is None or route in LLM_CACHE_DISABLED_ROUTES:
+        return False
+    if route not in route_caches:
+        route_caches[route] = LLMCache(llm_cache_store, route)
+    return route_caches[route]
+
+
+def llm_cache_stats() -> Dict[str, Any]:
+    return {
+        "enabled": llm_cache_store is not None,
+        "entries": llm_cache_store.size() if llm_cache_store else 0,
+        "max_entries": llm_cache_store.max_entries if llm_cache_store else 0,
+        "evictions": llm_cache_store.evictions if llm_cache_store else 0,
+        "disabled_routes": sorted(LLM_CACHE_DISABLED_ROUTES),
+        "routes": {route: cache.stats() for route, cache in route_caches.items()},
+    }
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -8,6 +9,17 @@ from Auth.routes import router as auth_router
 from sunshine.routes import router as sunshine_router
 from customer_proposal.database import init_db
 from customer_proposal.routes import api_router
+from erp.session import erp_session
+from erp.async_client import async_erp_client
+from erp.database import init_db as init_erp_db
+from erp.catalog_mirror import run_catalog_sync_loop, ERP_CATALOG_SYNC_ENABLED
+from erp.outbox import run_outbox_worker, ERP_OUTBOX_ENABLED
+from Auth.salesperson_directory import run_directory_refresh_loop
+from Auth.verification_utils import run_verification_sweeper, load_revoked_tokens
+from Auth.email_utils import email_dispatcher
+from llm_cache import llm_cache_stats
+from embedding_cache import embedding_cache_stats, purge_unused_embedding_models
+from upstream import upstream_stats
 
 app = FastAPI(
      title="Solar Hot Water System API",
@@ -17,8 +29,28 @@ app = FastAPI(
 
 # Initialize database on startup
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     init_db()
+    init_erp_db()
+    if ERP_CATALOG_SYNC_ENABLED:
+        app.state.catalog_sync_task = asyncio.create_task(run_catalog_sync_loop())
+    if ERP_OUTBOX_ENABLED:
+        app.state.outbox_task = asyncio.create_task(run_outbox_worker())
+    app.state.salesperson_directory_task = asyncio.create_task(run_directory_refresh_loop())
+    await load_revoked_tokens()
+    app.state.verification_sweeper_task = asyncio.create_task(run_verification_sweeper())
+    email_dispatcher.start()
+
+# Release pooled ERP connections on shutdown
+@app.on_event("shutdown")
+async def on_shutdown():
+    for task_name in ("catalog_sync_task", "outbox_task", "salesperson_directory_task", "verification_sweeper_task"):
+        task = getattr(app.state, task_name, None)
+        if task:
+            task.cancel()
+    await email_dispatcher.stop()
+    erp_session.close()
+    await async_erp_client.aclose()
 
 
 # Add cors middleware
@@ -40,3 +72,23 @@ app.include_router(sunshine_router)
 @app.get('/')
 def health_check():
     return JSONResponse(content={"status": "Wellcome. The server is up and Running!"})
+
+@app.get('/llm-cache/stats')
+def get_llm_cache_stats():
+    """Hit/miss counters per route and size of the shared LLM response cache"""
+    return JSONResponse(content=llm_cache_stats())
+
+@app.get('/embedding-cache/stats')
+def get_embedding_cache_stats():
+    """Memory/disk hit counters of the shared embedding cache"""
+    return JSONResponse(content=embedding_cache_stats())
+
+@app.post('/embedding-cache/purge')
+def purge_embedding_cache():
+    """Remove cached vectors of embedding models this server no longer uses"""
+    return JSONResponse(content=purge_unused_embedding_models())
+
+@app.get('/upstream/stats')
+def get_upstream_stats():
+    """In-flight and queued calls per upstream (OpenAI, Pinecone)"""
+    return JSONResponse(content=upstream_stats())
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, HTTPException
-from product_manual.services import generate_answer
+from product_manual.services import generate_answer, stream_answer
 from product_manual.schema import AnswerResponse, QuestionRequest
 import openai  # Import OpenAI library
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
+from llm_cache import route_cache
+from upstream import LimitedChatOpenAI
+from sse import format_sse, sse_response
 import os
 from langdetect import detect, LangDetectException
 
@@ -26,12 +28,13 @@ load_dotenv()
 #     temperature=0.7,
 #     convert_system_message_to_human=True
 # )
-model = ChatOpenAI(
+model = LimitedChatOpenAI(
     model="gpt-4o-mini", # gpt-4o-mini gpt-3.5-turbo
-    temperature=0.7
+    temperature=0.7,
+    cache=route_cache("product_manual.routes")
 )
 
-def translate_text(text, target_language="en"):
+async def translate_text(text, target_language="en"):
     """
     Translates the given text to the target language using Gemini.
     Default target language is English ("en").
@@ -48,31 +51,59 @@ def translate_text(text, target_language="en"):
         # translated_text = response.choices[0].message.content.strip()
 
         prompt = f"Translate the following text to {target_language}: {text}"
-        response = model.invoke(prompt)
+        response = await model.ainvoke(prompt)
         translated_text = response.content.strip()
         return translated_text
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
 
 
+async def to_english(question: str) -> str:
+    # Better language detection
+    try:
+        detected_lang = detect(question)
+        if detected_lang != 'en':
+            question = await translate_text(question, target_language="english")
+            print(f"Translated question: {question}")
+    except LangDetectException:
+        # If language detection fails, proceed with original question
+        pass
+    return question
+
+
 @router.post("/question", response_model=AnswerResponse)
 async def ask_question(question_request: QuestionRequest):
     try:
         question = question_request.question
         print(f"Received question: {question}")
-        
-        # Better language detection
-        try:
-            detected_lang = detect(question)
-            if detected_lang != 'en':
-                question = translate_text(question, target_language="english")
-                print(f"Translated question: {question}")
-        except LangDetectException:
-            # If language detection fails, proceed with original question
-            pass
+        question = await to_english(question)
         
         chat_history = question_request.chat_history
-        response = generate_answer(question, chat_history)
+        response = await generate_answer(question, chat_history)
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/question/stream")
+async def ask_question_stream(question_request: QuestionRequest):
+    """
+    Same as /question, but the answer is streamed as server-sent events: `token`
+    events while the model generates, then a `done` event with the full answer and
+    the ids of the manual chunks it was based on.
+    """
+    try:
+        question = await to_english(question_request.question)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def events():
+        try:
+            async for event, data in stream_answer(question, question_request.chat_history):
+                yield format_sse(data, event=event)
+        except Exception as e:
+            # Headers are already sent, so report the failure as a final event
+            print(f"Error in ask_question_stream: {str(e)}")
+            yield format_sse({"detail": str(e)}, event="error")
+
+    return sse_response(events())
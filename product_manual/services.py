@@ -1,10 +1,13 @@
-from typing import Any, List, Dict, Optional
+import asyncio
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple
 from fastapi import HTTPException
-from langchain_openai import ChatOpenAI  # Changed from OpenAI to ChatOpenAI
 # from langchain.chains import create_retrieval_chain
 # from langchain.chains.combine_documents import create_stuff_documents_chain
 # from langchain_core.prompts import ChatPromptTemplate
 from dotenv import load_dotenv
+from llm_cache import route_cache
+from embedding_cache import cached_embeddings
+from upstream import LimitedChatOpenAI, openai_limiter, pinecone_limiter
 from product_manual.schema import AnswerResponse
 from product_manual.prompt import *
 import os
@@ -12,7 +15,7 @@ from langchain_openai import OpenAIEmbeddings
 from pinecone import Pinecone
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.documents import Document
-from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.callbacks import CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
 from pydantic import Field, BaseModel
 from langchain_google_genai import ChatGoogleGenerativeAI
 import uuid
@@ -33,12 +36,13 @@ if not PINECONE_API_KEY:
     raise ValueError("PINECONE_API_KEY not found in environment variables")
 
 # Initialize services
-embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
+embeddings = cached_embeddings(OpenAIEmbeddings(api_key=OPENAI_API_KEY), openai_limiter)
 pc = Pinecone(api_key=PINECONE_API_KEY)
 index = pc.Index(index_name)
-model = ChatOpenAI(
+model = LimitedChatOpenAI(
     model="gpt-4o-mini", # gpt-4o-mini gpt-3.5-turbo
-    temperature=0.7
+    temperature=0.7,
+    cache=route_cache("product_manual.services")
 )
 
 # Updated PineconeRetriever class that's compatible with newer LangChain versions
@@ -70,6 +74,7 @@ class PineconeRetriever(BaseRetriever, BaseModel):
                 content = match.metadata.get('text', '') if match.metadata else str(match.id)
                 documents.append(
                     Document(
+                        id=match.id,
                         page_content=content,
                         metadata=match.metadata or {}
                     )
@@ -79,53 +84,93 @@ class PineconeRetriever(BaseRetriever, BaseModel):
             print(f"Error in Pinecone retrieval: {str(e)}")
             return []  # Return empty list on error
 
-def get_relevant_documents(query: str, top_k: int = 5) -> List[str]:
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+    ) -> List[Document]:
+        try:
+            # Get embedding for the query (takes the OpenAI limiter only on a cache miss)
+            query_embedding = await self.embeddings.aembed_query(query)
+            
+            # Query Pinecone (the client is synchronous, so run it off the event loop)
+            async with pinecone_limiter:
+                results = await asyncio.to_thread(
+                    self.index.query,
+                    vector=query_embedding,
+                    top_k=self.top_k,
+                    include_metadata=True
+                )
+            
+            # Convert Pinecone results to LangChain Documents
+            documents = []
+            for match in results.matches:
+                content = match.metadata.get('text', '') if match.metadata else str(match.id)
+                documents.append(
+                    Document(
+                        id=match.id,
+                        page_content=content,
+                        metadata=match.metadata or {}
+                    )
+                )
+            return documents
+        except Exception as e:
+            print(f"Error in Pinecone retrieval: {str(e)}")
+            return []  # Return empty list on error
+
+async def retrieve_documents(query: str, top_k: int = 5) -> List[Document]:
     """
     Get relevant documents from Pinecone using OpenAI embeddings.
     """
     try:
         # Initialize the retriever with OpenAI embeddings
-        retriever = PineconeRetriever(index=index, embeddings=embeddings)
+        retriever = PineconeRetriever(index=index, embeddings=embeddings, top_k=top_k)
         
         # Create a callback manager for the retriever with required parameters
         run_id = str(uuid.uuid4())
-        run_manager = CallbackManagerForRetrieverRun(
+        run_manager = AsyncCallbackManagerForRetrieverRun(
             run_id=run_id,
             handlers=[],
             inheritable_handlers=[]
         )
         
         # Get relevant documents with the run_manager
-        documents = retriever._get_relevant_documents(query, run_manager=run_manager)
-        
-        # Extract text from documents
-        return [doc.page_content for doc in documents]
+        return await retriever._aget_relevant_documents(query, run_manager=run_manager)
     except Exception as e:
         print(f"Error in document retrieval: {str(e)}")
         return []
 
-def generate_answer(question: str, chat_history: List[Dict[str, str]]) -> AnswerResponse:
+async def get_relevant_documents(query: str, top_k: int = 5) -> List[str]:
+    """Text of the documents most relevant to `query`"""
+    documents = await retrieve_documents(query, top_k)
+    return [doc.page_content for doc in documents]
+
+def build_answer_prompt(question: str, chat_history: List[Dict[str, str]], relevant_docs: List[str]) -> str:
+    # Create context from relevant documents
+    context = "\n\n".join(relevant_docs)
+    
+    # Create prompt with chat history
+    prompt = f"{system_prompt.format(context=context)}\n\n"
+    
+    # Add chat history to the prompt
+    for turn in chat_history:
+        prompt += f"Human: {turn['question']}\n"
+        prompt += f"Assistant: {turn['answer']}\n\n"
+    
+    # Add the current question
+    prompt += f"Human: {question}\n"
+    prompt += "Assistant: "
+    return prompt
+
+async def generate_answer(question: str, chat_history: List[Dict[str, str]]) -> AnswerResponse:
     try:
         # Get relevant documents using OpenAI embeddings
-        relevant_docs = get_relevant_documents(question)
-        
-        # Create context from relevant documents
-        context = "\n\n".join(relevant_docs)
-        
-        # Create prompt with chat history
-        prompt = f"{system_prompt.format(context=context)}\n\n"
-        
-        # Add chat history to the prompt
-        for turn in chat_history:
-            prompt += f"Human: {turn['question']}\n"
-            prompt += f"Assistant: {turn['answer']}\n\n"
-        
-        # Add the current question
-        prompt += f"Human: {question}\n"
-        prompt += "Assistant: "
+        relevant_docs = await get_relevant_documents(question)
+        prompt = build_answer_prompt(question, chat_history, relevant_docs)
         
         # Generate answer using Gemini
-        response = model.invoke(prompt)
+        response = await model.ainvoke(prompt)
         answer = response.content.strip()
         
         # Update chat history
@@ -139,3 +184,22 @@ def generate_answer(question: str, chat_history: List[Dict[str, str]]) -> Answer
             status_code=500,
             detail=f"Failed to generate answer: {str(e)}"
         )
+
+async def stream_answer(question: str, chat_history: List[Dict[str, str]]) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yield ("token", {"token": ...}) events as the model produces the answer, then one
+    ("done", {"answer": ..., "sources": [...]}) event with the full answer and the
+    ids of the retrieved manual chunks.
+    """
+    documents = await retrieve_documents(question)
+    prompt = build_answer_prompt(question, chat_history, [doc.page_content for doc in documents])
+
+    chunks = []
+    async for chunk in model.astream(prompt):
+        if chunk.content:
+            chunks.append(chunk.content)
+            yield "token", {"token": chunk.content}
+
+    answer = "".join(chunks).strip()
+    chat_history.append({"question": question, "answer": answer})
+    yield "done", {"answer": answer, "sources": [doc.id for doc in documents if doc.id]}
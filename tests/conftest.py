@@ -0,0 +1,15 @@
+import os
+import tempfile
+
+# Keep the local SQLite stores used by the modules under test out of the working tree
+_data_dir = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.setdefault("ERP_DATABASE_URL", f"sqlite:///{_data_dir}/erp.db")
+os.environ.setdefault("VERIFICATION_STORE_PATH", os.path.join(_data_dir, "verification_codes.db"))
+os.environ.setdefault("LLM_CACHE_PATH", os.path.join(_data_dir, "llm_cache.db"))
+os.environ.setdefault("EMBEDDING_CACHE_PATH", os.path.join(_data_dir, "embedding_cache.db"))
+
+# Verification emails go to the aiosmtpd stub started by tests/test_email_utils.py
+os.environ.setdefault("SMTP_HOST", "127.0.0.1")
+os.environ.setdefault("SMTP_USER", "")
+os.environ.setdefault("SMTP_FROM", "noreply@example.com")
+os.environ.setdefault("SMTP_START_TLS", "False")
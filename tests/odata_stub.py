@@ -0,0 +1,182 @@
+"""
+Local stand-in for the Business Central OData API, used by the ERP tests and bench/.
+
+Serves ItemsAPI and Customer_Card rows for any key asked for, honours $filter
+(`Field eq 'value'` clauses joined with `or`), $select, $top and $skip, and
+sleeps `delay` seconds per request to imitate ERP latency. Rows carry the
+~40 columns Business Central returns, so payload sizes are realistic.
+"""
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+ITEM_EXTRA_FIELDS = [
+    "Type", "Base_Unit_of_Measure", "Item_Category_Code", "Gen_Prod_Posting_Group", "Inventory_Posting_Group",
+    "Vendor_No", "Vendor_Item_No", "Country_Region_of_Origin_Code", "Tariff_No", "Shelf_No", "Search_Description",
+    "Costing_Method", "Replenishment_System", "Reordering_Policy", "Sales_Unit_of_Measure",
+    "Purch_Unit_of_Measure", "Global_Dimension_1_Code", "Global_Dimension_2_Code", "Item_Disc_Group",
+    "Manufacturer_Code", "Brand", "Warranty_Period", "Lead_Time_Calculation", "Created_From_Nonstock_Item",
+    "Last_Date_Modified", "Blocked", "Sales_Blocked", "Purchasing_Blocked", "Service_Item_Group",
+]
+CUSTOMER_EXTRA_FIELDS = [
+    "Address", "Address_2", "City", "Post_Code", "County", "Country_Region_Code", "Contact", "Mobile_Phone_No",
+    "Customer_Posting_Group", "Gen_Bus_Posting_Group", "VAT_Bus_Posting_Group", "Payment_Terms_Code",
+    "Payment_Method_Code", "Salesperson_Code", "Location_Code", "Credit_Limit_LCY", "Balance_LCY",
+    "Balance_Due_LCY", "Sales_LCY", "Currency_Code", "Language_Code", "Customer_Price_Group",
+    "Customer_Disc_Group", "Shipment_Method_Code", "Home_Page", "Blocked", "Last_Date_Modified",
+    "Privacy_Blocked", "Responsibility_Center", "Global_Dimension_1_Code",
+]
+
+
+def item_row(no: str) -> Dict[str, Any]:
+    row = {
+        "@odata.etag": f"W/\"JzQ0O0V4YW1wbGVFdGFnOzE7MDsn{no}\"",
+        "No": no,
+        "Description": f"ULTRASUN UFS300D FLATPLATE SOLAR HOT WATER SYSTEM ({no})",
+        "Unit_Price": 185000.0,
+        "VAT_Prod_Posting_Group": "VAT16",
+        "Product_Model": "UFS300D",
+        "Unit_Cost": 120500.0,
+        "Inventory": 42.0,
+    }
+    row.update({field: f"{field.upper()}-{no}" for field in ITEM_EXTRA_FIELDS})
+    return row
+
+
+def customer_row(no: str, phone_no: Optional[str] = None, name: Optional[str] = None) -> Dict[str, Any]:
+    row = {
+        "@odata.etag": f"W/\"JzQ0O0N1c3RvbWVyRXRhZzsxOzA7Jw{no}\"",
+        "No": no,
+        "Name": name or f"Customer {no}",
+        "Phone_No": phone_no or f"0700{no[-6:]}",
+        "E_Mail": f"{no.lower()}@example.com",
+    }
+    row.update({field: f"{field.upper()}-{no}" for field in CUSTOMER_EXTRA_FIELDS})
+    return row
+
+
+def _parse_filter(expression: str) -> List[tuple]:
+    clauses = []
+    for clause in expression.split(" or "):
+        field, _, value = clause.strip().partition(" eq ")
+        clauses.append((field.strip(), value.strip().strip("'")))
+    return clauses
+
+
+class ODataStubServer:
+    """Threaded HTTP server; start() returns the base URL to hand to the ERP clients"""
+
+    def __init__(self, delay: float = 0.0, page_rows: int = 1200):
+        self.delay = delay
+        self.page_rows = page_rows
+        self.requests = 0
+        self.bytes_sent = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.posted: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/ODataV4/Company('Stub')"
+
+    def start(self) -> str:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                stub._serve(self, "GET")
+
+            def do_POST(self):
+                stub._serve(self, "POST")
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        # Room for a few hundred concurrent keep-alive connections
+        self._server.request_queue_size = 512
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = self.bytes_sent = self.peak_in_flight = 0
+
+    def _serve(self, handler: BaseHTTPRequestHandler, method: str):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+            if method == "POST":
+                length = int(handler.headers.get("Content-Length") or 0)
+                payload = json.loads(handler.rfile.read(length) or b"{}")
+                with self._lock:
+                    self.posted.append(payload)
+                    payload = dict(payload, No=f"SQ{len(self.posted):06d}")
+                status, body = 201, payload
+            else:
+                status, body = 200, self._query(handler.path)
+            data = json.dumps(body).encode("utf-8")
+            handler.send_response(status)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(data)))
+            handler.end_headers()
+            handler.wfile.write(data)
+            with self._lock:
+                self.bytes_sent += len(data)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _query(self, path: str) -> Dict[str, Any]:
+        parts = urllib.parse.urlsplit(path)
+        entity = urllib.parse.unquote(parts.path.rstrip("/").rsplit("/", 1)[-1])
+        options = {key: values[0] for key, values in urllib.parse.parse_qs(parts.query).items()}
+
+        clauses = _parse_filter(options["$filter"]) if "$filter" in options else []
+        if entity == "ItemsAPI":
+            if clauses:
+                rows = [item_row(value) for field, value in clauses if field == "No"]
+            else:
+                rows = [item_row(f"ITEM{index:05d}") for index in range(self.page_rows)]
+        elif entity == "Customer_Card":
+            rows = []
+            for field, value in clauses:
+                if field == "Phone_No":
+                    rows.append(customer_row(f"CUST{abs(hash(value)) % 10**6:06d}", phone_no=value))
+                elif field == "Name":
+                    rows.append(customer_row(f"CUST{abs(hash(value)) % 10**6:06d}", name=value))
+                elif field == "No":
+                    rows.append(customer_row(value))
+            if not clauses:
+                rows = [customer_row(f"CUST{index:06d}") for index in range(self.page_rows)]
+        else:
+            rows = []
+
+        skip = int(options.get("$skip", 0))
+        top = int(options["$top"]) if "$top" in options else None
+        rows = rows[skip:skip + top] if top is not None else rows[skip:]
+        if "$select" in options:
+            fields = options["$select"].split(",")
+            rows = [{field: row.get(field) for field in fields} for row in rows]
+        return {"@odata.context": f"{self.url}/$metadata#{entity}", "value": rows}
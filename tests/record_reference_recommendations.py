@@ -0,0 +1,38 @@
+"""
+Replace the reference recommendations in tests/fixtures/reference_recommendations.json
+with what the live LLM pipeline answers.
+
+    python -m tests.record_reference_recommendations
+
+Needs OPENAI_API_KEY and PINECONE_API_KEY. Each case keeps its questionnaire; the
+analysis and the model's recommendation are replaced with what /api/recommend
+(mode=llm) produces now.
+"""
+import asyncio
+import json
+import os
+from triaging.schemas import QuestionnaireResponse
+from triaging.helper import generate_prompt_from_questionnaire, generate_embeddings, get_recommendations_from_pinecone, analyze_requirements
+from triaging.services import generate_ai_recommendations
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "reference_recommendations.json")
+
+
+async def record():
+    with open(FIXTURES) as f:
+        cases = json.load(f)
+    for case in cases:
+        data = QuestionnaireResponse(**case["questionnaire"])
+        embeddings = await generate_embeddings(generate_prompt_from_questionnaire(data))
+        pinecone_results = await get_recommendations_from_pinecone(embeddings)
+        analysis = analyze_requirements(data)
+        response = await generate_ai_recommendations(analysis, pinecone_results, data)
+        case["analysis"] = analysis
+        case["response"] = response.model_dump(exclude_none=True)
+        print(f"{case['case']}: {[system.model for system in response.recommended_systems]}")
+    with open(FIXTURES, "w") as f:
+        json.dump(cases, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(record())
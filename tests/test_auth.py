@@ -0,0 +1,58 @@
+import asyncio
+from datetime import timedelta
+import pytest
+from fastapi import HTTPException
+from Auth import auth
+from Auth.salesperson_directory import SalespersonDirectory
+
+SALESPERSON = {"Name": "Jane", "Code": "SP01", "E_Mail": "jane@example.com"}
+
+
+@pytest.fixture
+def directory(monkeypatch):
+    directory = SalespersonDirectory()
+    directory.remember("jane@example.com", SALESPERSON)
+    monkeypatch.setattr(auth, "salesperson_directory", directory)
+    monkeypatch.setattr(auth, "revoked_token_ids", {})
+    return directory
+
+
+def issue_token():
+    return auth.create_access_token(
+        data={"sub": "jane@example.com", "name": "Jane", "code": "SP01", "type": "sales_engineer"},
+        expires_delta=timedelta(minutes=5),
+    )
+
+
+def current_user(token):
+    return asyncio.run(auth.get_current_user(asyncio.run(auth.decode_access_token(token))))
+
+
+def test_revoked_token_is_rejected_without_a_store_lookup(directory, monkeypatch):
+    token = issue_token()
+    payload = asyncio.run(auth.decode_access_token(token))
+    monkeypatch.setattr(auth.verification_store, "revoke_token", lambda jti, expires_at: None)
+    auth.revoke_token(payload)
+
+    def store_lookup(jti):
+        raise AssertionError("decode_access_token read the store")
+    monkeypatch.setattr(auth.verification_store, "is_token_revoked", store_lookup)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(auth.decode_access_token(token))
+    assert excinfo.value.status_code == 401
+
+
+def test_token_from_the_current_directory_is_trusted(directory):
+    assert current_user(issue_token())["code"] == "SP01"
+
+
+def test_token_from_an_older_directory_is_checked_again(directory):
+    token = issue_token()
+    # A reload that no longer lists the salesperson
+    directory.version += 1
+    directory._by_email = {}
+    directory.remember_missing("jane@example.com")
+
+    with pytest.raises(HTTPException) as excinfo:
+        current_user(token)
+    assert excinfo.value.status_code == 401
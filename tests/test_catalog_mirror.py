@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+import pytest
+from erp import catalog_mirror
+from erp.database import SessionLocal, init_db
+from erp.model import CatalogItem, CatalogSyncState
+from erp.odata import build_path
+
+init_db()
+
+ITEMS = [
+    {"No": f"ITEM{index:03d}", "Description": f"ULTRASUN UFS{index}D", "Unit_Price": 100.0 + index,
+     "VAT_Prod_Posting_Group": "VAT16", "Product_Model": "UFS"}
+    for index in range(5)
+]
+
+
+@pytest.fixture(autouse=True)
+def erp_items(monkeypatch):
+    db = SessionLocal()
+    db.query(CatalogItem).delete()
+    db.query(CatalogSyncState).delete()
+    db.commit()
+    db.close()
+
+    requests = []
+
+    def fake_fetch_entity(entity_name, top=100, skip=0, select=None, filter=None, orderby=None, **kwargs):
+        requests.append({"entity": entity_name, "top": top, "skip": skip, "filter": filter, "orderby": orderby})
+        items = ITEMS[1:2] if filter else ITEMS
+        return {"value": items[skip:skip + top]}
+
+    monkeypatch.setattr(catalog_mirror, "fetch_entity", fake_fetch_entity)
+    return requests
+
+
+def _age_sync(seconds):
+    db = SessionLocal()
+    db.query(CatalogSyncState).update({CatalogSyncState.Synced_At: datetime.utcnow() - timedelta(seconds=seconds)})
+    db.commit()
+    db.close()
+
+
+def _row_synced_at():
+    db = SessionLocal()
+    try:
+        return {item.No: item.Synced_At for item in db.query(CatalogItem)}
+    finally:
+        db.close()
+
+
+def test_pages_are_ordered_by_item_number(erp_items):
+    catalog_mirror.sync_catalog()
+    assert all(request["orderby"] == "No" for request in erp_items)
+    assert "$orderby=No" in build_path("ItemsAPI", top=2, skip=2, orderby="No")
+
+
+def test_fresh_row_is_served_from_the_mirror():
+    catalog_mirror.sync_catalog()
+    assert catalog_mirror.get_mirrored_product("ITEM001")["Unit_Price"] == 101.0
+
+
+def test_stale_mirror_falls_through_to_erp():
+    catalog_mirror.sync_catalog()
+    _age_sync(catalog_mirror.ERP_CATALOG_MAX_AGE_SECONDS + 60)
+    assert catalog_mirror.get_mirrored_product("ITEM001") is None
+
+
+def test_sync_refreshes_the_mirror_without_rewriting_unchanged_rows():
+    catalog_mirror.sync_catalog()
+    written = _row_synced_at()
+    _age_sync(catalog_mirror.ERP_CATALOG_MAX_AGE_SECONDS + 60)
+    result = catalog_mirror.sync_catalog(full=True)
+    assert result["unchanged"] == len(ITEMS)
+    assert _row_synced_at() == written
+    assert catalog_mirror.get_mirrored_product("ITEM001") is not None
+
+
+def test_incremental_sync_only_fetches_modified_items_and_keeps_the_rest(erp_items):
+    first = catalog_mirror.sync_catalog()
+    assert first["full"] and erp_items[0]["filter"] is None
+    erp_items.clear()
+
+    result = catalog_mirror.sync_catalog()
+    assert not result["full"]
+    assert erp_items[0]["filter"].startswith("Last_Date_Modified ge ")
+    assert result["fetched"] == 1 and result["deleted"] == 0
+    assert catalog_mirror.get_mirrored_product("ITEM004") is not None
+
+
+def test_full_sync_removes_items_deleted_in_erp(monkeypatch):
+    catalog_mirror.sync_catalog()
+    monkeypatch.setattr(catalog_mirror, "fetch_entity", lambda *args, **kwargs: {"value": ITEMS[:3] if not kwargs.get("skip") else []})
+    assert catalog_mirror.sync_catalog(full=True)["deleted"] == 2
+    assert catalog_mirror.get_mirrored_product("ITEM004") is None
@@ -0,0 +1,35 @@
+from triaging import context_builder
+from triaging.context_builder import build_context, compact_results, log_prompt_tokens
+
+
+def _match(id, source, text, score=0.9):
+    return {"id": id, "score": score, "metadata": {"text": text, "source": source, "page": 3}}
+
+
+def test_windows_source_paths_are_reduced_to_the_file_name():
+    results = [
+        _match("a", "Data\\Solar\\Ultrasun Manual.pdf", "flat plate collectors for direct systems"),
+        _match("b", "Data/Heat Pumps/HPW.pdf", "heat pump water heaters for hard water", score=0.8),
+    ]
+    assert [item["source"] for item in compact_results(results)] == ["Ultrasun Manual.pdf", "HPW.pdf"]
+
+
+def test_repeated_ids_are_dropped():
+    results = [_match("a", "Data\\a.pdf", "first chunk of text"), _match("a", "Data\\a.pdf", "first chunk of text", score=0.5)]
+    assert len(compact_results(results)) == 1
+
+
+def test_only_a_cut_context_is_logged(capsys, monkeypatch):
+    monkeypatch.setattr(context_builder, "prompt_token_stats", {})
+    results = [_match(str(index), "Data\\a.pdf", f"chunk {index} " + "collector " * 50) for index in range(5)]
+    # Load the tokenizer first; without network access it reports the length fallback once
+    context_builder.count_tokens("warm up")
+    capsys.readouterr()
+
+    context = build_context(results, token_budget=10000)
+    log_prompt_tokens("recommend", [{"role": "user", "content": context}], context)
+    assert capsys.readouterr().out == ""
+    assert context_builder.prompt_token_stats["recommend"]["calls"] == 1
+
+    build_context(results, token_budget=150)
+    assert "Prompt context cut at 150 tokens" in capsys.readouterr().out
@@ -0,0 +1,101 @@
+import asyncio
+import socket
+import pytest
+from aiosmtpd.controller import Controller
+from Auth import email_utils
+from Auth.email_utils import EmailDispatcher
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        self.sessions.add(id(session))
+        return "250 OK"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_stub(monkeypatch):
+    handler = RecordingHandler()
+    port = _free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    monkeypatch.setattr(email_utils, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(email_utils, "SMTP_PORT", port)
+    yield handler
+    controller.stop()
+
+
+def test_queued_emails_share_one_smtp_session(smtp_stub):
+    async def scenario():
+        dispatcher = EmailDispatcher()
+        for index in range(5):
+            dispatcher.enqueue_verification_email(f"user{index}@example.com", "1234")
+        await asyncio.wait_for(dispatcher._queue.join(), timeout=10)
+        await dispatcher.stop()
+        return dispatcher.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["sent"] == 5 and stats["failed"] == 0
+    assert stats["connects"] == 1
+    assert len(smtp_stub.messages) == 5
+    assert len(smtp_stub.sessions) == 1
+    assert b"1234" in smtp_stub.messages[0].content
+
+
+def test_full_queue_sends_directly(smtp_stub):
+    async def scenario():
+        dispatcher = EmailDispatcher(max_size=1)
+        dispatcher.enqueue_verification_email("queued@example.com", "1111")
+        # The worker has not run yet, so the queue is still full
+        await dispatcher.deliver_verification_email("direct@example.com", "2222")
+        await asyncio.wait_for(dispatcher._queue.join(), timeout=10)
+        await dispatcher.stop()
+        return dispatcher.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["sent_direct"] == 1
+    assert sorted(message.rcpt_tos[0] for message in smtp_stub.messages) == ["direct@example.com", "queued@example.com"]
+
+
+def test_full_queue_direct_send_failure_is_raised(smtp_stub, monkeypatch):
+    async def refuse(email, code):
+        raise ConnectionRefusedError("SMTP server unavailable")
+
+    monkeypatch.setattr(email_utils, "send_verification_email", refuse)
+
+    async def scenario():
+        dispatcher = EmailDispatcher(max_size=1)
+        dispatcher.enqueue_verification_email("queued@example.com", "1111")
+        try:
+            await dispatcher.deliver_verification_email("direct@example.com", "2222")
+        finally:
+            await dispatcher.stop()
+        return dispatcher.stats()
+
+    with pytest.raises(ConnectionRefusedError):
+        asyncio.run(scenario())
+
+
+def test_missing_smtp_password_fails_the_send_without_queueing(monkeypatch):
+    monkeypatch.setattr(email_utils, "SMTP_USER", "sender@example.com")
+    monkeypatch.setattr(email_utils, "SMTP_PASSWORD", None)
+
+    async def scenario():
+        dispatcher = EmailDispatcher()
+        try:
+            await dispatcher.deliver_verification_email("user@example.com", "1234")
+        finally:
+            await dispatcher.stop()
+
+    with pytest.raises(email_utils.EmailConfigurationError):
+        asyncio.run(scenario())
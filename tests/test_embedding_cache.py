@@ -0,0 +1,86 @@
+import asyncio
+import os
+import tempfile
+from typing import List
+from langchain_core.embeddings import Embeddings
+from embedding_cache import CachedEmbeddings, EmbeddingStore
+from upstream import UpstreamLimiter
+
+
+class CountingEmbeddings(Embeddings):
+    model = "counting"
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def _cached(limiter):
+    store = EmbeddingStore(path=os.path.join(tempfile.mkdtemp(), "embeddings.db"))
+    return CachedEmbeddings(CountingEmbeddings(), store, limiter)
+
+
+def test_cache_hit_does_not_wait_for_a_busy_limiter():
+    async def scenario():
+        limiter = UpstreamLimiter("test", 1)
+        embeddings = _cached(limiter)
+        await embeddings.aembed_query("hello")
+
+        async with limiter:
+            # Every slot is taken by a (simulated) slow upstream call
+            memory_hit = await asyncio.wait_for(embeddings.aembed_query("hello"), timeout=1)
+            embeddings.store._memory.clear()
+            disk_hit = await asyncio.wait_for(embeddings.aembed_documents(["hello"]), timeout=1)
+        return memory_hit, disk_hit, embeddings.embeddings.calls, limiter.calls
+
+    memory_hit, disk_hit, upstream_calls, limiter_calls = asyncio.run(scenario())
+    assert memory_hit == disk_hit[0] == [5.0, 1.0]
+    assert upstream_calls == 1
+    # One slot for the initial miss, one for the test's own hold
+    assert limiter_calls == 2
+
+
+def test_cache_miss_takes_a_limiter_slot():
+    async def scenario():
+        limiter = UpstreamLimiter("test", 1)
+        embeddings = _cached(limiter)
+        async with limiter:
+            try:
+                await asyncio.wait_for(embeddings.aembed_query("new text"), timeout=0.2)
+            except asyncio.TimeoutError:
+                return True
+        return False
+
+    assert asyncio.run(scenario())
+
+
+class OtherEmbeddings(CountingEmbeddings):
+    model = "other"
+
+
+def test_wrapping_a_model_keeps_other_models_vectors():
+    first = _cached(None)
+    first.embed_query("hello")
+    # Another model (or another process) sharing the store must not wipe it
+    CachedEmbeddings(OtherEmbeddings(), first.store).embed_query("hello")
+    first.store._memory.clear()
+    assert first.embed_query("hello") == [5.0, 1.0]
+    assert first.embeddings.calls == 1
+
+
+def test_purge_other_models_is_an_explicit_maintenance_call():
+    embeddings = _cached(None)
+    embeddings.embed_query("hello")
+    other = CachedEmbeddings(OtherEmbeddings(), embeddings.store)
+    other.embed_query("hello")
+
+    assert embeddings.store.purge_other_models(["counting"]) == 1
+    assert embeddings.store.stats()["disk_entries"] == 1
+    other.embed_query("hello")
+    assert other.embeddings.calls == 2
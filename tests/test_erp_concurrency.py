@@ -0,0 +1,103 @@
+import asyncio
+import time
+import httpx
+import pytest
+from fastapi import FastAPI
+from erp import async_client
+from erp.async_client import AsyncErpClient
+from erp.cache import product_cache
+from erp.database import init_db
+from erp.routes import router
+from tests.odata_stub import ODataStubServer
+
+CONCURRENT_REQUESTS = 200
+ERP_LATENCY = 0.05
+MAX_CONCURRENCY = 20
+
+init_db()
+
+app = FastAPI()
+app.include_router(router)
+
+
+@pytest.fixture
+def erp_stub(monkeypatch):
+    stub = ODataStubServer(delay=ERP_LATENCY)
+    stub.start()
+    client = AsyncErpClient(base_url=stub.url, pool_size=MAX_CONCURRENCY, max_concurrency=MAX_CONCURRENCY)
+    monkeypatch.setattr(async_client, "async_erp_client", client)
+    product_cache.invalidate()
+    yield stub
+    stub.stop()
+    product_cache.invalidate()
+
+
+async def _quotations(count: int, probe_path: str = None):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+        async def quote(index):
+            return await client.post("/erp/quotation", json={
+                "product_number": f"BENCH{index:05d}",
+                "phone_number": f"0711{index:06d}",
+            })
+
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(quote(index)) for index in range(count)]
+        probe_seconds = None
+        if probe_path:
+            # Let the quotations fill the ERP limiter before probing
+            await asyncio.sleep(ERP_LATENCY)
+            probe_started = time.perf_counter()
+            probe = await client.get(probe_path)
+            probe_seconds = time.perf_counter() - probe_started
+            assert probe.status_code == 200
+        responses = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        await async_client.async_erp_client.aclose()
+    return responses, elapsed, probe_seconds
+
+
+def test_200_concurrent_quotations_against_stub_odata_server(erp_stub):
+    responses, elapsed, _ = asyncio.run(_quotations(CONCURRENT_REQUESTS))
+
+    assert all(response.status_code == 200 for response in responses)
+    assert all(response.json()["status"] == "success" for response in responses)
+    assert responses[7].json()["data"]["product"]["No"] == "BENCH00007"
+    # One product and one customer lookup per quotation
+    assert erp_stub.requests == 2 * CONCURRENT_REQUESTS
+    # The client never has more than its concurrency limit in flight at ERP
+    assert erp_stub.peak_in_flight <= MAX_CONCURRENCY
+    # 400 ERP calls of 50 ms in waves of 20 take ~1 s; serially they would take 20 s
+    serial_seconds = erp_stub.requests * ERP_LATENCY
+    print(f"{CONCURRENT_REQUESTS} quotations in {elapsed:.2f}s ({CONCURRENT_REQUESTS / elapsed:.0f} req/s, serial {serial_seconds:.0f}s)")
+    assert elapsed < serial_seconds / 4
+
+
+def test_stalled_erp_does_not_block_other_endpoints(erp_stub):
+    erp_stub.delay = 0.25
+    responses, elapsed, probe_seconds = asyncio.run(_quotations(CONCURRENT_REQUESTS, probe_path="/erp/cache/stats"))
+
+    assert all(response.status_code == 200 for response in responses)
+    # The quotations are queued on the ERP limiter for seconds; the probe is not
+    assert elapsed > 2
+    assert probe_seconds < erp_stub.delay
+
+
+def test_batch_lookup_matches_numbers_regardless_of_case_and_spacing(monkeypatch):
+    requested = []
+
+    async def fake_get(path, **kwargs):
+        requested.append(path)
+        return httpx.Response(200, json={"value": [{"No": "UFS300", "Unit_Price": 1.0}]})
+
+    monkeypatch.setattr(async_client.async_erp_client, "get", fake_get)
+    monkeypatch.setattr(async_client, "get_mirrored_product", lambda number: None)
+    product_cache.invalidate()
+    try:
+        products = asyncio.run(async_client.fetch_products_by_numbers([" ufs300 ", "UFS300"]))
+    finally:
+        product_cache.invalidate()
+
+    assert products[" ufs300 "]["No"] == "UFS300"
+    assert products["UFS300"]["No"] == "UFS300"
+    assert len(requested) == 1 and "No eq 'UFS300'" in requested[0]
@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from erp import async_client
+from erp.async_client import AsyncErpClient
+from erp.cache import product_cache
+from erp.database import init_db
+from erp.odata import PROJECTIONS
+from tests.odata_stub import ODataStubServer
+
+init_db()
+
+
+@pytest.fixture
+def erp_stub(monkeypatch):
+    stub = ODataStubServer()
+    stub.start()
+    monkeypatch.setattr(async_client, "async_erp_client", AsyncErpClient(base_url=stub.url))
+    product_cache.invalidate()
+    yield stub
+    stub.stop()
+    product_cache.invalidate()
+
+
+def _bytes_for(stub, call):
+    async def scenario():
+        try:
+            return await call()
+        finally:
+            await async_client.async_erp_client.aclose()
+
+    stub.reset_counters()
+    data = asyncio.run(scenario())
+    return data, stub.bytes_sent
+
+
+def test_product_lookup_fetches_only_the_quotation_fields(erp_stub):
+    data, projected = _bytes_for(erp_stub, lambda: async_client.fetch_product_by_number("PROJ0001"))
+    assert list(data["value"][0]) == PROJECTIONS["quotation"]
+
+    _, full = _bytes_for(erp_stub, lambda: async_client.fetch_entity("ItemsAPI", filter="No eq 'PROJ0001'"))
+    assert projected < full / 4
+
+
+def test_customer_lookup_uses_the_summary_projection(erp_stub):
+    customer, _ = _bytes_for(erp_stub, lambda: async_client.resolve_customer(phone_number="0711000001"))
+    assert list(customer) == PROJECTIONS["customer_summary"]
@@ -0,0 +1,92 @@
+import os
+import tempfile
+from langchain_core.outputs import Generation
+import llm_cache
+from llm_cache import LLMCache, LLMCacheStore
+
+LLM_STRING = "gpt-4o-mini temperature=0.7"
+
+
+def _store(**kwargs):
+    return LLMCacheStore(path=os.path.join(tempfile.mkdtemp(), "llm_cache.db"), **kwargs)
+
+
+def _answer(text):
+    return [Generation(text=text)]
+
+
+def test_least_recently_used_entry_is_evicted_at_the_size_cap(monkeypatch):
+    clock = iter(range(1000))
+    monkeypatch.setattr(llm_cache.time, "time", lambda: float(next(clock)))
+    cache = LLMCache(_store(max_entries=2), "test")
+    cache.update("first", LLM_STRING, _answer("1"))
+    cache.update("second", LLM_STRING, _answer("2"))
+    # Reading "first" makes "second" the least recently used entry
+    assert cache.lookup("first", LLM_STRING)[0].text == "1"
+    cache.update("third", LLM_STRING, _answer("3"))
+
+    assert cache.store.size() == 2
+    assert cache.store.evictions == 1
+    assert cache.lookup("second", LLM_STRING) is None
+    assert cache.lookup("first", LLM_STRING)[0].text == "1"
+    assert cache.lookup("third", LLM_STRING)[0].text == "3"
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = LLMCache(_store(ttl=60), "test")
+    cache.update("prompt", LLM_STRING, _answer("fresh"))
+
+    now[0] += 59
+    assert cache.lookup("prompt", LLM_STRING)[0].text == "fresh"
+    now[0] += 2
+    assert cache.lookup("prompt", LLM_STRING) is None
+    assert cache.store.size() == 0
+
+
+def test_prompts_differing_only_in_whitespace_share_an_entry():
+    cache = LLMCache(_store(), "test")
+    cache.update("Size a system\n    for 4 people", LLM_STRING, _answer("200 L"))
+    assert cache.lookup("Size a system for 4 people", LLM_STRING)[0].text == "200 L"
+    assert cache.lookup("Size a system for 4 people", "gpt-4o temperature=0") is None
+
+
+def test_routes_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(llm_cache, "llm_cache_store", _store())
+    monkeypatch.setattr(llm_cache, "route_caches", {})
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_DISABLED_ROUTES", {"product_manual.routes"})
+
+    assert llm_cache.route_cache("product_manual.routes") is False
+    enabled = llm_cache.route_cache("triaging.services")
+    assert isinstance(enabled, LLMCache)
+    assert llm_cache.route_cache("triaging.services") is enabled
+
+    monkeypatch.setattr(llm_cache, "llm_cache_store", None)
+    assert llm_cache.route_cache("triaging.helper") is False
+
+
+def test_hits_and_misses_are_counted_per_route(monkeypatch):
+    monkeypatch.setattr(llm_cache, "llm_cache_store", _store())
+    monkeypatch.setattr(llm_cache, "route_caches", {})
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_DISABLED_ROUTES", set())
+    triage = llm_cache.route_cache("triaging.routes")
+    manual = llm_cache.route_cache("product_manual.services")
+
+    assert triage.lookup("prompt", LLM_STRING) is None
+    triage.update("prompt", LLM_STRING, _answer("answer"))
+    triage.lookup("prompt", LLM_STRING)
+    # The store is shared, so the same prompt is a hit from another route too
+    manual.lookup("prompt", LLM_STRING)
+
+    stats = llm_cache.llm_cache_stats()
+    assert stats["entries"] == 1
+    assert stats["routes"]["triaging.routes"] == {"hits": 1, "misses": 1, "errors": 0, "hit_rate": 0.5}
+    assert stats["routes"]["product_manual.services"]["hits"] == 1
+
+
+def test_broken_entry_is_a_miss_not_an_error():
+    cache = LLMCache(_store(), "test")
+    cache.store.set(llm_cache.cache_key("prompt", LLM_STRING), LLM_STRING, "not json")
+    assert cache.lookup("prompt", LLM_STRING) is None
+    assert cache.stats()["errors"] == 1
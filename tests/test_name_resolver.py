@@ -0,0 +1,34 @@
+from triaging.name_resolver import CatalogNameIndex
+from triaging.data_table import solar_water_heaters
+
+index = CatalogNameIndex(solar_water_heaters)
+
+
+def test_exact_name_and_code():
+    assert index.resolve("ULTRASUN UFS300D FLATPLATE SOLAR HOT WATER SYSTEM").model == "DSD300"
+    assert index.resolve("esi300").name == "ULTRASUN UFX300I FLATPLATE SOLAR HOT WATER SYSTEM"
+
+
+def test_spacing_and_missing_words_are_repaired():
+    assert index.resolve("ULTRASUN UFX 300I FLATPLATE SOLAR HOT WATER SYSTEM").model == "ESI300"
+    assert index.resolve("ULTRASUN UVT300 VACUUM TUBE SOLAR HOT WATER SYSTEM").model == "DVS300"
+    assert index.resolve("DAYLIFF HPW 200 LITRES HEAT PUMP").model == "HPW200"
+
+
+def test_indirect_system_is_never_repaired_to_a_direct_one():
+    match = index.resolve("ULTRASUN UFS200I FLATPLATE SOLAR HOT WATER SYSTEM")
+    assert match is not None
+    assert match.model == "UFS200I"
+    assert match.model != "DSD200"
+
+
+def test_capacity_not_in_catalog_is_unresolved():
+    assert index.resolve("DAYLIFF HPW 250LITRES ALL-IN-ONE HEAT PUMP") is None
+
+
+def test_model_code_with_other_capacity_is_unresolved():
+    assert index.resolve("UFS400D") is None
+
+
+def test_text_without_series_or_code_is_unresolved():
+    assert index.resolve("ULTRASUN SOLAR HOT WATER SYSTEM") is None
@@ -0,0 +1,138 @@
+import asyncio
+from datetime import datetime, timedelta
+import httpx
+import pytest
+from erp import outbox
+from erp.database import SessionLocal, init_db
+from erp.model import OutboxItem
+
+init_db()
+
+
+@pytest.fixture(autouse=True)
+def empty_outbox():
+    db = SessionLocal()
+    db.query(OutboxItem).delete()
+    db.commit()
+    db.close()
+
+
+def _expire_lease(item_id):
+    db = SessionLocal()
+    row = db.query(OutboxItem).filter(OutboxItem.id == item_id).first()
+    row.claimed_at = datetime.utcnow() - timedelta(seconds=outbox.ERP_OUTBOX_LEASE_SECONDS + 1)
+    db.commit()
+    db.close()
+
+
+def test_sales_quote_gets_idempotency_key():
+    item = outbox.enqueue("Sales_Quote", {"Sell_to_Customer_No": "C001"})
+    assert item["payload"]["External_Document_No"] == item["id"].replace("-", "")
+
+
+def test_live_lease_is_not_claimed_by_another_worker():
+    outbox.enqueue("Sales_Quote", {"Sell_to_Customer_No": "C001"})
+    first = outbox._claim_batch(10)
+    second = outbox._claim_batch(10)
+    assert len(first) == 1 and not first[0]["reclaimed"]
+    assert second == []
+
+
+def test_expired_lease_is_reclaimed_and_old_owner_cannot_record():
+    item = outbox.enqueue("Sales_Quote", {"Sell_to_Customer_No": "C001"})
+    stale = outbox._claim_batch(10)[0]
+    _expire_lease(item["id"])
+
+    reclaimed = outbox._claim_batch(10)
+    assert [claim["id"] for claim in reclaimed] == [item["id"]]
+    assert reclaimed[0]["reclaimed"]
+
+    outbox._record_success(stale, {"No": "SQ-1"})
+    assert outbox.get_item(item["id"])["status"] == outbox.IN_PROGRESS
+
+
+def test_reclaimed_quote_already_in_erp_is_not_posted_again(monkeypatch):
+    item = outbox.enqueue("Sales_Quote", {"Sell_to_Customer_No": "C001"})
+    outbox._claim_batch(10)
+    _expire_lease(item["id"])
+    key = item["payload"]["External_Document_No"]
+    posted = []
+
+    async def fake_get(path, **kwargs):
+        assert f"External_Document_No eq '{key}'" in path
+        return httpx.Response(200, json={"value": [{"No": "SQ-1", "External_Document_No": key}]})
+
+    async def fake_post(path, **kwargs):
+        posted.append(path)
+        return httpx.Response(201, json={"No": "SQ-2"})
+
+    monkeypatch.setattr(outbox.async_erp_client, "get", fake_get)
+    monkeypatch.setattr(outbox.async_erp_client, "post", fake_post)
+
+    assert asyncio.run(outbox.drain_once()) == 1
+    assert posted == []
+    delivered = outbox.get_item(item["id"])
+    assert delivered["status"] == outbox.SUCCEEDED
+    assert delivered["result"]["No"] == "SQ-1"
+
+
+def test_retry_without_existing_quote_is_posted(monkeypatch):
+    item = outbox.enqueue("Sales_Quote", {"Sell_to_Customer_No": "C001"})
+    outbox._claim_batch(10)
+    _expire_lease(item["id"])
+
+    async def fake_get(path, **kwargs):
+        return httpx.Response(200, json={"value": []})
+
+    async def fake_post(path, **kwargs):
+        return httpx.Response(201, json={"No": "SQ-3"})
+
+    monkeypatch.setattr(outbox.async_erp_client, "get", fake_get)
+    monkeypatch.setattr(outbox.async_erp_client, "post", fake_post)
+
+    asyncio.run(outbox.drain_once())
+    assert outbox.get_item(item["id"])["result"]["No"] == "SQ-3"
+
+
+def _line():
+    return outbox.enqueue("Sales_QuoteSalesLines", {"Document_No": "SQ-1", "Type": "Item", "Quantity": 1, "No": "UFS300"})
+
+
+def test_line_post_timeout_is_not_retried(monkeypatch):
+    item = _line()
+
+    async def fake_post(path, **kwargs):
+        raise httpx.ReadTimeout("timed out")
+
+    monkeypatch.setattr(outbox.async_erp_client, "post", fake_post)
+    asyncio.run(outbox.drain_once())
+    failed = outbox.get_item(item["id"])
+    assert failed["status"] == outbox.FAILED
+    assert "may have reached ERP" in failed["last_error"]
+
+
+def test_line_that_never_left_is_retried(monkeypatch):
+    item = _line()
+
+    async def fake_post(path, **kwargs):
+        raise httpx.ConnectError("connection refused")
+
+    monkeypatch.setattr(outbox.async_erp_client, "post", fake_post)
+    asyncio.run(outbox.drain_once())
+    assert outbox.get_item(item["id"])["status"] == outbox.PENDING
+
+
+def test_reclaimed_line_is_not_posted_again(monkeypatch):
+    item = _line()
+    outbox._claim_batch(10)
+    _expire_lease(item["id"])
+    posted = []
+
+    async def fake_post(path, **kwargs):
+        posted.append(path)
+        return httpx.Response(201, json={"Line_No": 20000})
+
+    monkeypatch.setattr(outbox.async_erp_client, "post", fake_post)
+    asyncio.run(outbox.drain_once())
+    assert posted == []
+    assert outbox.get_item(item["id"])["status"] == outbox.FAILED
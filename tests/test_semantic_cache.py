@@ -0,0 +1,47 @@
+import numpy as np
+from triaging.semantic_cache import SemanticCache
+
+
+def _vector(index, dimensions=8):
+    vector = np.zeros(dimensions)
+    vector[index % dimensions] = 1.0
+    vector[(index + 1) % dimensions] = 0.1 * (index // dimensions)
+    return vector.tolist()
+
+
+def test_lookup_returns_the_closest_entry():
+    cache = SemanticCache(threshold=0.9, max_entries=10)
+    cache.add("hot water for a family", _vector(0), ["q1"])
+    cache.add("heat pump for a hotel", _vector(1), ["q2"])
+    value, similarity = cache.lookup(_vector(1))
+    assert value == ["q2"] and similarity > 0.99
+    assert cache.lookup(_vector(5))[0] is None
+
+
+def test_inserts_grow_the_matrix_without_rebuilding_it():
+    cache = SemanticCache(threshold=0.99, max_entries=100)
+    for index in range(40):
+        cache.add(f"query {index}", _vector(index, dimensions=64), index)
+    assert cache.stats()["entries"] == 40
+    assert all(cache.lookup(_vector(index, dimensions=64))[0] == index for index in range(40))
+
+
+def test_eviction_reuses_the_least_recently_used_row():
+    cache = SemanticCache(threshold=0.99, max_entries=2)
+    cache.add("a", _vector(0), "a")
+    cache.add("b", _vector(1), "b")
+    cache.lookup(_vector(0))
+    cache.add("c", _vector(2), "c")
+    assert cache.lookup(_vector(1))[0] is None
+    assert cache.lookup(_vector(0))[0] == "a"
+    assert cache.lookup(_vector(2))[0] == "c"
+    assert cache._matrix.shape[0] == 2
+
+
+def test_re_adding_a_query_overwrites_its_row():
+    cache = SemanticCache(threshold=0.99, max_entries=4)
+    cache.add("a", _vector(0), "old")
+    cache.add("a", _vector(3), "new")
+    assert cache.stats()["entries"] == 1
+    assert cache.lookup(_vector(3))[0] == "new"
+    assert cache.lookup(_vector(0))[0] is None
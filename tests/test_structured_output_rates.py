@@ -0,0 +1,22 @@
+import json
+from bench.structured_output_rates import classify_legacy_response
+
+VALID = {
+    "primary_recommendation": {"name": "ULTRASUN UFS300D FLATPLATE SOLAR HOT WATER SYSTEM"},
+    "alternative_options": [{"name": "DAYLIFF HPW 300LITRES ALL-IN-ONE HEAT PUMP"}],
+}
+
+
+def test_fenced_and_embedded_json_parse():
+    assert classify_legacy_response(f"```json\n{json.dumps(VALID)}\n```") == "ok"
+    assert classify_legacy_response(f"Here is my recommendation: {json.dumps(VALID)} Thanks!") == "ok"
+
+
+def test_truncated_json_is_a_parse_failure():
+    assert classify_legacy_response(json.dumps(VALID)[:-10]) == "parse_failure"
+    assert classify_legacy_response("I recommend the UFS300D system.") == "parse_failure"
+
+
+def test_names_outside_the_catalog_are_counted():
+    invalid = dict(VALID, alternative_options=[{"name": "ULTRASUN UFS 300 D"}])
+    assert classify_legacy_response(json.dumps(invalid)) == "invalid_names"
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from upstream import UpstreamLimiter
+
+UPSTREAM_LATENCY = 0.05
+
+
+async def _fake_llm_call(limiter):
+    async with limiter:
+        await asyncio.sleep(UPSTREAM_LATENCY)
+
+
+def _elapsed(requests: int, limit: int):
+    async def scenario():
+        limiter = UpstreamLimiter("test", limit)
+        started = time.perf_counter()
+        await asyncio.gather(*(_fake_llm_call(limiter) for _ in range(requests)))
+        return time.perf_counter() - started, limiter.peak_in_flight
+
+    return asyncio.run(scenario())
+
+
+def test_throughput_scales_with_request_count_up_to_the_limit():
+    single, _ = _elapsed(1, limit=16)
+    sixteen, peak = _elapsed(16, limit=16)
+    thirty_two, _ = _elapsed(32, limit=16)
+    # 16 concurrent calls take about as long as one; past the limit they queue in waves
+    assert peak == 16
+    assert sixteen < single * 3
+    assert UPSTREAM_LATENCY * 2 <= thirty_two < UPSTREAM_LATENCY * 6
+
+
+def test_waiting_callers_do_not_block_the_event_loop():
+    async def scenario():
+        limiter = UpstreamLimiter("test", 1)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticking = asyncio.create_task(ticker())
+        await asyncio.gather(*(_fake_llm_call(limiter) for _ in range(4)))
+        ticking.cancel()
+        return ticks, limiter.stats()
+
+    ticks, stats = asyncio.run(scenario())
+    # Four serialised 50 ms calls leave the loop free to tick ~20 times
+    assert ticks >= 10
+    assert stats["calls"] == 4 and stats["peak_in_flight"] == 1 and stats["waiting"] == 0
+
+
+def _limited_model(monkeypatch, limiter, **kwargs):
+    from langchain_core.messages import AIMessage, AIMessageChunk
+    from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+    from langchain_openai import ChatOpenAI
+    import upstream
+
+    async def fake_agenerate(self, messages, *args, **kw):
+        await asyncio.sleep(UPSTREAM_LATENCY)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="answer"))])
+
+    async def fake_astream(self, messages, *args, **kw):
+        for token in ("an", "swer"):
+            await asyncio.sleep(UPSTREAM_LATENCY / 2)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    monkeypatch.setattr(ChatOpenAI, "_agenerate", fake_agenerate)
+    monkeypatch.setattr(ChatOpenAI, "_astream", fake_astream)
+    monkeypatch.setattr(upstream, "openai_limiter", limiter)
+    return upstream.LimitedChatOpenAI(api_key="test", **kwargs)
+
+
+def test_llm_cache_hits_do_not_take_a_limiter_slot(monkeypatch):
+    from langchain_core.caches import InMemoryCache
+
+    limiter = UpstreamLimiter("openai", 1)
+    model = _limited_model(monkeypatch, limiter, cache=InMemoryCache())
+
+    async def scenario():
+        await model.ainvoke("question")
+        async with limiter:
+            # The only slot is busy; a cached answer must not wait for it
+            return await asyncio.wait_for(model.ainvoke("question"), timeout=1)
+
+    assert asyncio.run(scenario()).content == "answer"
+    assert limiter.calls == 2
+
+
+def test_stream_releases_its_slot_before_a_slow_reader_finishes(monkeypatch):
+    limiter = UpstreamLimiter("openai", 1)
+    model = _limited_model(monkeypatch, limiter)
+
+    async def scenario():
+        tokens = []
+        async for chunk in model.astream("question"):
+            tokens.append(chunk.content)
+            # A slow SSE client: the upstream stream is done long before this reader
+            await asyncio.sleep(UPSTREAM_LATENCY * 2)
+            if len(tokens) == 1:
+                in_flight_while_reading = limiter.in_flight
+        return "".join(tokens), in_flight_while_reading
+
+    answer, in_flight_while_reading = asyncio.run(scenario())
+    assert answer == "answer"
+    assert in_flight_while_reading == 0
+    assert limiter.calls == 1
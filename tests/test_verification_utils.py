@@ -0,0 +1,79 @@
+import gc
+import os
+import sqlite3
+import tempfile
+import warnings
+from datetime import datetime, timedelta
+import pytest
+from Auth import verification_utils
+from Auth.verification_utils import InMemoryVerificationCodeStore, SQLiteVerificationCodeStore, VerificationCodeStore
+
+
+def sqlite_store():
+    return SQLiteVerificationCodeStore(os.path.join(tempfile.mkdtemp(), "verification_codes.db"))
+
+
+def test_interface_cannot_be_instantiated():
+    with pytest.raises(TypeError):
+        VerificationCodeStore()
+
+
+@pytest.mark.parametrize("make_store", [InMemoryVerificationCodeStore, sqlite_store])
+def test_set_get_pop_and_sweep(make_store):
+    store = make_store()
+    expires_at = datetime.utcnow() + timedelta(minutes=2)
+    store.set("a@example.com", "1234", expires_at)
+    store.set("b@example.com", "5678", datetime.utcnow() - timedelta(seconds=1))
+
+    assert store.get("a@example.com") == {"code": "1234", "expires_at": expires_at}
+    assert store.sweep() == 1
+    assert store.get("b@example.com") is None
+
+    store.pop("a@example.com")
+    assert store.get("a@example.com") is None
+
+
+def test_sqlite_store_closes_its_connections():
+    store = sqlite_store()
+    with warnings.catch_warnings():
+        # Python 3.13+ warns about connections garbage-collected while still open
+        warnings.simplefilter("error", ResourceWarning)
+        for _ in range(20):
+            store.set("a@example.com", "1234", datetime.utcnow() + timedelta(minutes=2))
+            store.get("a@example.com")
+        gc.collect()
+    with store._connect() as conn:
+        pass
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+
+
+@pytest.mark.parametrize("make_store", [InMemoryVerificationCodeStore, sqlite_store])
+def test_token_revocation_until_expiry(make_store):
+    store = make_store()
+    store.revoke_token("live", datetime.utcnow() + timedelta(hours=1))
+    store.revoke_token("expired", datetime.utcnow() - timedelta(seconds=1))
+
+    assert store.is_token_revoked("live")
+    assert not store.is_token_revoked("other")
+    assert store.sweep() == 1
+    assert store.is_token_revoked("live")
+    assert not store.is_token_revoked("expired")
+    assert list(store.revoked_tokens()) == ["live"]
+
+
+def test_sqlite_revocation_is_seen_by_another_worker_store():
+    path = os.path.join(tempfile.mkdtemp(), "verification_codes.db")
+    SQLiteVerificationCodeStore(path).revoke_token("jti-1", datetime.utcnow() + timedelta(hours=1))
+    assert SQLiteVerificationCodeStore(path).is_token_revoked("jti-1")
+
+
+def test_revoked_token_ids_merge_store_entries_and_drop_expired(monkeypatch):
+    monkeypatch.setattr(verification_utils, "revoked_token_ids", {})
+    live = datetime.utcnow() + timedelta(hours=1)
+    verification_utils.revoked_token_ids["local"] = live
+    verification_utils.revoked_token_ids["old"] = datetime.utcnow() - timedelta(seconds=1)
+
+    verification_utils.remember_revoked_tokens({"other-worker": live, "stale": datetime.utcnow() - timedelta(seconds=1)})
+
+    assert verification_utils.revoked_token_ids == {"local": live, "other-worker": live}
@@ -0,0 +1,140 @@
+import json
+import ntpath
+import os
+import re
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Maximum tokens of Pinecone context placed in a recommendation or expansion prompt
+PROMPT_CONTEXT_TOKEN_BUDGET = int(os.getenv("PROMPT_CONTEXT_TOKEN_BUDGET", "1500"))
+# Metadata kept for each match; the rest (PDF producer, page labels, ...) only costs tokens
+PROMPT_CONTEXT_METADATA_FIELDS = [
+    field.strip() for field in os.getenv("PROMPT_CONTEXT_METADATA_FIELDS", "text,source,page").split(",") if field.strip()
+]
+# Word-shingle overlap above which a chunk is treated as a duplicate of a better-scoring one
+PROMPT_CONTEXT_DEDUP_THRESHOLD = float(os.getenv("PROMPT_CONTEXT_DEDUP_THRESHOLD", "0.8"))
+
+TOKENIZER_MODEL = "gpt-4o-mini"
+SHINGLE_SIZE = 5
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """tiktoken encoding for the prompt model, or None to fall back to a character estimate"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            print(f"tiktoken unavailable, estimating prompt tokens from length: {str(e)}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text)
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def _shingles(text: str) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _is_duplicate(shingles: set, kept: List[set]) -> bool:
+    # Overlap relative to the smaller chunk, so a chunk contained in another counts as a duplicate
+    for other in kept:
+        overlap = len(shingles & other) / max(1, min(len(shingles), len(other)))
+        if overlap >= PROMPT_CONTEXT_DEDUP_THRESHOLD:
+            return True
+    return False
+
+
+def compact_results(pinecone_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Best match first, without repeated ids or overlapping text, keeping only the needed metadata"""
+    compacted = []
+    seen_ids = set()
+    kept_shingles = []
+    for result in sorted(pinecone_results, key=lambda result: result.get("score") or 0, reverse=True):
+        if result.get("id") in seen_ids:
+            continue
+        seen_ids.add(result.get("id"))
+        metadata = result.get("metadata") or {}
+        text = " ".join(str(metadata.get("text", "")).split())
+        if text:
+            shingles = _shingles(text)
+            if _is_duplicate(shingles, kept_shingles):
+                continue
+            kept_shingles.append(shingles)
+        item = {"score": round(result.get("score") or 0, 3)}
+        for field in PROMPT_CONTEXT_METADATA_FIELDS:
+            value = text if field == "text" else metadata.get(field)
+            if value in (None, ""):
+                continue
+            if field == "source":
+                # Sources were indexed on Windows ("Data\\manual.pdf"); ntpath splits on both separators
+                value = ntpath.basename(str(value))
+            item[field] = value
+        compacted.append(item)
+    return compacted
+
+
+def build_context(pinecone_results: List[Dict[str, Any]], token_budget: Optional[int] = None) -> str:
+    """Pinecone matches as one compact JSON line each, cut off at `token_budget` tokens"""
+    token_budget = PROMPT_CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    lines = []
+    used = 0
+    results = compact_results(pinecone_results)
+    for item in results:
+        line = json.dumps(item, ensure_ascii=False, separators=(",", ":"))
+        tokens = count_tokens(line) + 1
+        if used + tokens > token_budget:
+            # Shorten the text of the first match that does not fit, then stop
+            text = item.get("text")
+            if text:
+                overhead = count_tokens(json.dumps({**item, "text": ""}, ensure_ascii=False, separators=(",", ":"))) + 1
+                remaining = token_budget - used - overhead
+                if remaining > 20:
+                    item["text"] = truncate_to_tokens(text, remaining)
+                    lines.append(json.dumps(item, ensure_ascii=False, separators=(",", ":")))
+            print(f"Prompt context cut at {token_budget} tokens: kept {len(lines)} of {len(results)} matches")
+            break
+        lines.append(line)
+        used += tokens
+    return "\n".join(lines)
+
+
+# Prompt sizes per route: {"calls", "last_tokens", "max_tokens", "max_context_tokens"}
+prompt_token_stats: Dict[str, Dict[str, int]] = {}
+
+
+def log_prompt_tokens(route: str, messages: List[Dict[str, str]], context: str = ""):
+    """Record the prompt size of one LLM call, and how much of it is Pinecone context"""
+    total = sum(count_tokens(message["content"]) for message in messages)
+    stats = prompt_token_stats.setdefault(route, {"calls": 0, "last_tokens": 0, "max_tokens": 0, "max_context_tokens": 0})
+    stats["calls"] += 1
+    stats["last_tokens"] = total
+    stats["max_tokens"] = max(stats["max_tokens"], total)
+    stats["max_context_tokens"] = max(stats["max_context_tokens"], count_tokens(context))
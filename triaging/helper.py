@@ -1,7 +1,8 @@
+import asyncio
 import os
 import re
 from typing import Any, Dict, List
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_openai import OpenAIEmbeddings
 from fastapi import HTTPException
 from triaging.schemas import QuestionnaireResponse
 from pinecone import Pinecone
@@ -10,6 +11,9 @@ from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain.output_parsers import ResponseSchema, StructuredOutputParser
 from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
+from llm_cache import route_cache
+from embedding_cache import cached_embeddings
+from upstream import LimitedChatOpenAI, openai_limiter, pinecone_limiter
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 load_dotenv()
@@ -28,9 +32,10 @@ index = pc.Index(index_name)
 #     convert_system_message_to_human=True
 # )
 
-llm = ChatOpenAI(
+llm = LimitedChatOpenAI(
     model="gpt-4o-mini", 
-    temperature=0.7
+    temperature=0.7,
+    cache=route_cache("triaging.helper")
 )
 
 # embeddings = OpenAIEmbeddings(api_key=os.getenv("OPENAI_API_KEY"))
@@ -44,7 +49,8 @@ def download_openai_embeddings():
 
 
 
-embeddings = download_openai_embeddings()
+# Repeated prompts (questionnaires are very repetitive) are embedded once
+embeddings = cached_embeddings(download_openai_embeddings(), openai_limiter)
 # def download_google_embeddings():
 #     """Downloads and returns Google embeddings."""
     
@@ -57,10 +63,11 @@ embeddings = download_openai_embeddings()
 # embeddings = download_google_embeddings()
 
 # Generate embeddings for a text
-def generate_embeddings(text):
+async def generate_embeddings(text):
     """Generate embeddings for the input text using Google's embedding model"""
     try:
-        vector = embeddings.embed_query(text)
+        # The OpenAI limiter is only taken on a cache miss, inside CachedEmbeddings
+        vector = await embeddings.aembed_query(text)
         return vector
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating embeddings: {str(e)}")
@@ -80,16 +87,18 @@ def generate_prompt_from_questionnaire(data: QuestionnaireResponse) -> str:
     System Type: {data.systemType}
     """
 
-def get_recommendations_from_pinecone(vector: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+async def get_recommendations_from_pinecone(vector: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
     """Query Pinecone for the most similar systems based on the embedding vector"""
     try:
         
-        # Query the index
-        query_response = index.query(
-            vector=vector,
-            top_k=top_k,
-            include_metadata=True
-        )
+        # Query the index (the Pinecone client is synchronous, so run it off the event loop)
+        async with pinecone_limiter:
+            query_response = await asyncio.to_thread(
+                index.query,
+                vector=vector,
+                top_k=top_k,
+                include_metadata=True
+            )
         
         # Process and return results
         return [
@@ -266,10 +275,10 @@ async def extract_questionnaire_data_with_ai(data: Dict[str, str]) -> Questionna
         
         # Generate the structured extraction
         _input = prompt.format(questionnaire=questionnaire_text)
-        response = llm.invoke(_input)
+        response = await llm.ainvoke(_input)
         
         # Parse the response
-        extracted_data = output_parser.parse(response)
+        extracted_data = output_parser.parse(response.content)
         
         # Convert to QuestionnaireResponse
         return QuestionnaireResponse(
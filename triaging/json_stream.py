@@ -0,0 +1,60 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+
+class TopLevelJsonParser:
+    """
+    Incrementally parse a streamed JSON object and report each top-level member as
+    soon as its value is complete, e.g. `"warranty": {...}` is returned before the
+    model has produced the rest of the object. Text before the first `{` (such as a
+    ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start: Optional[int] = None
+        self.done = False
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """Add streamed text; return the (key, value) members completed by it"""
+        self._buffer += text
+        members = []
+        while self._pos < len(self._buffer) and not self.done:
+            char = self._buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"' and self._depth > 0:
+                self._in_string = True
+            elif char == "{" or (char == "[" and self._depth > 0):
+                self._depth += 1
+                if self._depth == 1:
+                    self._member_start = self._pos + 1
+            elif char in "}]" and self._depth > 0:
+                if self._depth == 1:
+                    members.extend(self._close_member())
+                    self.done = True
+                self._depth -= 1
+            elif char == "," and self._depth == 1:
+                members.extend(self._close_member())
+                self._member_start = self._pos + 1
+            self._pos += 1
+        return members
+
+    def _close_member(self) -> List[Tuple[str, Any]]:
+        segment = self._buffer[self._member_start:self._pos].strip()
+        if not segment:
+            return []
+        try:
+            return list(json.loads("{" + segment + "}").items())
+        except json.JSONDecodeError:
+            # A malformed member is left to the full-response parser
+            return []
@@ -0,0 +1,151 @@
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from dotenv import load_dotenv
+from triaging.data_table import solar_water_heaters
+
+load_dotenv()
+
+# Minimum confidence for a near-miss name to be replaced by a catalog entry
+NAME_MATCH_THRESHOLD = float(os.getenv("NAME_MATCH_THRESHOLD", "0.7"))
+
+# Letters and digits are separate tokens, so "UFX300I", "UFX 300I" and "UFX 300 I" agree
+TOKEN_PATTERN = re.compile(r"[A-Z]+|\d+")
+
+# What identifies a product: series, capacity and variant ("UFS200I" -> ("UFS", 200, "I")).
+# A near-miss name is only repaired onto an entry with the same signature, because a
+# high text score can still point at another capacity or at a direct instead of an
+# indirect system.
+SERIES_PATTERN = re.compile(r"\b(UFX|UFS|UVT|UVR|CWS)\s*(\d{2,4})\s*(DE|D|I|L)?\b")
+HEAT_PUMP_PATTERN = re.compile(r"\bHPW\s*(\d{2,4})")
+CODE_PATTERN = re.compile(r"^([A-Z]+)\s*(\d+)\s*(?:/\s*(\d+))?$")
+
+Signature = Tuple[str, int, str]
+
+
+class NameMatch(NamedTuple):
+    name: str
+    model: str
+    score: float
+
+
+def normalize_tokens(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.upper())
+
+
+def trigrams(text: str) -> Set[str]:
+    """Character trigrams of the text with spacing and punctuation removed"""
+    compact = "".join(normalize_tokens(text))
+    padded = f"  {compact} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def name_signature(text: str) -> Optional[Signature]:
+    """Series, capacity and variant named in a product name, if any"""
+    text = text.upper()
+    match = SERIES_PATTERN.search(text)
+    if match:
+        return match.group(1), int(match.group(2)), match.group(3) or ""
+    match = HEAT_PUMP_PATTERN.search(text)
+    if match:
+        return "HPW", int(match.group(1)), ""
+    return None
+
+
+def code_signature(text: str) -> Optional[Signature]:
+    """Prefix, number and suffix of an ERP code such as "DSD300" or "DSD150/8" """
+    match = CODE_PATTERN.match(text.upper().strip())
+    if not match:
+        return None
+    return match.group(1), int(match.group(2)), match.group(3) or ""
+
+
+def _similarity(query_tokens: Set[str], query_trigrams: Set[str], tokens: Set[str], grams: Set[str]) -> float:
+    # Trigram Dice forgives typos and spacing; token Jaccard tells 300I from 300D apart
+    dice = 2 * len(query_trigrams & grams) / (len(query_trigrams) + len(grams))
+    jaccard = len(query_tokens & tokens) / len(query_tokens | tokens)
+    return round((dice + jaccard) / 2, 4)
+
+
+class CatalogNameIndex:
+    """
+    Precomputed token and trigram index over catalog names and ERP codes. `resolve`
+    maps a name or code the model got slightly wrong to the closest catalog entry.
+    """
+
+    def __init__(self, catalog: Dict[str, str]):
+        self.catalog = catalog
+        self._by_code = {code.upper(): name for name, code in catalog.items()}
+        # Each name and each code is one indexed form of its catalog entry
+        self._forms = []
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._signatures: Dict[str, Set[Signature]] = {}
+        for name, code in catalog.items():
+            self._signatures[name] = {sig for sig in (name_signature(name), code_signature(code)) if sig}
+            for form in (name, code):
+                grams = trigrams(form)
+                for gram in grams:
+                    self._postings[gram].add(len(self._forms))
+                self._forms.append((name, set(normalize_tokens(form)), grams))
+        self.exact = 0
+        self.repaired = 0
+        self.unresolved = 0
+
+    def _best(self, text: str) -> Optional[NameMatch]:
+        query_tokens = set(normalize_tokens(text))
+        query_trigrams = trigrams(text)
+        # Without a series/capacity/variant or code to check against, nothing is safe to repair
+        signature = name_signature(text) or code_signature(text)
+        if not query_tokens or signature is None:
+            return None
+        candidates = set()
+        for gram in query_trigrams:
+            candidates |= self._postings.get(gram, set())
+        best = None
+        for position in candidates:
+            name, tokens, grams = self._forms[position]
+            if signature not in self._signatures[name]:
+                continue
+            score = _similarity(query_tokens, query_trigrams, tokens, grams)
+            if best is None or score > best.score:
+                best = NameMatch(name, self.catalog[name], score)
+        return best
+
+    def match(self, text: str) -> Optional[NameMatch]:
+        """
+        Closest catalog entry with the same series, capacity and variant (or ERP code)
+        as `text`, with its confidence (1.0 for an exact name or code)
+        """
+        text = (text or "").strip()
+        if text in self.catalog:
+            return NameMatch(text, self.catalog[text], 1.0)
+        if text.upper() in self._by_code:
+            name = self._by_code[text.upper()]
+            return NameMatch(name, self.catalog[name], 1.0)
+        return self._best(text)
+
+    def resolve(self, text: str, threshold: float = NAME_MATCH_THRESHOLD) -> Optional[NameMatch]:
+        """Catalog entry for `text`, or None when no entry reaches `threshold`"""
+        match = self.match(text)
+        if match and match.score >= 1.0:
+            self.exact += 1
+            return match
+        if match and match.score >= threshold:
+            self.repaired += 1
+            return match
+        self.unresolved += 1
+        print(f"Unresolved product name {text!r}; best match {match.name if match else None!r} (score {match.score if match else 0})")
+        return None
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "entries": len(self.catalog),
+            "threshold": NAME_MATCH_THRESHOLD,
+            "exact": self.exact,
+            "repaired": self.repaired,
+            "unresolved": self.unresolved,
+        }
+
+
+catalog_names = CatalogNameIndex(solar_water_heaters)
@@ -0,0 +1,240 @@
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from triaging.schemas import QuestionnaireResponse, RecommendationResponse
+from triaging.data_table import solar_water_heaters
+
+load_dotenv()
+
+# "llm" asks the model to choose systems, "rules" uses this module only, "hybrid" picks
+# systems here and lets the model rewrite the descriptions and installation notes
+RECOMMENDATION_MODES = ("llm", "rules", "hybrid")
+RECOMMENDATION_MODE = os.getenv("RECOMMENDATION_MODE", "llm").lower()
+
+# Budget (KES) below which economy systems are preferred and above which premium ones are
+RECOMMENDATION_LOW_BUDGET = float(os.getenv("RECOMMENDATION_LOW_BUDGET", "150000"))
+RECOMMENDATION_HIGH_BUDGET = float(os.getenv("RECOMMENDATION_HIGH_BUDGET", "400000"))
+
+# Same sizing rule as analyze_requirements
+LITERS_PER_PERSON = 50
+
+FLATPLATE = "Flatplate"
+VACTUBE = "Vacuum Tube"
+VACROD = "Vacuum Rod"
+HEAT_PUMP = "Heat Pump"
+
+PRICE_ORDER = ["Low", "Medium", "High"]
+
+# Series code in catalog names -> (collector type, price category, description)
+SERIES = {
+    "UFX": (FLATPLATE, "Low", "Dayliff Ultrasun UFX flat plate systems are an economical, robust choice for domestic hot water with a proven thermosiphon design."),
+    "UFS": (FLATPLATE, "Medium", "Dayliff Ultrasun UFS Flat Plate Solar Hot Water Systems are efficient and economical water heaters that provide excellent performance in all domestic applications."),
+    "UVT": (VACTUBE, "High", "Vacuum tube technology for enhanced efficiency, especially in areas with less direct sunlight."),
+    "UVR": (VACROD, "High", "Vacuum rod collectors keep heat losses low and perform well in cooler, cloudier locations."),
+    "CWS": (FLATPLATE, "High", "Ultrasun CWS central water systems supply large volumes of hot water for institutions, hotels and apartment blocks."),
+    "HPW": (HEAT_PUMP, "High", "Dayliff HPW all-in-one heat pumps heat water from ambient air at a fraction of the energy of an electric element, day or night."),
+}
+
+SYSTEM_PATTERN = re.compile(r"\b(UFX|UFS|UVT|UVR|CWS)(\d{2,4})(DE|D|I)?\b")
+HEAT_PUMP_PATTERN = re.compile(r"\bHPW (\d{2,4})LITRES\b")
+
+
+def _catalog_entry(name: str, code: str) -> Optional[Dict[str, Any]]:
+    """Describe a complete system in the catalog; tanks and kits return None"""
+    if "TANK" in name or name.startswith("BOX "):
+        return None
+    heat_pump = HEAT_PUMP_PATTERN.search(name)
+    if heat_pump:
+        series, capacity, variant = "HPW", int(heat_pump.group(1)), ""
+    else:
+        match = SYSTEM_PATTERN.search(name)
+        if not match or "SYSTEM" not in name:
+            return None
+        series, capacity, variant = match.group(1), int(match.group(2)), match.group(3) or ""
+    collector_type, price_category, description = SERIES[series]
+    return {
+        "name": name,
+        "model": code,
+        "series": series,
+        "capacity": capacity,
+        "collector_type": collector_type,
+        "indirect": variant == "I" or "INDIRECT" in name,
+        "price_category": price_category,
+        "description": description,
+    }
+
+
+# Complete systems from the ERP catalog, smallest first
+CATALOG: List[Dict[str, Any]] = sorted(
+    (entry for entry in (_catalog_entry(name, code) for name, code in solar_water_heaters.items()) if entry),
+    key=lambda entry: (entry["capacity"], entry["name"]),
+)
+
+
+def parse_budget(budget: Optional[str]) -> Optional[float]:
+    """Read an amount such as "KES 250,000" or "250k" from the questionnaire budget"""
+    if not budget:
+        return None
+    match = re.search(r"(\d[\d,\.]*)\s*(k|m)?", budget.lower())
+    if not match:
+        return None
+    try:
+        amount = float(match.group(1).replace(",", ""))
+    except ValueError:
+        return None
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(match.group(2), 1)
+    return amount * multiplier or None
+
+
+def budget_price_category(budget: Optional[str]) -> str:
+    amount = parse_budget(budget)
+    if amount is None:
+        return "Medium"
+    if amount < RECOMMENDATION_LOW_BUDGET:
+        return "Low"
+    if amount > RECOMMENDATION_HIGH_BUDGET:
+        return "High"
+    return "Medium"
+
+
+def _wants_heat_pump(analysis: Dict[str, Any]) -> bool:
+    return "heat pump" in (analysis.get("system_type") or "").lower()
+
+
+def _needs_indirect(analysis: Dict[str, Any]) -> bool:
+    """Borehole and hard water scale anything that heats the supply water directly"""
+    water_source = (analysis.get("water_source") or "").lower()
+    return "borehole" in water_source or "hard" in water_source
+
+
+def _rank(candidates: List[Dict[str, Any]], target: float, price_category: str) -> List[Dict[str, Any]]:
+    """
+    Best fit first: the smallest system covering `target`, then larger ones, then the
+    undersized ones from largest down; ties prefer the budget's price category.
+    """
+    wanted = PRICE_ORDER.index(price_category)
+
+    def key(entry):
+        covers = entry["capacity"] >= target
+        size_gap = entry["capacity"] - target if covers else target - entry["capacity"]
+        return (not covers, size_gap, abs(PRICE_ORDER.index(entry["price_category"]) - wanted))
+
+    return sorted(candidates, key=key)
+
+
+def select_systems(analysis: Dict[str, Any], budget: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Return the primary system followed by up to two alternatives from CATALOG"""
+    target = float(analysis["system_size_recommendation"]["ideal_capacity_liters"])
+    price_category = budget_price_category(budget)
+    heat_pumps = [entry for entry in CATALOG if entry["collector_type"] == HEAT_PUMP]
+    solar = [entry for entry in CATALOG if entry["collector_type"] != HEAT_PUMP]
+    if _needs_indirect(analysis):
+        # Same rule the LLM prompt enforces: borehole (or hard) water scales direct collectors
+        # and the all-in-one HPW heat pumps, which heat the supply water in their own tank,
+        # so only indirect systems are offered. No HPW model is indirect today, so this
+        # leaves heat pumps out even when the customer asked for one.
+        solar = [entry for entry in solar if entry["indirect"]]
+        heat_pumps = [entry for entry in heat_pumps if entry["indirect"]]
+
+    preferred, other = (heat_pumps, solar) if _wants_heat_pump(analysis) else (solar, heat_pumps)
+    if not preferred:
+        preferred, other = other, preferred
+    ranked = _rank(preferred, target, price_category)
+    primary = ranked[0]
+
+    alternatives = []
+    # Always offer the other technology (a heat pump next to solar and vice versa)
+    ranked_other = _rank(other, target, price_category)
+    if ranked_other:
+        alternatives.append(ranked_other[0])
+    # Then a different collector type or size from the preferred technology
+    for entry in ranked[1:]:
+        if len(alternatives) == 2:
+            break
+        if entry["collector_type"] != primary["collector_type"] or entry["capacity"] != primary["capacity"]:
+            alternatives.append(entry)
+    return [primary] + alternatives
+
+
+def _recommended_system(entry: Dict[str, Any], target: float, is_primary: bool) -> Dict[str, Any]:
+    units = max(1, math.ceil(target / entry["capacity"]))
+    description = entry["description"]
+    if units > 1:
+        description += f" {units} units are needed to cover about {int(target)} litres per day."
+    system = {
+        "name": entry["name"],
+        "model": entry["model"],
+        "description": description,
+        "is_primary": is_primary,
+        "specifications": {
+            "tank_size": f"{entry['capacity']} Liters",
+            "collector_type": entry["collector_type"],
+            "suitable_for": f"Up to {units * max(1, entry['capacity'] // LITERS_PER_PERSON)} people",
+        },
+    }
+    if not is_primary:
+        system["price_category"] = entry["price_category"]
+    return system
+
+
+def recommend_with_rules(analysis: Dict[str, Any], data: QuestionnaireResponse) -> RecommendationResponse:
+    """Build a complete RecommendationResponse from analyze_requirements output without the LLM"""
+    target = float(analysis["system_size_recommendation"]["ideal_capacity_liters"])
+    systems = select_systems(analysis, data.budget)
+    primary = systems[0]
+
+    additional_components = [
+        {
+            "name": "SOLAR THERMAL SR609 AC CONTROLLER",
+            "description": "Programmable temperature controller that automatically switches ON/OFF the electric booster heaters at certain pre-programmed times."
+        },
+        {
+            "name": "HEATER 3KW RURAL",
+            "description": "Electric heating element for temperature boosting during cloudy days."
+        }
+    ]
+    if primary["indirect"]:
+        additional_components.insert(1, {
+            "name": "SOLAR HOT WATER HEATER FLUID 20L",
+            "description": "Heat transfer fluid for indirect solar hot water systems."
+        })
+
+    installation_notes = [
+        "Professional installation recommended for optimal performance",
+        "System must be installed with proper safety valves and pressure relief",
+    ]
+    if primary["collector_type"] == HEAT_PUMP:
+        installation_notes.insert(0, "Mount the heat pump in a well-ventilated location with free airflow around the unit")
+    else:
+        installation_notes.insert(0, f"Mount collectors on the {analysis.get('roof_type_needed') or 'roof'} facing the equator with an unshaded aspect")
+
+    return RecommendationResponse(
+        recommended_systems=[_recommended_system(entry, target, index == 0) for index, entry in enumerate(systems)],
+        water_quality_requirements=[
+            {"parameter": "TDS", "value": "<1500mg/l"},
+            {"parameter": "Hardness", "value": "<400mg/l CaCO3"},
+            {"parameter": "Saturation Index", "value": ">0.8<1.0"}
+        ],
+        additional_components=additional_components,
+        technical_specifications=[
+            {"parameter": "Daily Hot Water Demand", "value": f"{int(analysis['daily_hot_water_needed'])} Liters"},
+            {"parameter": "Recommended Capacity", "value": f"{int(target)} Liters"},
+            {"parameter": "Effective Sunlight", "value": f"{analysis['effective_sunlight_hours']} hours/day"},
+            {"parameter": "Operating Pressure", "value": "4 bar"}
+        ],
+        installation_notes=installation_notes,
+        warranty={
+            "tank": "5 years",
+            "collector": "10 years",
+            "parts": "1 year"
+        }
+    )
+
+
+def resolve_mode(mode: Optional[str]) -> str:
+    mode = (mode or RECOMMENDATION_MODE).lower()
+    if mode not in RECOMMENDATION_MODES:
+        raise ValueError(f"Unknown recommendation mode: {mode}. Use one of {', '.join(RECOMMENDATION_MODES)}")
+    return mode
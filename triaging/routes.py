@@ -1,15 +1,21 @@
 import asyncio
-from typing import Dict
+from typing import Dict, Optional
 from fastapi import APIRouter, HTTPException, Query,status,Depends, Body
 from langchain.chains import LLMChain
 from langchain_google_genai import ChatGoogleGenerativeAI
-from triaging.schemas import UserQuery, QuestionnaireResponse, RecommendationResponse, ExpansionParameters, ExpansionResponse, SystemComponent
+from triaging.schemas import UserQuery, QuestionnaireResponse, RecommendationResponse, ExpansionParameters, ExpansionResponse, SystemComponent, ExpansionDraft
 from triaging.prompt import get_triaging_prompt_template, expansion_system_prompt
 from dotenv import load_dotenv
 from openai import OpenAI
-from langchain_openai import ChatOpenAI
-from triaging.services import process_model_response, generate_ai_recommendations
+from llm_cache import route_cache
+from triaging.services import process_model_response, generate_ai_recommendations, stream_ai_recommendations, enrich_recommendation, structured_output_stats
+from triaging.recommender import recommend_with_rules, resolve_mode
 from triaging.helper import generate_prompt_from_questionnaire, generate_embeddings, get_recommendations_from_pinecone, analyze_requirements, extract_questionnaire_data_with_ai
+from triaging.semantic_cache import triage_question_cache, TRIAGE_SEMANTIC_CACHE_ENABLED
+from triaging.name_resolver import catalog_names
+from triaging.context_builder import build_context, log_prompt_tokens, prompt_token_stats
+from upstream import LimitedChatOpenAI
+from sse import format_sse, sse_response
 # import google.generativeai as genai
 import os
 from triaging.services import process_model_response
@@ -32,10 +38,15 @@ load_dotenv()
 
 # OpenAI Configuration (commented out)
 # client = OpenAI()
-model = ChatOpenAI(
+model = LimitedChatOpenAI(
     model_name="gpt-4o-mini",
     temperature=0.5,
-    streaming=True
+    streaming=True,
+    cache=route_cache("triaging.routes")
+)
+# Expansion answers are constrained to the ExpansionDraft JSON schema
+expansion_model = model.with_structured_output(
+    ExpansionDraft, method="json_schema", strict=True, include_raw=True
 )
 
 # Gemini Configuration
@@ -57,8 +68,21 @@ async def get_user_question(user_query: UserQuery):
     prompt_template = get_triaging_prompt_template()
     prompt = prompt_template.format(user_query=user_query.user_query)
 
+    # Near-paraphrases of an earlier query reuse its generated questions
+    query_vector = None
+    if TRIAGE_SEMANTIC_CACHE_ENABLED:
+        try:
+            query_vector = await generate_embeddings(user_query.user_query)
+            cached_questions, similarity = triage_question_cache.lookup(query_vector)
+            if cached_questions is not None:
+                print(f"Semantic cache hit (similarity {similarity:.3f})")
+                return {"generated_questions": cached_questions}
+        except Exception as e:
+            # The cache is an optimisation only; answer from the model
+            print(f"Semantic cache lookup failed: {str(e)}")
+
     try:
-        response_text = await asyncio.to_thread(model.invoke, prompt)
+        response_text = await model.ainvoke(prompt)
         # print(response)
         # Use Gemini to generate response
         # response = await asyncio.to_thread(
@@ -73,41 +97,69 @@ async def get_user_question(user_query: UserQuery):
         # question_list = process_model_response(response)
         question_list = process_model_response(response_text)
         print(f"Generated Questions: {question_list}")
+        if query_vector is not None:
+            triage_question_cache.add(user_query.user_query.strip().lower(), query_vector, question_list)
         
         # Return the generated questions as a list
         return {"generated_questions": question_list}
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
     
+@router.get("/triage/cache/stats")
+async def get_triage_cache_stats():
+    """Hit rate and best-match similarity distribution of the /triage semantic cache"""
+    return triage_question_cache.stats()
+
+async def _recommend_without_llm_choice(data: QuestionnaireResponse, mode: str) -> RecommendationResponse:
+    """rules / hybrid modes: systems are chosen deterministically from the catalog"""
+    analysis = analyze_requirements(data)
+    recommendations = recommend_with_rules(analysis, data)
+    if mode == "hybrid":
+        recommendations = await enrich_recommendation(recommendations, analysis, data)
+    return recommendations
+
 @router.post("/triage/answers", response_model=RecommendationResponse)
-async def recommend_system_ai_extraction(data: Dict[str, str] = Body(...)):
+async def recommend_system_ai_extraction(
+    data: Dict[str, str] = Body(...),
+    mode: Optional[str] = Query(None, description="llm, rules or hybrid; defaults to RECOMMENDATION_MODE"),
+):
     """Generate solar hot water system recommendations based on questionnaire data with AI extraction"""
+    try:
+        mode = resolve_mode(mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
         print(f"Received Data: {data}")
         # Extract structured data from questionnaire using AI
         transformed_data = await extract_questionnaire_data_with_ai(data)
         print(f"Transformed data: {transformed_data}")
+        if mode != "llm":
+            return await _recommend_without_llm_choice(transformed_data, mode)
         
         # Generate prompt and embeddings
         prompt = generate_prompt_from_questionnaire(transformed_data)
         print(f"Prompt: {prompt}")
         
         # Generate embeddings for the prompt
-        embeddings = generate_embeddings(prompt)
+        embeddings = await generate_embeddings(prompt)
         
         # Query Pinecone for similar systems
-        pinecone_results = get_recommendations_from_pinecone(embeddings)
+        pinecone_results = await get_recommendations_from_pinecone(embeddings)
         # print(f"Pinecone results: {pinecone_results}")
         
         # Analyze requirements
         analysis = analyze_requirements(transformed_data)
         
         # Generate detailed recommendations
-        recommendations = generate_ai_recommendations(analysis, pinecone_results, transformed_data)
+        recommendations = await generate_ai_recommendations(analysis, pinecone_results, transformed_data)
         
         return recommendations
         
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         error_detail = f"Error processing recommendation: {str(e)}\n{traceback.format_exc()}"
@@ -115,21 +167,30 @@ async def recommend_system_ai_extraction(data: Dict[str, str] = Body(...)):
         raise HTTPException(status_code=500, detail=error_detail)
     
 @router.post("/recommend", response_model=RecommendationResponse)
-async def recommend_system(data: QuestionnaireResponse = Body(...)):
+async def recommend_system(
+    data: QuestionnaireResponse = Body(...),
+    mode: Optional[str] = Query(None, description="llm, rules or hybrid; defaults to RECOMMENDATION_MODE"),
+):
     """Generate solar hot water system recommendations based on questionnaire responses"""
+    try:
+        mode = resolve_mode(mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
         print(f"Received Data: {data}")
+        if mode != "llm":
+            return await _recommend_without_llm_choice(data, mode)
         
         # Generate prompt and embeddings
         prompt = generate_prompt_from_questionnaire(data)
         print(f"Prompt: {prompt}")
         
         # Generate embeddings for the prompt
-        embeddings = generate_embeddings(prompt)
+        embeddings = await generate_embeddings(prompt)
         # print(f"Embeddings: {embeddings}")
         
         # Query Pinecone for similar systems
-        pinecone_results = get_recommendations_from_pinecone(embeddings)
+        pinecone_results = await get_recommendations_from_pinecone(embeddings)
         # print(f"Pinecone results: {pinecone_results}")
         
         # Analyze requirements
@@ -137,17 +198,94 @@ async def recommend_system(data: QuestionnaireResponse = Body(...)):
         print(f"Analysis: {analysis}")
         
         # Generate detailed recommendations
-        recommendations = generate_ai_recommendations(analysis, pinecone_results, data)
+        recommendations = await generate_ai_recommendations(analysis, pinecone_results, data)
         
         return recommendations
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing recommendation: {str(e)}")
 
+async def _recommendation_events(data: QuestionnaireResponse, mode: str = "llm"):
+    """
+    SSE events for a recommendation: the deterministic sizing analysis first, then the
+    Pinecone candidates, then each LLM-generated section as it completes, and finally
+    the full RecommendationResponse. In rules and hybrid modes nothing is streamed from
+    the model, so the response is sent as the single "done" event.
+    """
+    try:
+        if mode != "llm":
+            recommendations = await _recommend_without_llm_choice(data, mode)
+            yield format_sse(recommendations.model_dump(), event="done")
+            return
+
+        analysis = analyze_requirements(data)
+        yield format_sse(analysis, event="analysis")
+
+        embeddings = await generate_embeddings(generate_prompt_from_questionnaire(data))
+        pinecone_results = await get_recommendations_from_pinecone(embeddings)
+        yield format_sse(pinecone_results, event="candidates")
+
+        async for event, payload in stream_ai_recommendations(analysis, pinecone_results, data):
+            yield format_sse(payload, event=event)
+    except Exception as e:
+        # Headers are already sent, so report the failure as a final event
+        print(f"Error streaming recommendation: {str(e)}")
+        yield format_sse({"detail": f"Error processing recommendation: {str(e)}"}, event="error")
+
+@router.post("/recommend/stream")
+async def recommend_system_stream(
+    data: QuestionnaireResponse = Body(...),
+    mode: Optional[str] = Query(None, description="llm, rules or hybrid; defaults to RECOMMENDATION_MODE"),
+):
+    """Streaming variant of /recommend over server-sent events"""
+    try:
+        mode = resolve_mode(mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return sse_response(_recommendation_events(data, mode))
+
+@router.post("/triage/answers/stream")
+async def recommend_system_ai_extraction_stream(
+    data: Dict[str, str] = Body(...),
+    mode: Optional[str] = Query(None, description="llm, rules or hybrid; defaults to RECOMMENDATION_MODE"),
+):
+    """Streaming variant of /triage/answers; emits the extracted questionnaire before the recommendation events"""
+    try:
+        mode = resolve_mode(mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        try:
+            transformed_data = await extract_questionnaire_data_with_ai(data)
+        except Exception as e:
+            yield format_sse({"detail": f"Error processing recommendation: {str(e)}"}, event="error")
+            return
+        yield format_sse(transformed_data.model_dump(), event="questionnaire")
+        async for event in _recommendation_events(transformed_data, mode):
+            yield event
+
+    return sse_response(events())
+
+@router.get("/recommend/stats")
+async def recommendation_stats():
+    """Structured-output call counts, parse failures, rules fallbacks, name repairs and prompt sizes"""
+    return {**structured_output_stats, "name_resolver": catalog_names.stats(), "prompt_tokens": prompt_token_stats}
+
+
 @router.post("/futureexpansion", response_model=ExpansionResponse)
 async def recommend_expansion(params: ExpansionParameters = Body(...)):
     """Generate recommendations for system expansion using Davis & Shirtliff products from Pinecone"""
     try:
+        # Dropdown values and typed names are mapped onto the catalog entry with the same
+        # series, capacity and variant; anything else is passed through as entered
+        current_match = catalog_names.resolve(params.selected_system)
+        if current_match and current_match.name != params.selected_system:
+            print(f"Expansion: selected system {params.selected_system!r} read as {current_match.name!r}")
+            params.selected_system = current_match.name
+        
         # Generate prompt for the expansion scenario
         expansion_prompt = f"""
         Current System:
@@ -160,10 +298,10 @@ async def recommend_expansion(params: ExpansionParameters = Body(...)):
         """
         
         # Generate embeddings for the expansion requirements
-        embeddings = generate_embeddings(expansion_prompt)
+        embeddings = await generate_embeddings(expansion_prompt)
         
         # Query Pinecone for similar systems
-        pinecone_results = get_recommendations_from_pinecone(embeddings)
+        pinecone_results = await get_recommendations_from_pinecone(embeddings)
         
         # Analyze expansion requirements
         analysis = {
@@ -174,6 +312,9 @@ async def recommend_expansion(params: ExpansionParameters = Body(...)):
             "current_users": params.current_users
         }
         
+        # Deduplicated, metadata-trimmed Pinecone context within the prompt token budget
+        context = build_context(pinecone_results)
+        
         # Use AI to generate detailed recommendations
         user_prompt = f"""
         ## Current System Information:
@@ -187,7 +328,7 @@ async def recommend_expansion(params: ExpansionParameters = Body(...)):
         - Additional Capacity Needed: {analysis['additional_capacity_needed']} litres
         
         ## Available Systems from Database:
-        {json.dumps(pinecone_results, indent=2)}
+        {context}
         
         Based on the current system and expansion requirements:
         1. Recommend specific additional Davis & Shirtliff systems that would best complement the existing system
@@ -195,14 +336,7 @@ async def recommend_expansion(params: ExpansionParameters = Body(...)):
         3. Prefer combinations that use standard system sizes (e.g., 300L + 150L for 450L need)
         4. Include specific installation and integration considerations
         
-        Format your response as a JSON object with:
-        - current_system: object with model and capacity
-        - additional_systems: array of recommended systems with model, capacity, and description
-        - total_new_capacity: total capacity after expansion
-        - capacity_breakdown: object showing capacity contribution from each component
-        - reasoning: detailed explanation of recommendations
-        - installation_notes: array of specific installation steps
-        - considerations: array of important considerations
+        Fill in every field of the response schema; capacity_breakdown lists the capacity contributed by each component.
         """
         
         # Generate AI response using expansion-specific system prompt
@@ -210,43 +344,41 @@ async def recommend_expansion(params: ExpansionParameters = Body(...)):
             {"role": "system", "content": expansion_system_prompt},
             {"role": "user", "content": user_prompt}
         ]
+        log_prompt_tokens("futureexpansion", messages, context)
         
-        result = model.invoke(messages)
-        response_text = result.content
+        structured_output_stats["expansion_calls"] += 1
+        result = await expansion_model.ainvoke(messages)
         
-        try:
-            # Parse JSON response
-            json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', response_text)
-            if json_match:
-                parsed_json = json.loads(json_match.group(1))
-            else:
-                json_match = re.search(r'(\{[\s\S]*\})', response_text)
-                if json_match:
-                    parsed_json = json.loads(json_match.group(1))
-                else:
-                    parsed_json = json.loads(response_text)
-                    
-            # Convert to ExpansionResponse
-            return ExpansionResponse(
-                current_system=parsed_json["current_system"],
-                additional_systems=[
-                    SystemComponent(
-                        model=sys["model"],
-                        capacity=sys["capacity"],
-                        description=sys["description"]
-                    ) for sys in parsed_json["additional_systems"]
-                ],
-                total_new_capacity=parsed_json["total_new_capacity"],
-                capacity_breakdown=parsed_json["capacity_breakdown"],
-                reasoning=parsed_json["reasoning"],
-                installation_notes=parsed_json["installation_notes"],
-                considerations=parsed_json["considerations"]
-            )
-            
-        except Exception as json_err:
-            print(f"Error parsing AI response: {str(json_err)}")
+        draft = result["parsed"]
+        if draft is None:
+            structured_output_stats["expansion_parse_failures"] += 1
+            print(f"Error parsing AI response: {result['parsing_error']}")
             raise HTTPException(status_code=500, detail="Error processing AI recommendations")
+        
+        # Convert to ExpansionResponse
+        current_system = draft.current_system.model_dump()
+        current_match = catalog_names.resolve(current_system["model"])
+        if current_match:
+            current_system["model"] = current_match.name
+            current_system["erp_code"] = current_match.model
+        return ExpansionResponse(
+            current_system=current_system,
+            additional_systems=[
+                SystemComponent(
+                    model=sys.model,
+                    capacity=sys.capacity,
+                    description=sys.description
+                ) for sys in draft.additional_systems
+            ],
+            total_new_capacity=draft.total_new_capacity,
+            capacity_breakdown={share.component: share.capacity for share in draft.capacity_breakdown},
+            reasoning=draft.reasoning,
+            installation_notes=draft.installation_notes,
+            considerations=draft.considerations
+        )
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing expansion recommendation: {str(e)}")
 
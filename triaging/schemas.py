@@ -1,6 +1,7 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, Field
 from langchain.output_parsers import ResponseSchema, StructuredOutputParser
+from triaging.data_table import solar_water_heaters
 
 class UserQuery(BaseModel):
     user_query: str  # The user's inquiry/question
@@ -78,3 +79,65 @@ class ExpansionResponse(BaseModel):
     reasoning: str = Field(..., description="Detailed reasoning for the recommended configuration")
     installation_notes: List[str] = Field(..., description="Specific installation and integration notes")
     considerations: List[str] = Field(..., description="Important considerations for this specific expansion")
+
+
+# Schemas the model must fill in strict structured-output (JSON schema) mode: every field
+# is required, and system names can only be catalog entries, so the output always parses
+# and the ERP model number is looked up from the name instead of being generated.
+CatalogName = Literal[tuple(solar_water_heaters)]
+
+class SpecificationDraft(BaseModel):
+    tank_size: str = Field(..., description="Tank size, e.g. 300 Liters")
+    collector_type: str = Field(..., description="Flatplate, Vacuum Tube, Heat Pump, ...")
+    heat_output: str = Field(..., description="Heat output, e.g. 13 kWh/day (max)")
+    suitable_for: str = Field(..., description="Number of people served, e.g. Up to 6 people")
+
+class PrimarySystemDraft(BaseModel):
+    name: CatalogName
+    description: str = Field(..., description="Brief description of benefits and features")
+    specifications: SpecificationDraft
+
+class AlternativeSystemDraft(BaseModel):
+    name: CatalogName
+    description: str = Field(..., description="Brief description")
+    specifications: SpecificationDraft
+    price_category: Literal["High", "Medium", "Low"]
+
+class RecommendationDraft(BaseModel):
+    primary_recommendation: PrimarySystemDraft
+    alternative_options: List[AlternativeSystemDraft]
+    water_quality_requirements: List[WaterQualityRequirement]
+    additional_components: List[AdditionalComponent]
+    technical_specifications: List[TechnicalSpecification]
+    installation_notes: List[str]
+    warranty: WarrantyInfo
+
+class CurrentSystemDraft(BaseModel):
+    model: str
+    capacity: float
+
+class ExpansionComponentDraft(BaseModel):
+    model: CatalogName
+    capacity: float = Field(..., description="Capacity in litres")
+    description: str
+
+class CapacityShareDraft(BaseModel):
+    component: str = Field(..., description="Existing system or additional system model")
+    capacity: float = Field(..., description="Capacity contributed in litres")
+
+class ExpansionDraft(BaseModel):
+    current_system: CurrentSystemDraft
+    additional_systems: List[ExpansionComponentDraft]
+    total_new_capacity: float
+    capacity_breakdown: List[CapacityShareDraft]
+    reasoning: str
+    installation_notes: List[str]
+    considerations: List[str]
+
+class SystemDescriptionDraft(BaseModel):
+    model: str = Field(..., description="ERP model number of a selected system")
+    description: str
+
+class EnrichmentDraft(BaseModel):
+    descriptions: List[SystemDescriptionDraft]
+    installation_notes: List[str]
@@ -0,0 +1,123 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TRIAGE_SEMANTIC_CACHE_ENABLED = os.getenv("TRIAGE_SEMANTIC_CACHE_ENABLED", "True").lower() == "true"
+# Minimum cosine similarity between two user queries for them to share generated questions
+TRIAGE_SEMANTIC_CACHE_THRESHOLD = float(os.getenv("TRIAGE_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+TRIAGE_SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("TRIAGE_SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+# Width of the buckets used for the best-match similarity histogram
+HISTOGRAM_BUCKET = 0.05
+
+
+class SemanticCache:
+    """
+    In-memory cache keyed by query embedding. A lookup returns the value stored for the
+    most similar earlier query when its cosine similarity reaches `threshold`.
+    Entries are evicted least-recently-used beyond `max_entries`.
+    """
+
+    def __init__(self, threshold: float = TRIAGE_SEMANTIC_CACHE_THRESHOLD, max_entries: int = TRIAGE_SEMANTIC_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # query -> (row in _matrix, value), least recently used first
+        self._entries: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()
+        # Normalised query vectors; rows [0, len(_entries)) are in use and _keys[row] owns each row
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: List[str] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._histogram = [0] * (int(round(1 / HISTOGRAM_BUCKET)) + 1)
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _allocate_row(self, dimensions: int) -> int:
+        """Return a free matrix row, growing the matrix by doubling up to `max_entries` rows"""
+        if self._matrix is None:
+            self._matrix = np.zeros((min(16, self.max_entries), dimensions), dtype=np.float32)
+        row = len(self._keys)
+        if row == self._matrix.shape[0]:
+            grown = np.zeros((min(row * 2, self.max_entries), dimensions), dtype=np.float32)
+            grown[:row] = self._matrix
+            self._matrix = grown
+        self._keys.append("")
+        return row
+
+    def _record(self, similarity: float):
+        bucket = min(max(int(similarity / HISTOGRAM_BUCKET), 0), len(self._histogram) - 1)
+        self._histogram[bucket] += 1
+
+    def lookup(self, vector: List[float]) -> Tuple[Optional[Any], Optional[float]]:
+        """Return (value, similarity) for the closest cached query, or (None, best similarity)"""
+        query = self._normalize(vector)
+        with self._lock:
+            if not self._entries:
+                self.misses += 1
+                return None, None
+            similarities = self._matrix[:len(self._keys)] @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            self._record(similarity)
+            if similarity < self.threshold:
+                self.misses += 1
+                return None, similarity
+            key = self._keys[best]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][1], similarity
+
+    def add(self, query: str, vector: List[float], value: Any):
+        """Store `value` for `query`, writing one matrix row in place (O(d) per insert)"""
+        normalized = self._normalize(vector)
+        with self._lock:
+            if self._matrix is not None and self._matrix.shape[1] != normalized.shape[0]:
+                # Vectors from a different embedding model cannot be compared; start over
+                self._entries.clear()
+                self._keys = []
+                self._matrix = None
+            if query in self._entries:
+                row = self._entries[query][0]
+            elif len(self._entries) >= self.max_entries:
+                # Reuse the row of the least recently used entry
+                _, (row, _) = self._entries.popitem(last=False)
+            else:
+                row = self._allocate_row(normalized.shape[0])
+            self._matrix[row] = normalized
+            self._keys[row] = query
+            self._entries[query] = (row, value)
+            self._entries.move_to_end(query)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys = []
+            self._matrix = None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "similarity_histogram": {
+                f"{index * HISTOGRAM_BUCKET:.2f}": count
+                for index, count in enumerate(self._histogram) if count
+            },
+        }
+
+
+# Shared cache for /api/triage generated questions
+triage_question_cache = SemanticCache()
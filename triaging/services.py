@@ -1,15 +1,20 @@
 from fastapi import HTTPException
 import openai
-from triaging.schemas import QuestionnaireResponse, RecommendationResponse
-from typing import Any, Dict, List
+from triaging.schemas import QuestionnaireResponse, RecommendationResponse, RecommendationDraft, EnrichmentDraft
+from typing import Any, AsyncIterator, Dict, List, Tuple
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
+from llm_cache import route_cache
+from upstream import LimitedChatOpenAI
 from dotenv import load_dotenv
 from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.utils.function_calling import convert_to_openai_function
 import json
-import re
 from triaging.prompt import system_prompt
 from triaging.data_table import solar_water_heaters
+from triaging.json_stream import TopLevelJsonParser
+from triaging.recommender import recommend_with_rules
+from triaging.name_resolver import catalog_names
+from triaging.context_builder import build_context, log_prompt_tokens
 
 load_dotenv()
 
@@ -20,11 +25,39 @@ load_dotenv()
 #         temperature=0.2,  # Lower temperature for more factual responses
 #         max_output_tokens=2048  # Ensure enough tokens for complete response
 #     )
-model = ChatOpenAI(
+model = LimitedChatOpenAI(
     model="gpt-4o-mini",  # gpt-4o-mini gpt-3.5-turbo
-    temperature=0.7
+    temperature=0.7,
+    cache=route_cache("triaging.services")
 )
 
+# Schema-constrained generation: the model can only return a valid RecommendationDraft
+structured_recommendation_model = model.with_structured_output(
+    RecommendationDraft, method="json_schema", strict=True, include_raw=True
+)
+
+def json_schema_response_format(schema) -> Dict[str, Any]:
+    """OpenAI strict `response_format` for a Pydantic model, for use with model.bind() when streaming"""
+    function = convert_to_openai_function(schema, strict=True)
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": function["name"], "schema": function["parameters"], "strict": True},
+    }
+
+structured_enrichment_model = model.with_structured_output(
+    EnrichmentDraft, method="json_schema", strict=True, include_raw=True
+)
+streaming_recommendation_model = model.bind(response_format=json_schema_response_format(RecommendationDraft))
+
+# Structured-output outcomes; the old free-form path re-prompted the model on every parse failure
+structured_output_stats = {
+    "recommendation_calls": 0,
+    "recommendation_parse_failures": 0,
+    "expansion_calls": 0,
+    "expansion_parse_failures": 0,
+    "rules_fallbacks": 0,
+}
+
 # Helper function to process model response
 def process_model_response(response):
     """Extracts the list of questions from the model's response."""
@@ -48,11 +81,11 @@ def process_model_response(response):
         raise HTTPException(status_code=400, detail=f"Error processing the model's response: {str(e)}")
     
     
-def generate_ai_recommendations(analysis: Dict[str, Any], pinecone_results: List[Dict[str, Any]], data: QuestionnaireResponse) -> RecommendationResponse:
-    """Generate detailed recommendations using AI model based on analysis and Pinecone results"""
+def build_recommendation_messages(analysis: Dict[str, Any], pinecone_results: List[Dict[str, Any]], data: QuestionnaireResponse) -> List[Dict[str, str]]:
+    """System and user messages asking the model for one primary and two alternative systems as JSON"""
     
-    # Preserve raw Pinecone results but format as readable JSON string
-    raw_results_str = json.dumps(pinecone_results, indent=2)
+    # Deduplicated Pinecone matches with only the needed metadata, within the token budget
+    raw_results_str = build_context(pinecone_results)
     
     # Construct the user prompt with analysis and raw Pinecone results
     user_prompt = f"""
@@ -151,342 +184,192 @@ def generate_ai_recommendations(analysis: Dict[str, Any], pinecone_results: List
     - Installation Notes with 2-3 practical tips
     - Warranty information
     
-    Format your response as a JSON object with these specific fields (do NOT include any comments in the JSON):
-    ```json
-    {{
-      "primary_recommendation": {{
-        "name": "EXACT SYSTEM NAME",
-        "model": "MODEL NUMBER",
-        "description": "Brief description of benefits and features",
-        "specifications": {{
-          "tank_size": "XXX Liters",
-          "collector_type": "Type of collector",
-          "heat_output": "XX kWh/day (max)",
-          "suitable_for": "Up to X people"
-        }}
-      }},
-      "alternative_options": [
-        {{
-          "name": "EXACT SYSTEM NAME",
-          "model": "MODEL NUMBER", 
-          "description": "Brief description",
-          "specifications": {{
-            "tank_size": "XXX Liters",
-            "collector_type": "Type of collector"
-          }},
-          "price_category": "High/Medium/Low"
-        }},
-        {{
-          "name": "EXACT SYSTEM NAME",
-          "model": "MODEL NUMBER",
-          "description": "Brief description",
-          "specifications": {{
-            "tank_size": "XXX Liters",
-            "collector_type": "Type of collector"
-          }},
-          "price_category": "High/Medium/Low"
-        }}
-      ],
-      "water_quality_requirements": [
-        {{"parameter": "Parameter name", "value": "Recommended value"}},
-        {{"parameter": "Parameter name", "value": "Recommended value"}},
-        {{"parameter": "Parameter name", "value": "Recommended value"}},
-        {{"parameter": "Parameter name", "value": "Recommended value"}}
-      ],
-      "additional_components": [
-        {{
-          "name": "Component name",
-          "description": "Brief description of purpose"
-        }},
-        {{
-          "name": "Component name",
-          "description": "Brief description of purpose"
-        }},
-        {{
-          "name": "Component name",
-          "description": "Brief description of purpose"
-        }}
-      ],
-      "technical_specifications": [
-        {{"parameter": "Parameter name", "value": "Value"}},
-        {{"parameter": "Parameter name", "value": "Value"}},
-        {{"parameter": "Parameter name", "value": "Value"}}
-      ],
-      "installation_notes": [
-        "Installation tip 1",
-        "Installation tip 2",
-        "Installation tip 3"
-      ],
-      "warranty": {{
-        "tank": "X years",
-        "collector": "X years",
-        "parts": "X years"
-      }}
-    }}
-    ```
+    Fill in every field of the response schema; system names must be copied exactly from the ERP list above.
     """
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    log_prompt_tokens("recommend", messages, raw_results_str)
+    return messages
+
+
+def repair_system_name(system: Dict[str, Any]) -> bool:
+    """Replace a near-miss system name with its catalog name; False when none is close enough"""
+    match = catalog_names.resolve(system.get("name") or system.get("model") or "")
+    if match is None:
+        return False
+    system["name"] = match.name
+    return True
+
+
+def repair_recommendation_names(parsed_json: Dict[str, Any]) -> bool:
+    """Repair the names of all recommended systems in place; False if any cannot be resolved"""
+    systems = [parsed_json.get("primary_recommendation") or {}] + list(parsed_json.get("alternative_options") or [])
+    return all([repair_system_name(system) for system in systems])
+
+
+def system_from_json(system: Dict[str, Any], is_primary: bool) -> Dict[str, Any]:
+    """Map a primary_recommendation / alternative_options entry onto RecommendedSystem fields"""
+    repair_system_name(system)
+    recommended = {
+        "name": system["name"],
+        # Structured drafts carry only the catalog name; the ERP number comes from the catalog
+        "model": solar_water_heaters.get(system["name"]) or system.get("model", ""),
+        "description": system["description"],
+        "is_primary": is_primary,
+        "specifications": system["specifications"]
+    }
+    if not is_primary:
+        recommended["price_category"] = system.get("price_category", "")
+    return recommended
+
+
+def build_recommendation_response(parsed_json: Dict[str, Any]) -> RecommendationResponse:
+    """Map the model's JSON onto RecommendationResponse"""
+    # Map the parsed JSON to our response model
+    recommended_systems = []
+    
+    # Add primary recommendation
+    if "primary_recommendation" in parsed_json:
+        recommended_systems.append(system_from_json(parsed_json["primary_recommendation"], is_primary=True))
+    
+    # Add alternative options
+    if "alternative_options" in parsed_json:
+        for alt in parsed_json["alternative_options"]:
+            recommended_systems.append(system_from_json(alt, is_primary=False))
+    
+    # Extract other details for the response
+    water_quality = parsed_json.get("water_quality_requirements", [])
+    additional_components = parsed_json.get("additional_components", [])
+    technical_specs = parsed_json.get("technical_specifications", [])
+    installation_notes = parsed_json.get("installation_notes", [])
+    warranty = parsed_json.get("warranty", {})
+    
+    # Names are already repaired against the catalog by system_from_json
+    invalid_names = [system["name"] for system in recommended_systems if system["name"] not in solar_water_heaters]
+    if invalid_names:
+        print(f"Warning: Some recommended products not found in ERP database: {invalid_names}")
+    
+    # Return structured response
+    return RecommendationResponse(
+        recommended_systems=recommended_systems,
+        water_quality_requirements=water_quality,
+        additional_components=additional_components,
+        technical_specifications=technical_specs,
+        installation_notes=installation_notes,
+        warranty=warranty
+    )
+
+
+async def generate_ai_recommendations(analysis: Dict[str, Any], pinecone_results: List[Dict[str, Any]], data: QuestionnaireResponse) -> RecommendationResponse:
+    """Generate detailed recommendations using AI model based on analysis and Pinecone results"""
     
     # Generate AI response
     try:
-        # Assuming your model variable is defined elsewhere
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
+        messages = build_recommendation_messages(analysis, pinecone_results, data)
         
-        # Direct invocation
-        result = model.invoke(messages)
+        # Direct invocation; the response is constrained to the RecommendationDraft schema
+        structured_output_stats["recommendation_calls"] += 1
+        result = await structured_recommendation_model.ainvoke(messages)
         
-        # Extract response content
-        response_text = result.content
+        if result["parsed"] is None:
+            # Refusal or truncated output: answer from the catalog rules instead of re-prompting
+            structured_output_stats["recommendation_parse_failures"] += 1
+            structured_output_stats["rules_fallbacks"] += 1
+            print(f"Structured recommendation unavailable: {result['parsing_error']}")
+            return recommend_with_rules(analysis, data)
         
-        # Try to parse JSON from the response
-        try:
-            # First try: look for JSON block in markdown
-            json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', response_text)
-            if json_match:
-                json_str = json_match.group(1)
-                parsed_json = json.loads(json_str)
-            else:
-                # Second try: look for anything that looks like JSON object
-                json_match = re.search(r'(\{[\s\S]*\})', response_text)
-                if json_match:
-                    json_str = json_match.group(1)
-                    parsed_json = json.loads(json_str)
-                else:
-                    # Last resort: try to parse the entire response as JSON
-                    parsed_json = json.loads(response_text)
-            
-            # Map the parsed JSON to our response model
-            recommended_systems = []
-            
-            # Add primary recommendation
-            if "primary_recommendation" in parsed_json:
-                primary = parsed_json["primary_recommendation"]
-                recommended_systems.append({
-                    "name": primary["name"],
-                    "model": primary["model"],
-                    "description": primary["description"],
-                    "is_primary": True,
-                    "specifications": primary["specifications"]
-                })
-            
-            # Add alternative options
-            if "alternative_options" in parsed_json:
-                for alt in parsed_json["alternative_options"]:
-                    recommended_systems.append({
-                        "name": alt["name"],
-                        "model": alt["model"],
-                        "description": alt["description"],
-                        "is_primary": False,
-                        "specifications": alt["specifications"],
-                        "price_category": alt.get("price_category", "")
-                    })
-            
-            # Extract other details for the response
-            water_quality = parsed_json.get("water_quality_requirements", [])
-            additional_components = parsed_json.get("additional_components", [])
-            technical_specs = parsed_json.get("technical_specifications", [])
-            installation_notes = parsed_json.get("installation_notes", [])
-            warranty = parsed_json.get("warranty", {})
-            
-            # Map product names to ERP IDs
-            solar_water_heaters = {
-                "ULTRASUN UFS150D FLATPLATE SOLAR HOT WATER SYSTEM": "DSD150",
-                "ULTRASUN UFS200D FLATPLATE SOLAR HOT WATER SYSTEM": "DSD200",
-                "ULTRASUN UFS300D FLATPLATE SOLAR HOT WATER SYSTEM": "DSD300",
-                "ULTRASUN UFS150I INDIRECT SOLAR HOT WATER SYSTEM": "UFS150I",
-                "ULTRASUN UFS200DE DIRECT ENAMEL SOLAR HOT WATER SYSTEM": "UFS200DE",
-                "ULTRASUN UFS200I INDIRECT SOLAR HOT WATER SYSTEM": "UFS200I",
-                "ULTRASUN UFS300DE DIRECT ENAMEL SOLAR HOT WATER SYSTEM": "UFS300DE",
-                "ULTRASUN UFS300I INDIRECT SOLAR HOT WATER SYSTEM": "UFS300I",
-                "ULTRASUN UFX160D FLATPLATE SOLAR HOT WATER SYSTEM": "ESD 150",
-                "ULTRASUN UFX200D FLATPLATE SOLAR HOT WATER SYSTEM": "ESD200",
-                "ULTRASUN UFX300D FLATPLATE SOLAR HOT WATER SYSTEM": "ESD300",
-                "ULTRASUN UFX160I FLATPLATE SOLAR HOT WATER SYSTEM": "ESI150",
-                "ULTRASUN UFX200I FLATPLATE SOLAR HOT WATER SYSTEM": "ESI200",
-                "ULTRASUN UFX300I FLATPLATE SOLAR HOT WATER SYSTEM": "ESI300",
-                "ULTRASUN UVT200 VACTUBE SOLAR HOT WATER SYSTEM": "DVS200",
-                "ULTRASUN UVT300 VACTUBE SOLAR HOT WATER SYSTEM": "DVS300",
-                "ULTRASUN UVR150 VACROD SOLAR HOT WATER SYSTEM": "DSH150",
-                "ULTRASUN UVR200 VACROD SOLAR HOT WATER SYSTEM": "DSH200",
-                "ULTRASUN UVR300 VACROD SOLAR HOT WATER SYSTEM": "DSH300",
-                "DAYLIFF HPW 80LITRES ALL-IN-ONE VERTICAL WALL MOUNT HEAT PUMP": "HPW080",
-                "DAYLIFF HPW 120LITRES ALL-IN-ONE HEAT PUMP": "HPW120",
-                "DAYLIFF HPW 150LITRES ALL-IN-ONE HEAT PUMP": "HPW150",
-                "DAYLIFF HPW 200LITRES ALL-IN-ONE HEAT PUMP": "HPW200",
-                "DAYLIFF HPW 300LITRES ALL-IN-ONE HEAT PUMP": "HPW300",
-                "ULTRASUN CWS1000 SOLAR HOT WATER SYSTEM": "EST1000",
-                "ULTRASUN CWS1500 SOLAR HOT WATER SYSTEM": "EST1500",
-                "ULTRASUN CWS2000 SOLAR HOT WATER SYSTEM": "EST2000"
-            }
-            
-            # Extract all product names for validation
-            recommended_names = [system["name"] for system in recommended_systems]
-            
-            # Check if recommended products exist in the mapping
-            invalid_names = [name for name in recommended_names if name not in solar_water_heaters]
-            if invalid_names:
-                print(f"Warning: Some recommended products not found in ERP database: {invalid_names}")
-            
-            # Return structured response
-            return RecommendationResponse(
-                recommended_systems=recommended_systems,
-                water_quality_requirements=water_quality,
-                additional_components=additional_components,
-                technical_specifications=technical_specs,
-                installation_notes=installation_notes,
-                warranty=warranty
-            )
-            
-        except (json.JSONDecodeError, AttributeError) as json_err:
-            print(f"JSON parsing error: {str(json_err)}")
-            print(f"Raw response: {response_text}")
-            
-            # If JSON parsing fails, try to extract structured information using the model again
-            extraction_prompt = f"""
-            I couldn't parse your previous response as valid JSON. Please format your recommendations as valid JSON with these fields:
-            - primary_recommendation: object with name, model, description, specifications
-            - alternative_options: array of objects with name, model, description, specifications
-            - water_quality_requirements: array of objects with parameter and value
-            - additional_components: array of objects with name and description
-            - technical_specifications: array of objects with parameter and value
-            - installation_notes: array of strings
-            - warranty: object with tank, collector, parts values
-            
-            Please provide ONLY the JSON response without any explanation or code blocks.
-            """
-            
-            try:
-                retry_result = model.invoke([
-                    {"role": "system", "content": "You are a helpful assistant. Format your response as valid JSON."},
-                    {"role": "user", "content": extraction_prompt}
-                ])
-                
-                retry_response = retry_result.content
-                parsed_json = json.loads(retry_response)
-                
-                # Process the parsed JSON (same as above)
-                recommended_systems = []
-                
-                # Add primary recommendation
-                if "primary_recommendation" in parsed_json:
-                    primary = parsed_json["primary_recommendation"]
-                    recommended_systems.append({
-                        "name": primary["name"],
-                        "model": primary["model"],
-                        "description": primary["description"],
-                        "is_primary": True,
-                        "specifications": primary["specifications"]
-                    })
-                
-                # Add alternative options
-                if "alternative_options" in parsed_json:
-                    for alt in parsed_json["alternative_options"]:
-                        recommended_systems.append({
-                            "name": alt["name"],
-                            "model": alt["model"],
-                            "description": alt["description"],
-                            "is_primary": False,
-                            "specifications": alt["specifications"],
-                            "price_category": alt.get("price_category", "")
-                        })
-                
-                # Extract other details for the response
-                water_quality = parsed_json.get("water_quality_requirements", [])
-                additional_components = parsed_json.get("additional_components", [])
-                technical_specs = parsed_json.get("technical_specifications", [])
-                installation_notes = parsed_json.get("installation_notes", [])
-                warranty = parsed_json.get("warranty", {})
-                
-                return RecommendationResponse(
-                    recommended_systems=recommended_systems,
-                    water_quality_requirements=water_quality,
-                    additional_components=additional_components,
-                    technical_specifications=technical_specs,
-                    installation_notes=installation_notes,
-                    warranty=warranty
-                )
-                
-            except Exception as retry_err:
-                print(f"Retry failed: {str(retry_err)}")
-                
-                # Final fallback: create structured response manually
-                return RecommendationResponse(
-                    recommended_systems=[
-                        {
-                            "name": "ULTRASUN UFS200D FLATPLATE SOLAR HOT WATER SYSTEM",
-                            "model": "DSD200",
-                            "description": "Dayliff Ultrasun UFS Flat Plate Solar Hot Water Systems are efficient and economical water heaters that provide excellent performance in all domestic applications.",
-                            "is_primary": True,
-                            "specifications": {
-                                "tank_size": f"{int(analysis['system_size_recommendation']['ideal_capacity_liters'])} Liters",
-                                "collector_type": "Flatplate",
-                                "heat_output": "13 kWh/day (max)",
-                                "suitable_for": f"Up to {max(1, min(8, int(float(analysis['system_size_recommendation']['ideal_capacity_liters']) / 30)))} people"
-                            }
-                        },
-                        {
-                            "name": "ULTRASUN UFS300D FLATPLATE SOLAR HOT WATER SYSTEM",
-                            "model": "DSD300",
-                            "description": "Higher capacity system ideal for larger households with greater hot water demands.",
-                            "is_primary": False,
-                            "specifications": {
-                                "tank_size": "300 Liters",
-                                "collector_type": "Flatplate"
-                            },
-                            "price_category": "Medium"
-                        },
-                        {
-                            "name": "ULTRASUN UVT200 VACTUBE SOLAR HOT WATER SYSTEM",
-                            "model": "DVS200",
-                            "description": "Vacuum tube technology for enhanced efficiency, especially in areas with less direct sunlight.",
-                            "is_primary": False,
-                            "specifications": {
-                                "tank_size": "200 Liters",
-                                "collector_type": "Vacuum Tube"
-                            },
-                            "price_category": "High"
-                        }
-                    ],
-                    water_quality_requirements=[
-                        {"parameter": "TDS", "value": "<1500mg/l"},
-                        {"parameter": "Hardness", "value": "<400mg/l CaCO3"},
-                        {"parameter": "Saturation Index", "value": ">0.8<1.0"}
-                    ],
-                    additional_components=[
-                        {
-                            "name": "SOLAR THERMAL SR609 AC CONTROLLER",
-                            "description": "Programmable temperature controller that automatically switches ON/OFF the electric booster heaters at certain pre-programmed times."
-                        },
-                        {
-                            "name": "SOLAR HOT WATER HEATER FLUID 20L",
-                            "description": "Heat transfer fluid for indirect solar hot water systems."
-                        },
-                        {
-                            "name": "HEATER 3KW RURAL",
-                            "description": "Electric heating element for temperature boosting during cloudy days."
-                        }
-                    ],
-                    technical_specifications=[
-                        {"parameter": "Maximum Heating Output", "value": "Based on average irradiation levels of 6000W/m²/day prevailing in September - March"},
-                        {"parameter": "Minimum Heating Output", "value": "Based on average irradiation levels of 4000W/m²/day prevailing in June/July"},
-                        {"parameter": "Operating Pressure", "value": "4 bar"}
-                    ],
-                    installation_notes=[
-                        "Professional installation recommended for optimal performance",
-                        "South-facing installation provides optimal sunlight exposure",
-                        "System must be installed with proper safety valves and pressure relief"
-                    ],
-                    warranty={
-                        "tank": "5 years",
-                        "collector": "10 years",
-                        "parts": "1 year"
-                    }
-                )
+        return build_recommendation_response(result["parsed"].model_dump())
         
     except Exception as e:
         import traceback
         error_detail = f"Error generating AI recommendations: {str(e)}\n{traceback.format_exc()}"
         print(error_detail)
         raise HTTPException(status_code=500, detail=error_detail)
+
+
+def recommendation_section(name: str, value: Any) -> Any:
+    """Shape a streamed top-level JSON member like the matching RecommendationResponse data"""
+    if name == "primary_recommendation":
+        return system_from_json(value, is_primary=True)
+    if name == "alternative_options":
+        return [system_from_json(alt, is_primary=False) for alt in value]
+    return value
+
+
+async def stream_ai_recommendations(analysis: Dict[str, Any], pinecone_results: List[Dict[str, Any]], data: QuestionnaireResponse) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Stream the model's recommendation: a ("section", {"name", "value"}) event for each
+    top-level member of its JSON as soon as that member is complete, then
+    ("done", RecommendationResponse) built from the whole response, or from the
+    rules recommender when it cannot be parsed.
+    """
+    parser = TopLevelJsonParser()
+    chunks = []
+    structured_output_stats["recommendation_calls"] += 1
+    async for chunk in streaming_recommendation_model.astream(build_recommendation_messages(analysis, pinecone_results, data)):
+        if not chunk.content:
+            continue
+        chunks.append(chunk.content)
+        for name, value in parser.feed(chunk.content):
+            try:
+                yield "section", {"name": name, "value": recommendation_section(name, value)}
+            except (KeyError, TypeError) as e:
+                print(f"Skipping malformed section {name}: {str(e)}")
+
+    response_text = "".join(chunks)
+    try:
+        parsed_json = json.loads(response_text)
+        if not repair_recommendation_names(parsed_json):
+            raise ValueError("recommended system name below the catalog match threshold")
+        draft = RecommendationDraft.model_validate(parsed_json)
+        response = build_recommendation_response(draft.model_dump())
+    except Exception as e:
+        structured_output_stats["recommendation_parse_failures"] += 1
+        structured_output_stats["rules_fallbacks"] += 1
+        print(f"Streamed recommendation could not be parsed: {str(e)}")
+        print(f"Raw response: {response_text}")
+        response = recommend_with_rules(analysis, data)
+    yield "done", response.model_dump()
+
+
+async def enrich_recommendation(response: RecommendationResponse, analysis: Dict[str, Any], data: QuestionnaireResponse) -> RecommendationResponse:
+    """
+    Hybrid mode: keep the systems chosen by the rules recommender and only let the model
+    rewrite their descriptions and the installation notes for this customer.
+    Any failure returns the rules response unchanged.
+    """
+    systems = [{"name": system.name, "model": system.model, "description": system.description} for system in response.recommended_systems]
+    user_prompt = f"""
+    ## Customer Requirements:
+    - Property Type: {data.propertyType}
+    - Occupants: {data.occupants}
+    - Location: {data.location}
+    - Roof Type: {data.existingSystem}
+    - Water Source: {data.waterSource}
+    - System Type: {data.systemType}
+    - Daily Hot Water Need: {analysis['daily_hot_water_needed']} liters
+    
+    ## Selected Systems (do not change them):
+    {json.dumps(systems, indent=2)}
+    
+    Write a brief description (2-3 sentences) for each selected system explaining why it suits this customer,
+    (keyed by its model number) and 3 practical installation notes.
+    """
+    try:
+        result = await structured_enrichment_model.ainvoke([
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ])
+        if result["parsed"] is None:
+            raise ValueError(result["parsing_error"])
+        descriptions = {item.model: item.description for item in result["parsed"].descriptions}
+        for system in response.recommended_systems:
+            if descriptions.get(system.model):
+                system.description = descriptions[system.model]
+        if result["parsed"].installation_notes:
+            response.installation_notes = result["parsed"].installation_notes
+    except Exception as e:
+        print(f"Recommendation enrichment failed, using rules text: {str(e)}")
+    return response
@@ -0,0 +1,100 @@
+import asyncio
+import os
+from typing import Any, AsyncIterator, Dict
+from dotenv import load_dotenv
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_openai import ChatOpenAI
+
+load_dotenv()
+
+# Maximum in-flight calls per upstream service across all requests in this process
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+PINECONE_MAX_CONCURRENCY = int(os.getenv("PINECONE_MAX_CONCURRENCY", "16"))
+
+
+class UpstreamLimiter:
+    """
+    Async context manager bounding concurrent calls to one upstream service.
+    Requests beyond `limit` wait on the event loop instead of piling onto the API.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.peak_in_flight = 0
+
+    async def __aenter__(self):
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.calls += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.in_flight -= 1
+        self._semaphore.release()
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "peak_in_flight": self.peak_in_flight,
+            "calls": self.calls,
+        }
+
+
+openai_limiter = UpstreamLimiter("openai", OPENAI_MAX_CONCURRENCY)
+pinecone_limiter = UpstreamLimiter("pinecone", PINECONE_MAX_CONCURRENCY)
+
+
+class LimitedChatOpenAI(ChatOpenAI):
+    """
+    ChatOpenAI whose requests to OpenAI take an openai_limiter slot. LangChain answers
+    cache hits before _agenerate/_astream run, so they never wait behind real calls.
+    """
+
+    async def _agenerate(self, *args: Any, **kwargs: Any) -> ChatResult:
+        if self.streaming:
+            # Delegates to _astream, which takes the slot itself
+            return await super()._agenerate(*args, **kwargs)
+        async with openai_limiter:
+            return await super()._agenerate(*args, **kwargs)
+
+    async def _astream(self, *args: Any, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        # The OpenAI stream is read into a queue by a separate task, so the slot is held
+        # until OpenAI has sent the last chunk, not until a slow client has read it
+        chunks: asyncio.Queue = asyncio.Queue()
+        upstream = super()._astream(*args, **kwargs)
+
+        async def read_upstream():
+            try:
+                async with openai_limiter:
+                    async for chunk in upstream:
+                        chunks.put_nowait(chunk)
+            except Exception as e:
+                chunks.put_nowait(e)
+            finally:
+                chunks.put_nowait(None)
+
+        reader = asyncio.create_task(read_upstream())
+        try:
+            while (chunk := await chunks.get()) is not None:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            reader.cancel()
+
+
+def upstream_stats() -> Dict[str, Any]:
+    return {limiter.name: limiter.stats() for limiter in (openai_limiter, pinecone_limiter)}